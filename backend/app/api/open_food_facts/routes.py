@@ -1,10 +1,31 @@
-from fastapi import APIRouter
+from typing import Dict
+
+from fastapi import APIRouter, Response
 from starlette.requests import Request
 
-from app.business.open_food_facts.knowledge_panel import get_knowledge_panel_response, get_pain_report
-from app.config.exceptions import ExternalServiceException, ResourceNotFoundException
+from app.business.open_food_facts.basket import get_basket_pain
+from app.business.open_food_facts.knowledge_panel import (
+    get_breeding_types_comparison,
+    get_knowledge_panel_response,
+    get_pain_report,
+    get_pain_reports,
+)
+from app.business.open_food_facts.knowledge_panel_cache import get_knowledge_panel_cache
+from app.business.open_food_facts.upstream_guard import UpstreamStatus, get_upstream_guards
+from app.config.exceptions import BaseAppException, ExternalServiceException, ResourceNotFoundException
+from app.config.i18n import get_i18n
 from app.config.logging import setup_logging
-from app.schemas.open_food_facts.internal import KnowledgePanelResponse
+from app.schemas.open_food_facts.internal import (
+    AnimalBasketPain,
+    BarcodeKnowledgePanel,
+    BasketPainResponse,
+    BasketRequest,
+    BreedingTypesComparisonResponse,
+    KnowledgePanelError,
+    KnowledgePanelResponse,
+    KnowledgePanelsRequest,
+    KnowledgePanelsResponse,
+)
 
 router = APIRouter()
 logger = setup_logging()
@@ -20,7 +41,7 @@ async def knowledge_panel(request: Request, barcode: str):
         barcode (str): The product barcode number.
 
     Returns:
-        KnowledgePanelResponse: The knowledge panel response.
+        KnowledgePanelResponse: The knowledge panel response, already serialized.
     """
     logger.info(f"Getting knowledge panel for product {barcode}")
 
@@ -30,4 +51,115 @@ async def knowledge_panel(request: Request, barcode: str):
         # Will be handled by the middleware, no need for additional processing here
         raise
 
-    return get_knowledge_panel_response(pain_report=pain_report, translator=request.state.translator)
+    # The cached response is sent as is, without being validated against the response model again
+    response_bytes = get_knowledge_panel_cache().get_response_bytes(
+        pain_report, locale=request.state.locale, translator=request.state.translator
+    )
+    return Response(content=response_bytes, media_type="application/json")
+
+
+@router.get("/knowledge-panel/{barcode}/compare", response_model=BreedingTypesComparisonResponse)
+async def breeding_types_comparison(request: Request, barcode: str):
+    """
+    API endpoint to compare the suffering caused by a product with each breeding type of its animals.
+
+    Args:
+        request (Request): The request object.
+        barcode (str): The product barcode number.
+
+    Returns:
+        BreedingTypesComparisonResponse: The time in pain with each breeding type, and its difference with the product.
+    """
+    logger.info(f"Comparing breeding types for product {barcode}")
+
+    return await get_breeding_types_comparison(barcode=barcode, locale=request.state.locale)
+
+
+@router.post("/knowledge-panels", response_model=KnowledgePanelsResponse)
+async def knowledge_panels(request: Request, knowledge_panels_request: KnowledgePanelsRequest):
+    """
+    API endpoint to return the knowledge panels of several products at once.
+
+    Args:
+        request (Request): The request object.
+        knowledge_panels_request (KnowledgePanelsRequest): The barcodes, and optionally the locale to use.
+
+    Returns:
+        KnowledgePanelsResponse: The knowledge panel, or the error, of each barcode.
+    """
+    logger.info(f"Getting knowledge panels for {len(knowledge_panels_request.barcodes)} products")
+
+    i18n = get_i18n()
+    locale, translator = request.state.locale, request.state.translator
+    if knowledge_panels_request.locale and i18n.is_supported_locale(knowledge_panels_request.locale.lower()):
+        locale = knowledge_panels_request.locale.lower()
+        translator = i18n.get_translator(locale)
+
+    pain_reports = await get_pain_reports(barcodes=knowledge_panels_request.barcodes, locale=locale)
+
+    results = []
+    for barcode, pain_report in pain_reports.items():
+        if isinstance(pain_report, BaseAppException):
+            results.append(BarcodeKnowledgePanel(barcode=barcode, error=get_knowledge_panel_error(pain_report)))
+        else:
+            knowledge_panel = get_knowledge_panel_response(
+                pain_report=pain_report, translator=translator, locale=locale
+            )
+            results.append(BarcodeKnowledgePanel(barcode=barcode, knowledge_panel=knowledge_panel))
+
+    return KnowledgePanelsResponse(results=results)
+
+
+@router.post("/basket", response_model=BasketPainResponse)
+async def basket(request: Request, basket_request: BasketRequest):
+    """
+    API endpoint to return the suffering footprint of a shopping basket, by animal, pain type and intensity.
+
+    The products not resolved before the deadline are left out of the totals and returned as unresolved.
+
+    Args:
+        request (Request): The request object.
+        basket_request (BasketRequest): The barcodes of the basket, with their quantities.
+
+    Returns:
+        BasketPainResponse: The totals of the resolved products, with the failed and unresolved barcodes.
+    """
+    logger.info(f"Getting the suffering footprint of a basket of {len(basket_request.items)} products")
+
+    basket_pain = await get_basket_pain(basket_request.items, locale=request.state.locale)
+
+    pain_matrix = basket_pain.pain_matrix
+    return BasketPainResponse(
+        animals=[
+            AnimalBasketPain(
+                animal_type=animal_type,
+                animal_product_weight=basket_pain.animal_product_weights[animal_type],
+                seconds_in_pain=animal_pain_matrix.to_dict(),
+                total_seconds_in_pain=animal_pain_matrix.total_seconds_in_pain,
+            )
+            for animal_type, animal_pain_matrix in basket_pain.pain_matrices_by_animal.items()
+        ],
+        seconds_in_pain=pain_matrix.to_dict(),
+        total_seconds_in_pain=pain_matrix.total_seconds_in_pain,
+        resolved_barcodes=basket_pain.resolved_barcodes,
+        errors={barcode: get_knowledge_panel_error(failure) for barcode, failure in basket_pain.failures.items()},
+        unresolved_barcodes=basket_pain.unresolved_barcodes,
+    )
+
+
+def get_knowledge_panel_error(exception: BaseAppException) -> KnowledgePanelError:
+    """Return the error of a product of a batch request"""
+    # Hide internal server errors with a generic message, like the global exception middleware
+    message = exception.message if exception.status_code < 500 else "An unexpected server error occurred"
+    return KnowledgePanelError(status=exception.status_code, message=message)
+
+
+@router.get("/upstream-status", response_model=Dict[str, UpstreamStatus])
+async def upstream_status():
+    """
+    API endpoint to monitor the OFF endpoints: state of their circuit breaker and of their concurrency limit.
+
+    Returns:
+        Dict[str, UpstreamStatus]: The status of each OFF endpoint, by name.
+    """
+    return {name: guard.status() for name, guard in get_upstream_guards().items()}
@@ -0,0 +1,44 @@
+"""
+Canonicalization of the barcodes, so the different spellings of a product share the same cache entries.
+
+The canonical form is the one used by OFF for the product codes: the GTIN without its leading zeros,
+padded to 8 digits (GTIN-8) or to 13 digits (UPC-A and EAN-13). For instance, the UPC-A 036000291452,
+the EAN-13 0036000291452 and the GTIN-14 00036000291452 are all canonicalized to 0036000291452.
+"""
+
+from app.config.exceptions import InvalidBarcodeException
+
+GTIN_LENGTHS = (8, 12, 13, 14)
+
+
+def canonicalize_barcode(barcode: str) -> str:
+    """
+    Return the canonical form of a GTIN-8, UPC-A, EAN-13 or GTIN-14 barcode.
+
+    Args:
+        barcode: The barcode, possibly surrounded by spaces
+
+    Returns:
+        The canonical barcode
+    Raises:
+        InvalidBarcodeException: If the barcode is not made of 8, 12, 13 or 14 digits, or if its check digit is wrong
+    """
+    barcode = barcode.strip()
+    if not (barcode.isascii() and barcode.isdigit() and len(barcode) in GTIN_LENGTHS):
+        raise InvalidBarcodeException(f"Invalid barcode: {barcode}")
+    if not has_valid_check_digit(barcode):
+        raise InvalidBarcodeException(f"Invalid check digit: {barcode}")
+
+    code = barcode.lstrip("0")
+    if len(code) <= 8:
+        return code.zfill(8)
+    if len(code) < 13:
+        return code.zfill(13)
+    return code
+
+
+def has_valid_check_digit(barcode: str) -> bool:
+    """Check the GS1 check digit (the last digit) of a GTIN, which doesn't depend on the leading zeros"""
+    # From the right, excluding the check digit, the digits are weighted 3, 1, 3, 1...
+    total = sum(int(digit) * (3 if index % 2 == 0 else 1) for index, digit in enumerate(reversed(barcode[:-1])))
+    return (10 - total % 10) % 10 == int(barcode[-1])
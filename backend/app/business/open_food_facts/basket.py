@@ -0,0 +1,115 @@
+"""
+Suffering footprint of a shopping basket: the pain matrices of its products, multiplied by their quantities
+and summed by animal type.
+
+The pain reports of the products are computed concurrently, at most MAX_CONCURRENT_BASKET_LOOKUPS at once,
+and added to the totals as they arrive. When the deadline is reached, the pending lookups are cancelled and
+the partial totals are returned with the barcodes left unresolved, instead of waiting for the slowest OFF call.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from app.business.open_food_facts.barcode import canonicalize_barcode
+from app.business.open_food_facts.knowledge_panel import get_pain_report
+from app.config.exceptions import BaseAppException, InvalidBarcodeException
+from app.enums.open_food_facts.enums import AnimalType
+from app.schemas.open_food_facts.internal import BasketItem, PainMatrix, PainReport
+
+logger = logging.getLogger("app")
+
+MAX_CONCURRENT_BASKET_LOOKUPS = 8
+# Time given to resolve the products of a basket, in seconds
+BASKET_DEADLINE = 5.0
+
+
+@dataclass(slots=True)
+class BasketPain:
+    """
+    Time in pain of the products of a basket, summed by animal type as the pain reports arrive.
+    """
+
+    pain_matrices_by_animal: Dict[AnimalType, PainMatrix] = field(default_factory=dict)
+    animal_product_weights: Dict[AnimalType, float] = field(default_factory=dict)
+    resolved_barcodes: List[str] = field(default_factory=list)
+    # Exception raised while computing the pain report of each failed barcode
+    failures: Dict[str, BaseAppException] = field(default_factory=dict)
+    # Barcodes still being resolved when the deadline was reached
+    unresolved_barcodes: List[str] = field(default_factory=list)
+
+    def add(self, barcode: str, pain_report: PainReport, quantity: int) -> None:
+        """Add the pain report of a product, multiplied by its quantity, to the totals"""
+        for animal in pain_report.animals:
+            pain_matrix = animal.pain_matrix * quantity
+            if (total := self.pain_matrices_by_animal.get(animal.animal_type)) is not None:
+                pain_matrix = total + pain_matrix
+            self.pain_matrices_by_animal[animal.animal_type] = pain_matrix
+            weight = animal.breeding_type_with_weight.animal_product_weight * quantity
+            self.animal_product_weights[animal.animal_type] = (
+                self.animal_product_weights.get(animal.animal_type, 0) + weight
+            )
+        self.resolved_barcodes.append(barcode)
+
+    @property
+    def pain_matrix(self) -> PainMatrix:
+        """Time in pain of all the animals"""
+        return sum(self.pain_matrices_by_animal.values(), PainMatrix.from_pain_levels([]))
+
+
+async def get_basket_pain(items: List[BasketItem], locale: str, deadline: float = BASKET_DEADLINE) -> BasketPain:
+    """
+    Compute the time in pain of a shopping basket.
+
+    The barcodes are canonicalized first, so the quantities of the spellings of the same product are added up.
+
+    Args:
+        items: The barcodes of the basket, with their quantities
+        locale: alpha2 locale (fr, en...) given to get_pain_report
+        deadline: Time given to resolve the products, in seconds
+
+    Returns:
+        The totals of the products resolved before the deadline, with the failed and unresolved barcodes
+    """
+    basket_pain = BasketPain()
+    quantities: Dict[str, int] = {}
+    for item in items:
+        try:
+            barcode = canonicalize_barcode(item.barcode)
+        except InvalidBarcodeException as e:
+            basket_pain.failures[item.barcode] = e
+            continue
+        quantities[barcode] = quantities.get(barcode, 0) + item.quantity
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_BASKET_LOOKUPS)
+
+    async def lookup_pain_report(barcode: str) -> PainReport:
+        async with semaphore:
+            return await get_pain_report(barcode, locale)
+
+    barcodes_by_task = {asyncio.ensure_future(lookup_pain_report(barcode)): barcode for barcode in quantities}
+    pending = set(barcodes_by_task)
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(end - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for task in done:
+                barcode = barcodes_by_task[task]
+                try:
+                    basket_pain.add(barcode, task.result(), quantities[barcode])
+                except BaseAppException as e:
+                    basket_pain.failures[barcode] = e
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if pending:
+        basket_pain.unresolved_barcodes = [barcode for task, barcode in barcodes_by_task.items() if task in pending]
+        logger.warning(f"Basket deadline reached, {len(pending)} products unresolved")
+    return basket_pain
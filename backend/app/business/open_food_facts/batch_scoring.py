@@ -0,0 +1,294 @@
+"""
+Batch scoring of collections of products (the product index or an OFF dump), e.g. after a methodology update.
+
+The products are split into chunks, scored in a pool of processes. Each chunk is scored at once: the egg weights
+of its products are extracted with array operations, their breeding types are detected, then the pain matrices
+of all their animal products come from a single lookup in the pain rate table. The results are streamed
+to an NDJSON or Parquet file as the chunks complete, with one row per animal product.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Protocol
+
+import numpy as np
+import numpy.typing as npt
+from pydantic import BaseModel
+
+from app.business.open_food_facts.egg_weight_calculator import calculate_egg_weights
+from app.business.open_food_facts.pain_rate_table import (
+    PAIN_INTENSITIES,
+    PAIN_TYPES,
+    compute_seconds_in_pain,
+    get_pain_rate_row,
+)
+from app.business.open_food_facts.pain_report_calculator import PainReportCalculator
+from app.schemas.open_food_facts.external import ProductData
+
+logger = logging.getLogger("app")
+
+DEFAULT_CHUNK_SIZE = 2_000
+
+# Columns of the time in pain, in the order of the last two axes of the pain matrices
+SECONDS_IN_PAIN_COLUMNS = [
+    f"{pain_type}_{pain_intensity}_seconds" for pain_type in PAIN_TYPES for pain_intensity in PAIN_INTENSITIES
+]
+
+
+class ScoringReport(BaseModel):
+    """
+    Summary of a batch scoring.
+    """
+
+    scanned_products: int = 0
+    scored_products: int = 0
+    animal_products: int = 0
+    seconds: float = 0
+
+    @property
+    def products_per_second(self) -> float:
+        """Number of scanned products per second"""
+        return self.scanned_products / self.seconds if self.seconds else 0
+
+
+@dataclass(slots=True)
+class ChunkScores:
+    """
+    Pain matrices of the animal products of a chunk of products, as columns with one row per animal product.
+    """
+
+    scanned_products: int
+    barcodes: List[str]
+    animal_types: List[str]
+    breeding_types: List[str]
+    weights: List[float]
+    # Seconds in pain, of shape (animal products, pain types, pain intensities)
+    seconds_in_pain: npt.NDArray[np.int64]
+
+    @property
+    def scored_products(self) -> int:
+        """Number of products with at least one animal product"""
+        return len(set(self.barcodes))
+
+    def to_columns(self) -> Dict[str, List[Any]]:
+        """Return the scores as columns, the pain matrices being flattened into one column per pain level"""
+        seconds_in_pain = self.seconds_in_pain.reshape(len(self.barcodes), len(SECONDS_IN_PAIN_COLUMNS)).T.tolist()
+        return {
+            "code": self.barcodes,
+            "animal_type": self.animal_types,
+            "breeding_type": self.breeding_types,
+            "animal_product_weight": self.weights,
+            **dict(zip(SECONDS_IN_PAIN_COLUMNS, seconds_in_pain, strict=True)),
+        }
+
+    def to_records(self) -> Iterator[Dict[str, Any]]:
+        """Return the scores as one dict per animal product"""
+        columns = self.to_columns()
+        for values in zip(*columns.values(), strict=True):
+            yield dict(zip(columns, values, strict=True))
+
+
+def score_chunk(products: List[Dict[str, Any]]) -> ChunkScores:
+    """
+    Compute the pain matrices of a chunk of products.
+
+    Args:
+        products: The products, as dicts of OFF fields containing at least "code"
+
+    Returns:
+        The scores of the animal products of the chunk
+    """
+    barcodes: List[str] = []
+    animal_types: List[str] = []
+    breeding_types: List[str] = []
+    rows: List[int] = []
+    weights: List[float] = []
+    products_data = [_to_product_data(product) for product in products]
+    egg_weights = calculate_egg_weights(products_data).tolist()
+    for product, product_data, egg_weight in zip(products, products_data, egg_weights, strict=True):
+        calculator = PainReportCalculator(product_data, egg_weight)
+        for animal_type, breeding_type in calculator.breeding_types_with_weights.items():
+            barcodes.append(product["code"])
+            animal_types.append(str(animal_type))
+            breeding_types.append(str(breeding_type.breeding_type))
+            rows.append(get_pain_rate_row(animal_type, breeding_type.breeding_type))
+            weights.append(breeding_type.animal_product_weight)
+
+    return ChunkScores(
+        scanned_products=len(products),
+        barcodes=barcodes,
+        animal_types=animal_types,
+        breeding_types=breeding_types,
+        weights=weights,
+        seconds_in_pain=compute_seconds_in_pain(rows, weights),
+    )
+
+
+def _to_product_data(product: Dict[str, Any]) -> ProductData:
+    """
+    Build the ProductData of the fields used by the scoring, without validating the whole product.
+    The quantities of the dumps can be strings, so they are converted leniently.
+    """
+    try:
+        quantity = float(product.get("product_quantity") or 0) or None
+    except (TypeError, ValueError):
+        quantity = None
+    unit = product.get("product_quantity_unit")
+    text_quantity = product.get("quantity")
+    return ProductData.model_construct(
+        product_name="",
+        categories_tags=product.get("categories_tags") or None,
+        countries_tags=product.get("countries_tags") or None,
+        product_quantity=quantity,
+        product_quantity_unit=str(unit) if unit else None,
+        quantity=text_quantity if isinstance(text_quantity, str) else None,
+        ingredients=product.get("ingredients") or None,
+    )
+
+
+class ScoreWriter(Protocol):
+    """Destination of the scores, written chunk by chunk"""
+
+    def write(self, scores: ChunkScores) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class NdjsonScoreWriter:
+    """
+    Writes the scores as newline-delimited JSON, one animal product per line.
+    """
+
+    def __init__(self, path: Path):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, scores: ChunkScores) -> None:
+        self._file.writelines(json.dumps(record) + "\n" for record in scores.to_records())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetScoreWriter:
+    """
+    Writes the scores as a Parquet file, one row group per chunk.
+
+    Requires pyarrow (uv sync --extra parquet).
+    """
+
+    def __init__(self, path: Path):
+        try:
+            import pyarrow as pa  # type: ignore[import-untyped]
+            import pyarrow.parquet as pq  # type: ignore[import-untyped]
+        except ImportError as e:
+            raise ImportError("pyarrow is required to write Parquet files: uv sync --extra parquet") from e
+
+        self._pa = pa
+        self._schema = pa.schema(
+            [
+                ("code", pa.string()),
+                ("animal_type", pa.string()),
+                ("breeding_type", pa.string()),
+                ("animal_product_weight", pa.float64()),
+                *((column, pa.int64()) for column in SECONDS_IN_PAIN_COLUMNS),
+            ]
+        )
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, scores: ChunkScores) -> None:
+        if scores.barcodes:
+            self._writer.write_table(self._pa.table(scores.to_columns(), schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def open_score_writer(path: Path) -> ScoreWriter:
+    """Return the writer of the format given by the extension of the path (.parquet, NDJSON otherwise)"""
+    if path.suffix == ".parquet":
+        return ParquetScoreWriter(path)
+    return NdjsonScoreWriter(path)
+
+
+def iter_chunks(products: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Split the products into lists of chunk_size products"""
+    iterator = iter(products)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def _score_chunks_in_pool(
+    executor: ProcessPoolExecutor, chunks: Iterable[List[Dict[str, Any]]], max_pending_chunks: int
+) -> Iterator[ChunkScores]:
+    """
+    Score the chunks in the pool, in order. At most max_pending_chunks are submitted at once,
+    so the products are read as fast as they are scored and never all loaded in memory.
+    """
+    pending: Deque[Future[ChunkScores]] = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(score_chunk, chunk))
+        if len(pending) >= max_pending_chunks:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def score_products(
+    products: Iterable[Dict[str, Any]],
+    writer: ScoreWriter,
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress_interval: float = 10,
+) -> ScoringReport:
+    """
+    Score a collection of products and stream the pain matrices of their animal products to the writer.
+
+    Args:
+        products: The products, as dicts of OFF fields containing at least "code"
+        writer: Destination of the scores
+        workers: Number of worker processes (default: number of CPUs), 1 to score in the current process
+        chunk_size: Number of products scored at once by a worker
+        progress_interval: Minimum delay between two progress logs, in seconds
+
+    Returns:
+        The scoring report, with the throughput
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = iter_chunks(products, chunk_size)
+
+    report = ScoringReport()
+    start = last_progress_log = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        results = (
+            _score_chunks_in_pool(executor, chunks, max_pending_chunks=2 * workers)
+            if executor
+            else map(score_chunk, chunks)
+        )
+        for scores in results:
+            writer.write(scores)
+            report.scanned_products += scores.scanned_products
+            report.scored_products += scores.scored_products
+            report.animal_products += len(scores.barcodes)
+
+            now = time.perf_counter()
+            if now - last_progress_log >= progress_interval:
+                last_progress_log = now
+                report.seconds = now - start
+                logger.info(
+                    f"{report.scanned_products} products scanned, {report.scored_products} scored "
+                    f"({report.products_per_second:.0f} products/s)"
+                )
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    report.seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,107 @@
+"""
+Inverted index of the tags used to detect the breeding types of the animal products.
+
+TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE is compiled once into a mapping from each tag to the (animal type, breeding type)
+pairs it detects, so the detection is a single pass over the tags of a product with set lookups,
+whatever the number of rule tags.
+
+With the OFF taxonomy index, the tags descending from a rule tag (e.g. a subcategory of en:cage-chicken-eggs)
+detect its breeding type too: they are added to the mapping with the pairs of the rule tags among their ancestors,
+so the taxonomy isn't needed anymore to match the tags of the products.
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Set, Tuple
+
+from app.business.open_food_facts.taxonomy import TaxonomyIndex, get_taxonomy_index
+from app.enums.open_food_facts.enums import (
+    TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE,
+    AnimalType,
+    BroilerChickenBreedingType,
+    LayingHenBreedingType,
+)
+
+BreedingType = LayingHenBreedingType | BroilerChickenBreedingType
+
+
+@dataclass(slots=True)
+class BreedingTypeMatch:
+    """
+    Breeding types detected from the tags of a product.
+    """
+
+    # Breeding type of each animal type detected without ambiguity, in the order of the rules
+    breeding_types: Dict[AnimalType, BreedingType] = field(default_factory=dict)
+    # Animal types whose tags match several breeding types, which are left out of breeding_types
+    conflicting_animal_types: Set[AnimalType] = field(default_factory=set)
+
+
+class BreedingTypeIndex:
+    """
+    Index from each tag to the (animal type, breeding type) pairs it detects.
+    """
+
+    def __init__(
+        self,
+        tags_by_animal_type_and_breeding_type: Mapping[AnimalType, Mapping[Any, Iterable[str]]],
+        taxonomy: TaxonomyIndex | None = None,
+    ):
+        """
+        Args:
+            tags_by_animal_type_and_breeding_type: Tags detecting each breeding type, by animal type
+            taxonomy: Ancestry index of the OFF taxonomies, to match the descendants of the rule tags too
+        """
+        breeding_types_by_tag: Dict[str, List[Tuple[AnimalType, BreedingType]]] = {}
+        for animal_type, tags_by_breeding_type in tags_by_animal_type_and_breeding_type.items():
+            for breeding_type, tags in tags_by_breeding_type.items():
+                for tag in tags:
+                    breeding_types = breeding_types_by_tag.setdefault(tag, [])
+                    if (animal_type, breeding_type) not in breeding_types:
+                        breeding_types.append((animal_type, breeding_type))
+
+        self.tags = frozenset(breeding_types_by_tag)
+        if taxonomy is not None:
+            rule_tags = list(breeding_types_by_tag)
+            rule_breeding_types = [tuple(breeding_types_by_tag[rule_tag]) for rule_tag in rule_tags]
+            for tag, bitset in taxonomy.get_ancestors_bitsets(rule_tags).items():
+                breeding_types = breeding_types_by_tag.setdefault(tag, [])
+                for index, pairs in enumerate(rule_breeding_types):
+                    if bitset >> index & 1:
+                        breeding_types.extend(pair for pair in pairs if pair not in breeding_types)
+
+        self._breeding_types_by_tag = {tag: tuple(pairs) for tag, pairs in breeding_types_by_tag.items()}
+        self._animal_types = tuple(tags_by_animal_type_and_breeding_type)
+
+    def match(self, tags: Iterable[str] | None) -> BreedingTypeMatch:
+        """
+        Detect the breeding type of each animal type from the tags of a product.
+
+        An animal type whose tags match several breeding types is a conflict: its breeding type is unknown.
+
+        Args:
+            tags: Tags of the product (e.g. its categories_tags)
+
+        Returns:
+            The detected breeding types, and the conflicting animal types
+        """
+        result = BreedingTypeMatch()
+        if not tags:
+            return result
+
+        matched_breeding_types: Dict[AnimalType, BreedingType] = {}
+        for tag in tags:
+            for animal_type, breeding_type in self._breeding_types_by_tag.get(tag, ()):
+                if matched_breeding_types.setdefault(animal_type, breeding_type) != breeding_type:
+                    result.conflicting_animal_types.add(animal_type)
+
+        for animal_type in self._animal_types:
+            if animal_type in matched_breeding_types and animal_type not in result.conflicting_animal_types:
+                result.breeding_types[animal_type] = matched_breeding_types[animal_type]
+        return result
+
+
+@lru_cache
+def get_breeding_type_index() -> BreedingTypeIndex:
+    """Return the index compiled from TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE, with the OFF taxonomy index if available"""
+    return BreedingTypeIndex(TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE, get_taxonomy_index())
@@ -0,0 +1,85 @@
+"""
+Share of egg in the weight of composite products (mayonnaise, pasta, cakes...), from their OFF ingredients tree.
+
+OFF estimates the percentage of each ingredient of the tree in the whole product (percent_estimate), so the share
+of egg is the sum of the estimates of the egg ingredients, without looking into their own sub-ingredients.
+"""
+
+from functools import lru_cache
+from typing import Any, FrozenSet, List
+
+from app.business.open_food_facts.taxonomy import get_taxonomy_index
+
+# Ingredient whose descendants in the OFF ingredients taxonomy are egg ingredients
+EGG_INGREDIENT_ROOT = "en:egg"
+
+# Egg ingredients of the OFF ingredients taxonomy, used without the taxonomy index
+EGG_INGREDIENT_IDS = frozenset(
+    {
+        "en:egg",
+        "en:chicken-egg",
+        "en:whole-egg",
+        "en:fresh-egg",
+        "en:free-range-egg",
+        "en:barn-egg",
+        "en:organic-egg",
+        "en:pasteurised-egg",
+        "en:liquid-egg",
+        "en:liquid-whole-egg",
+        "en:pasteurised-whole-egg",
+        "en:dried-egg",
+        "en:egg-powder",
+        "en:whole-egg-powder",
+        "en:egg-yolk",
+        "en:free-range-egg-yolk",
+        "en:pasteurised-egg-yolk",
+        "en:egg-yolk-powder",
+        "en:egg-white",
+        "en:free-range-egg-white",
+        "en:pasteurised-egg-white",
+        "en:egg-white-powder",
+    }
+)
+
+
+@lru_cache
+def get_egg_ingredient_ids() -> FrozenSet[str]:
+    """Return the egg ingredient ids, with the descendants of en:egg in the taxonomy index if it is available"""
+    taxonomy = get_taxonomy_index()
+    if taxonomy is None:
+        return EGG_INGREDIENT_IDS
+    return EGG_INGREDIENT_IDS | frozenset(taxonomy.get_descendants(EGG_INGREDIENT_ROOT))
+
+
+def get_egg_share(ingredients: List[dict[str, Any]] | None) -> float | None:
+    """
+    Compute the share of egg in the weight of a product from its ingredients tree.
+
+    The tree is walked iteratively, each ingredient being visited at most once, whatever its depth.
+
+    Args:
+        ingredients: The OFF ingredients tree of the product
+
+    Returns:
+        The share of egg (between 0 and 1), or None if no egg ingredient has a percent estimate
+    """
+    if not ingredients:
+        return None
+
+    egg_ingredient_ids = get_egg_ingredient_ids()
+    egg_percent = 0.0
+    found_egg = False
+    stack = [ingredients]
+    while stack:
+        for ingredient in stack.pop():
+            if not isinstance(ingredient, dict):
+                continue
+            if ingredient.get("id") in egg_ingredient_ids:
+                percent_estimate = ingredient.get("percent_estimate")
+                if isinstance(percent_estimate, (int, float)):
+                    egg_percent += percent_estimate
+                    found_egg = True
+            elif isinstance(sub_ingredients := ingredient.get("ingredients"), list):
+                stack.append(sub_ingredients)
+
+    return min(max(egg_percent / 100, 0), 1) if found_egg else None
@@ -1,23 +1,83 @@
+"""
+Extraction of the weight of the eggs of a product, from its quantity fields and its category tags.
+
+The weight comes from the first source giving a nonzero weight:
+- product_quantity and product_quantity_unit (e.g. 600 g, 12 pcs)
+- the free-text quantity (e.g. "12 x 53 g", "6 oeufs", "2 × 6 pcs")
+- the pack tags (e.g. en:pack-of-12), with the weight of one egg of the size-grade tags (e.g. en:large-eggs)
+
+A number of eggs is converted with the weight of one egg of the size-grade tags, or the average egg weight.
+For composite products, the weight is multiplied by the share of egg estimated from their ingredients tree.
+The patterns are compiled once, and the parsed quantities and tags are memoized, as the same strings come up
+in many products. calculate_egg_weights computes the weights of many products at once with NumPy.
+"""
+
 import re
-from typing import List
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Sequence
 
+import numpy as np
+import numpy.typing as npt
+
+from app.business.open_food_facts.egg_ingredients import get_egg_share
 from app.schemas.open_food_facts.external import ProductData
 
 AVERAGE_EGG_WEIGHT = 50
 
+# Weight in grams of one unit of quantity
+GRAMS_BY_UNIT = {
+    "g": 1.0,
+    "gr": 1.0,
+    "grs": 1.0,
+    "gramm": 1.0,
+    "gramme": 1.0,
+    "grammes": 1.0,
+    "gram": 1.0,
+    "grams": 1.0,
+    "kg": 1000.0,
+    "oz": 28.35,
+    "lb": 453.59,
+    "lbs": 453.59,
+    "ml": 1.03,
+    "cl": 10.3,
+    "l": 1030.0,
+    "litre": 1030.0,
+    "litres": 1030.0,
+    "liter": 1030.0,
+    "liters": 1030.0,
+}
 
-UNIT_CONVERSIONS = {
-    "pcs": lambda q: float(q) * AVERAGE_EGG_WEIGHT,
-    "sans": lambda q: float(q) * AVERAGE_EGG_WEIGHT,
-    "unite": lambda q: float(q) * AVERAGE_EGG_WEIGHT,
-    "g": lambda q: float(q),
-    "gr": lambda q: float(q),
-    "gramm": lambda q: float(q),
-    "oz": lambda q: float(q) * 28.35,
-    "lbs": lambda q: float(q) * 453.59,
-    "ml": lambda q: float(q) * 1.03,
-    "l": lambda q: float(q) * 1030,
-    "litres": lambda q: float(q) * 1030,
+# Units counting eggs (normalized: lowercase, without accents)
+EGG_COUNT_UNITS = {
+    "pcs",
+    "pc",
+    "pce",
+    "pces",
+    "piece",
+    "pieces",
+    "sans",
+    "u",
+    "un",
+    "unite",
+    "unites",
+    "unit",
+    "units",
+    "egg",
+    "eggs",
+    "oeuf",
+    "oeufs",
+    "uovo",
+    "uova",
+    "ei",
+    "eier",
+    "huevo",
+    "huevos",
+    "ovo",
+    "ovos",
+    "st",
+    "stk",
+    "stuck",
 }
 
 EGG_WEIGHTS_BY_TAG = {
@@ -25,51 +85,94 @@ EGG_WEIGHTS_BY_TAG = {
     55: {"grade-a-eggs", "grade-aa-eggs"},
     50: {"medium-eggs"},
 }
+_EGG_WEIGHT_BY_TAG = {tag: weight for weight, tags in EGG_WEIGHTS_BY_TAG.items() for tag in tags}
 
+# A quantity: optional multipliers, a number and a unit (e.g. "2 × 6 pcs", "12 x 53 g", "1,5 kg")
+QUANTITY_PATTERN = re.compile(r"(?P<multipliers>(?:\d+\s*[x×*]\s*)*)(?P<number>\d+(?:[.,]\d+)?)\s*(?P<unit>[a-z]+)?")
+MULTIPLIER_PATTERN = re.compile(r"\d+")
+PACK_TAG_PATTERN = re.compile(r"(?:pack|box|tray)s?-of-(\d+)")
 
-def get_egg_weight_by_tag(categories_tags: List[str]) -> int:
-    """
-    Returns the standard weight of one egg based on category tags.
-    """
-    for weight, tags in EGG_WEIGHTS_BY_TAG.items():
-        if any(tag in categories_tags for tag in tags):
-            return weight
-    return 0
 
+class ParsedQuantity(NamedTuple):
+    """Quantity of a product, in grams or in number of eggs"""
 
-def get_number_of_eggs(categories_tags: List[str]) -> int:
-    """
-    Extracts the number of eggs from tags.
-    TODO: Add support for other tags
-    """
-    for tag in categories_tags:
-        match = re.search(r"pack-of-(\d+)", tag)
-        if match:
-            return int(match.group(1))
-    return 0
+    grams: float = 0
+    eggs: float = 0
 
+    def get_weight(self, egg_weight: float) -> float:
+        """Return the weight in grams, the eggs weighing egg_weight each"""
+        return self.grams + self.eggs * egg_weight
 
-def get_total_egg_weight_from_tags(categories_tags: List[str]) -> float:
-    """
-    Calculates total egg weight based on standard weights and pack size.
-    """
-    num_eggs = get_number_of_eggs(categories_tags)
-    weight_per_egg = get_egg_weight_by_tag(categories_tags)
-    return weight_per_egg * num_eggs
+
+class EggTags(NamedTuple):
+    """Number of eggs and weight of one egg given by the tags of a product (0 if unknown)"""
+
+    pack_size: int = 0
+    egg_weight: float = 0
+
+
+NO_QUANTITY = ParsedQuantity()
+
+
+def _normalize(text: str) -> str:
+    """Lowercase the text and remove its accents (œ becoming oe)"""
+    text = text.lower().replace("œ", "oe")
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
 
 
-def get_egg_weight_from_quantity(quantity: float, unit: str) -> float:
+@lru_cache(maxsize=4_096)
+def get_unit_quantity(unit: str) -> ParsedQuantity:
+    """Return the quantity of one unit (e.g. 1000 grams for kg, 1 egg for pcs), empty if the unit is unknown"""
+    normalized_unit = _normalize(unit).strip().rstrip(".")
+    if normalized_unit in EGG_COUNT_UNITS:
+        return ParsedQuantity(eggs=1)
+    return ParsedQuantity(grams=GRAMS_BY_UNIT.get(normalized_unit, 0))
+
+
+@lru_cache(maxsize=65_536)
+def parse_quantity(quantity: str) -> ParsedQuantity:
     """
-    Converts product quantity and unit into weight in grams.
+    Parse a free-text OFF quantity, e.g. "12 x 53 g", "6 oeufs", "2 × 6 pcs".
+
+    The first number followed by a known unit is used, multiplied by the numbers before it separated by x.
+
+    Returns:
+        The quantity in grams or in number of eggs, empty if it can't be parsed
     """
-    unit_key = unit.lower()
-    converter = UNIT_CONVERSIONS.get(unit_key)
-    if converter:
-        try:
-            return converter(quantity)
-        except (ValueError, TypeError):
-            pass
-    return 0
+    for match in QUANTITY_PATTERN.finditer(_normalize(quantity)):
+        unit = match.group("unit")
+        if not unit:
+            continue
+        unit_quantity = get_unit_quantity(unit)
+        if unit_quantity == NO_QUANTITY:
+            continue
+        count = float(match.group("number").replace(",", "."))
+        for multiplier in MULTIPLIER_PATTERN.findall(match.group("multipliers")):
+            count *= int(multiplier)
+        return ParsedQuantity(grams=unit_quantity.grams * count, eggs=unit_quantity.eggs * count)
+    return NO_QUANTITY
+
+
+@lru_cache(maxsize=65_536)
+def _parse_egg_tag(tag: str) -> EggTags:
+    """Return the pack size or the egg weight given by one tag (with or without language prefix)"""
+    tag = tag.partition(":")[2] or tag
+    if egg_weight := _EGG_WEIGHT_BY_TAG.get(tag):
+        return EggTags(egg_weight=egg_weight)
+    if match := PACK_TAG_PATTERN.search(tag):
+        return EggTags(pack_size=int(match.group(1)))
+    return EggTags()
+
+
+def parse_egg_tags(categories_tags: Iterable[str]) -> EggTags:
+    """Return the pack size and the egg weight given by the tags, in one pass (the first tag giving each wins)"""
+    pack_size = 0
+    egg_weight: float = 0
+    for tag in categories_tags:
+        tag_pack_size, tag_egg_weight = _parse_egg_tag(tag)
+        pack_size = pack_size or tag_pack_size
+        egg_weight = egg_weight or tag_egg_weight
+    return EggTags(pack_size, egg_weight)
 
 
 def calculate_egg_weight(product_data: ProductData) -> float:
@@ -79,13 +182,67 @@ def calculate_egg_weight(product_data: ProductData) -> float:
     Returns:
         The egg weight if applicable.
     """
-    quantity = product_data.product_quantity
-    unit = product_data.product_quantity_unit
-    categories_tags = product_data.categories_tags or []
+    return _get_product_weight(product_data) * _get_egg_share_factor(product_data)
+
+
+def _get_product_weight(product_data: ProductData) -> float:
+    """Return the weight of the product from the first source giving a nonzero weight"""
+    pack_size, egg_weight = parse_egg_tags(product_data.categories_tags or ())
+    egg_weight = egg_weight or AVERAGE_EGG_WEIGHT
+
+    if product_data.product_quantity and product_data.product_quantity_unit:
+        unit_quantity = get_unit_quantity(product_data.product_quantity_unit)
+        if (weight := product_data.product_quantity * unit_quantity.get_weight(egg_weight)) > 0:
+            return weight
 
-    if quantity and unit:
-        egg_weight = get_egg_weight_from_quantity(quantity, unit)
-    else:
-        egg_weight = get_total_egg_weight_from_tags(categories_tags)
+    if product_data.quantity and (weight := parse_quantity(product_data.quantity).get_weight(egg_weight)) > 0:
+        return weight
 
-    return egg_weight
+    return pack_size * egg_weight
+
+
+def _get_egg_share_factor(product_data: ProductData) -> float:
+    """Return the share of egg of the product, 1 if its ingredients don't give it (e.g. a box of eggs)"""
+    egg_share = get_egg_share(product_data.get_ingredients())
+    return 1 if egg_share is None else egg_share
+
+
+def calculate_egg_weights(products: Sequence[ProductData]) -> npt.NDArray[np.float64]:
+    """
+    Calculates the weight of eggs of many products at once, with the same rules as calculate_egg_weight.
+
+    The strings are parsed through the memoized parsers, then the weights of all the sources are computed
+    with array operations and the first nonzero one is kept for each product.
+
+    Returns:
+        The egg weight of each product
+    """
+    egg_tags = [parse_egg_tags(product.categories_tags or ()) for product in products]
+    pack_sizes = np.array([tags.pack_size for tags in egg_tags], dtype=np.float64)
+    egg_weights = np.array([tags.egg_weight or AVERAGE_EGG_WEIGHT for tags in egg_tags], dtype=np.float64)
+
+    product_quantities = np.array(
+        [
+            product.product_quantity if product.product_quantity and product.product_quantity_unit else 0
+            for product in products
+        ],
+        dtype=np.float64,
+    )
+    unit_quantities = np.array(
+        [
+            get_unit_quantity(product.product_quantity_unit) if product.product_quantity_unit else NO_QUANTITY
+            for product in products
+        ],
+        dtype=np.float64,
+    ).reshape(len(products), 2)
+    text_quantities = np.array(
+        [parse_quantity(product.quantity) if product.quantity else NO_QUANTITY for product in products],
+        dtype=np.float64,
+    ).reshape(len(products), 2)
+
+    weights = product_quantities * (unit_quantities[:, 0] + unit_quantities[:, 1] * egg_weights)
+    text_weights = text_quantities[:, 0] + text_quantities[:, 1] * egg_weights
+    tag_weights = pack_sizes * egg_weights
+    egg_share_factors = np.array([_get_egg_share_factor(product) for product in products], dtype=np.float64)
+    product_weights = np.where(weights > 0, weights, np.where(text_weights > 0, text_weights, tag_weights))
+    return product_weights * egg_share_factors
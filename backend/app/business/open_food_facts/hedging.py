@@ -0,0 +1,222 @@
+"""
+Hedged requests: when the primary source of a product is slower than usual, the secondary source is called too,
+and the first valid result wins. The hedge delay is a latency percentile of the primary source.
+
+The calls cancelled because the other source won are recorded with their elapsed time, a lower bound of their latency,
+so the slow calls are not left out of the percentiles and the hedge delay follows the true tail latency.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Generic, List, Tuple, TypeVar
+
+from pydantic import BaseModel
+
+from app.config.exceptions import ProductNotFoundException
+
+logger = logging.getLogger("app")
+
+T = TypeVar("T")
+
+# Upper bounds of the histogram buckets, in seconds: from 5ms to ~40s, 25% wider at each bucket
+LATENCY_BUCKETS_IN_SECONDS = [0.005 * 1.25**i for i in range(41)]
+
+
+class LatencySnapshot(BaseModel):
+    """
+    Summary of the latencies of a source, for monitoring.
+    """
+
+    samples: int
+    p50: float | None
+    p95: float | None
+    p99: float | None
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies with exponential buckets.
+
+    The counts are halved when they reach max_samples, so the percentiles follow the recent behavior of the source.
+    """
+
+    def __init__(self, max_samples: int = 10_000):
+        self.max_samples = max_samples
+        self._counts = [0] * (len(LATENCY_BUCKETS_IN_SECONDS) + 1)
+        self._total = 0
+
+    def record(self, seconds: float) -> None:
+        """Add a latency to the histogram"""
+        self._counts[bisect_left(LATENCY_BUCKETS_IN_SECONDS, seconds)] += 1
+        self._total += 1
+        if self._total >= self.max_samples:
+            self._counts = [count // 2 for count in self._counts]
+            self._total = sum(self._counts)
+
+    def count(self) -> int:
+        return self._total
+
+    def percentile(self, percentile: float) -> float | None:
+        """
+        Return the upper bound of the bucket containing the given percentile (between 0 and 1),
+        or None if the histogram is empty. Latencies above the last bucket are reported as infinite.
+        """
+        if not self._total:
+            return None
+
+        threshold = percentile * self._total
+        cumulative = 0
+        for bucket_index, count in enumerate(self._counts):
+            cumulative += count
+            if cumulative >= threshold and count:
+                return (
+                    LATENCY_BUCKETS_IN_SECONDS[bucket_index]
+                    if bucket_index < len(LATENCY_BUCKETS_IN_SECONDS)
+                    else float("inf")
+                )
+        return float("inf")
+
+    def snapshot(self) -> LatencySnapshot:
+        return LatencySnapshot(
+            samples=self._total, p50=self.percentile(0.5), p95=self.percentile(0.95), p99=self.percentile(0.99)
+        )
+
+
+class HedgedFetcher(Generic[T]):
+    """
+    Fetch a value from a primary source, and hedge with a secondary source if the primary one is slow or fails.
+
+    The secondary source is called when the primary one has not answered after the hedge delay,
+    which is the configured latency percentile of the primary source (bounded by min_delay and max_delay),
+    or default_delay until enough latencies have been recorded.
+    The first valid result is returned, and the other call is cancelled.
+    A final error of the primary source (e.g. an unknown product) is raised without calling the secondary source.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        percentile: float = 0.95,
+        default_delay: float = 1.0,
+        min_delay: float = 0.05,
+        max_delay: float = 3.0,
+        min_samples: int = 20,
+        is_final_error: Callable[[BaseException], bool] = lambda exception: False,
+    ):
+        """
+        Args:
+            enabled: If False, only the primary source is called
+            percentile: Latency percentile of the primary source after which the secondary one is called
+            default_delay: Hedge delay used until min_samples latencies have been recorded, in seconds
+            min_delay: Minimum hedge delay, in seconds
+            max_delay: Maximum hedge delay, in seconds
+            min_samples: Number of latencies needed before the histogram drives the hedge delay
+            is_final_error: Check if an error of the primary source is an answer that the secondary source
+                can't change, so it is raised as is
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.is_final_error = is_final_error
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def get_hedge_delay(self, source_name: str) -> float:
+        """Return the delay after which the secondary source is called, in seconds"""
+        histogram = self.histograms.get(source_name)
+        if histogram is None or histogram.count() < self.min_samples:
+            return self.default_delay
+        delay = histogram.percentile(self.percentile) or self.default_delay
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    async def fetch(
+        self,
+        primary: Tuple[str, Callable[[], Awaitable[T]]],
+        secondary: Tuple[str, Callable[[], Awaitable[T]]],
+    ) -> T:
+        """
+        Fetch the value from the primary source, hedged by the secondary source.
+
+        Args:
+            primary: Name and coroutine function of the primary source
+            secondary: Name and coroutine function of the secondary source
+
+        Returns:
+            The first valid result
+        Raises:
+            The exception of the primary source if both sources fail
+        """
+        primary_name, primary_function = primary
+        primary_task = asyncio.ensure_future(self._timed(primary_name, primary_function))
+        if not self.enabled:
+            return await primary_task
+
+        pending = {primary_task}
+        errors: List[BaseException] = []
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.get_hedge_delay(primary_name))
+            if done and (result := self._get_result(primary_task, errors)) is not None:
+                return result[0]
+            if done and self.is_final_error(errors[0]):
+                raise errors[0]
+
+            secondary_name, secondary_function = secondary
+            logger.info(f"Hedging {primary_name} with {secondary_name}")
+            pending.add(asyncio.ensure_future(self._timed(secondary_name, secondary_function)))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if (result := self._get_result(task, errors)) is not None:
+                        return result[0]
+                    if task is primary_task and self.is_final_error(errors[-1]):
+                        raise errors[-1]
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # Both sources failed: the error of the primary source is the reference (e.g. a 5xx of OFF API v3
+        # must not be hidden by a "not found" of search-a-licious, which would be cached as a missing product)
+        if primary_task.done() and not primary_task.cancelled() and (primary_error := primary_task.exception()):
+            raise primary_error
+        raise errors[0]
+
+    def latencies(self) -> Dict[str, LatencySnapshot]:
+        """Return the latency summary of each source"""
+        return {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+
+    async def _timed(self, source_name: str, function: Callable[[], Awaitable[T]]) -> T:
+        """Run the function and record its latency, or its elapsed time if it fails or is cancelled"""
+        start = time.perf_counter()
+        try:
+            return await function()
+        finally:
+            self.histograms.setdefault(source_name, LatencyHistogram()).record(time.perf_counter() - start)
+
+    @staticmethod
+    def _get_result(task: asyncio.Future[T], errors: List[BaseException]) -> Tuple[T] | None:
+        """Return the result of a done task wrapped in a tuple, or None if it failed (its exception is kept)"""
+        if exception := task.exception():
+            errors.append(exception)
+            return None
+        return (task.result(),)
+
+
+def is_final_product_error(exception: BaseException) -> bool:
+    """Check if a product is known to be unusable (e.g. unknown to OFF), unlike a failure of the source"""
+    return isinstance(exception, ProductNotFoundException) and exception.reason is not None
+
+
+@lru_cache()
+def get_product_hedged_fetcher() -> HedgedFetcher:
+    return HedgedFetcher(
+        enabled=os.getenv("OFF_HEDGED_FETCH", "true").lower() in ("1", "true", "yes"),
+        percentile=float(os.getenv("OFF_HEDGE_PERCENTILE", "0.95")),
+        is_final_error=is_final_product_error,
+    )
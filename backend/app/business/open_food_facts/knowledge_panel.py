@@ -1,16 +1,53 @@
+import asyncio
 import logging
-from typing import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Tuple
 
 import httpx
 from pydantic import HttpUrl, ValidationError
 
+from app.business.open_food_facts.barcode import canonicalize_barcode
+from app.business.open_food_facts.hedging import get_product_hedged_fetcher
+from app.business.open_food_facts.negative_cache import get_negative_cache
 from app.business.open_food_facts.pain_report_calculator import PainReportCalculator
-from app.config.exceptions import ResourceNotFoundException
-from app.enums.open_food_facts.enums import AnimalType, PainType
-from app.schemas.open_food_facts.external import ProductData, ProductResponse, ProductResponseSearchALicious
+from app.business.open_food_facts.product_cache import get_product_cache
+from app.business.open_food_facts.product_index import get_product_index
+from app.business.open_food_facts.product_store import get_product_store
+from app.business.open_food_facts.single_flight import SingleFlight
+from app.business.open_food_facts.upstream_guard import OFF_V3, SEARCH_A_LICIOUS, get_upstream_guard
+from app.config.exceptions import (
+    BaseAppException,
+    InvalidBarcodeException,
+    ProductNotFoundException,
+    ResourceNotFoundException,
+    ServiceUnavailableException,
+)
+from app.config.http_client import get_http_client
+from app.config.i18n import get_i18n
+from app.enums.open_food_facts.enums import (
+    AnimalType,
+    BroilerChickenBreedingType,
+    LayingHenBreedingType,
+    PainIntensity,
+    PainType,
+    ProductFailureReason,
+)
+from app.schemas.open_food_facts.external import (
+    OFF_PRODUCT_FIELDS,
+    PRODUCT_RESPONSE_ADAPTER,
+    PRODUCT_RESPONSE_SEARCH_A_LICIOUS_ADAPTER,
+    PRODUCT_RESPONSE_SEARCH_A_LICIOUS_BATCH_ADAPTER,
+    ProductData,
+)
 from app.schemas.open_food_facts.internal import (
+    AnimalBreedingTypesComparison,
     AnimalPainReport,
     BreedingTypeAndWeight,
+    BreedingTypePain,
+    BreedingTypesComparison,
+    BreedingTypesComparisonResponse,
     Element,
     KnowledgePanelResponse,
     PainReport,
@@ -23,161 +60,674 @@ from app.schemas.open_food_facts.internal import (
 
 logger = logging.getLogger("app")
 
+# Product lookups in flight, by barcode
+product_data_lookups: SingleFlight[ProductData] = SingleFlight()
+
+# Batch lookups: number of barcodes in a single search-a-licious query, and concurrent calls to OFF
+MAX_BARCODES_PER_SEARCH = 50
+MAX_CONCURRENT_BATCH_LOOKUPS = 8
 
-async def get_data_from_off_v3(barcode: str, locale: str) -> ProductData:
+
+async def get_data_from_off_v3(barcode: str) -> ProductData:
     """
     Retrieve useful product data from OFF API v3 to compute the breeding type and the weight of animal product
 
+    Only the fields of ProductData are requested (with the names in all the supported locales),
+    and the response is validated directly from its raw JSON bytes.
     If an error occurs, we raise a ResourceNotFoundException to return a clean response to OFF
 
     Args:
         barcode: The product barcode
-        locale: alpha2 locale (fr, en...)
     Returns:
         A ProductData containing the name, image_url, categories, labels tags and other tags
     Raises:
         ResourceNotFoundException: If the product cannot be found or data validation fails
     """
     url = f"https://world.openfoodfacts.org/api/v3/product/{barcode}.json"
-    product_name_with_locale = f"product_name_{locale}"
+    params = {"fields": ",".join(get_requested_product_fields())}
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
+        async with get_upstream_guard(OFF_V3).call():
+            response = await get_http_client().get(url, params=params)
             response.raise_for_status()  # Raise exception for 4XX/5XX responses
-            json_response = response.json()
+    except ServiceUnavailableException:
+        raise
     except Exception as e:
         logger.warning(f"Can't get product data from OFF API: {barcode}")
-        raise ResourceNotFoundException(f"Can't get product data from OFF API: {barcode}") from e
-
-    if product := json_response.get("product"):
-        if product_name_with_locale in product:
-            product["product_name"] = product[product_name_with_locale]
-    else:
-        raise ResourceNotFoundException(f"No hits returned by OFF API: {barcode}")
+        reason = ProductFailureReason.UPSTREAM_NOT_FOUND if _is_not_found_error(e) else None
+        raise ProductNotFoundException(f"Can't get product data from OFF API: {barcode}", reason) from e
 
     try:
-        product_response = ProductResponse.model_validate(json_response)
-    except Exception as e:
+        product_response = PRODUCT_RESPONSE_ADAPTER.validate_json(response.content)
+    except ValidationError as e:
+        if any(error["type"] == "missing" and error["loc"] == ("product",) for error in e.errors()):
+            raise ProductNotFoundException(
+                f"No hits returned by OFF API: {barcode}", ProductFailureReason.UPSTREAM_NOT_FOUND
+            ) from e
         logger.error(f"Failed to validate product data: {e}")
-        raise ResourceNotFoundException(f"Failed to validate product data retrieved from OFF: {barcode}") from e
+        raise ProductNotFoundException(
+            f"Failed to validate product data retrieved from OFF: {barcode}", ProductFailureReason.VALIDATION_FAILURE
+        ) from e
 
     return product_response.product
 
 
-async def get_data_from_off_search_a_licious(barcode: str, locale: str) -> ProductData:
+async def get_data_from_off_search_a_licious(barcode: str) -> ProductData:
     """
     Retrieve useful product data from OFF search-a-licious API
     to compute the breeding type and the weight of animal product
 
+    Only the fields of ProductData are requested (with the names in all the supported locales),
+    and the response is validated directly from its raw JSON bytes.
     If an error occurs, we raise a ResourceNotFoundException to return a clean response to OFF
 
     Args:
         barcode: The product barcode
-        locale: alpha2 locale (fr, en...)
     Returns:
         A ProductData containing the name, image_url, categories and labels tags
     Raises:
         ResourceNotFoundException: If the product cannot be found or data validation fails
     """
     url = "https://search.openfoodfacts.org/search"
-    product_name_with_locale = f"product_name_{locale}"
-    tags = [
-        "categories_tags",
-        "labels_tags",
-        "image_url",
-        "product_name",
-        product_name_with_locale,
-        "product_quantity_unit",
-        "product_quantity",
-        "allergens_tags",
-        "ingredients_tags",
-        "ingredients",
-        "countries",
-        "countries_tags",
-    ]
-    params = {"q": f"code:{barcode}", "fields": ",".join(tags)}
+    params = {"q": f"code:{barcode}", "fields": ",".join(get_requested_product_fields())}
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
+        async with get_upstream_guard(SEARCH_A_LICIOUS).call():
+            response = await get_http_client().get(url, params=params)
             response.raise_for_status()  # Raise exception for 4XX/5XX responses
-            json_response = response.json()
+    except ServiceUnavailableException:
+        raise
     except Exception as e:
         logger.warning(f"Can't get product data from OFF API: {barcode}")
-        raise ResourceNotFoundException(f"Can't get product data from OFF API: {barcode}") from e
-
-    hits = json_response.get("hits")
-    if hits and isinstance(hits, list) and product_name_with_locale in hits[0]:
-        hits[0]["product_name"] = hits[0][product_name_with_locale]
+        reason = ProductFailureReason.UPSTREAM_NOT_FOUND if _is_not_found_error(e) else None
+        raise ProductNotFoundException(f"Can't get product data from OFF API: {barcode}", reason) from e
 
     try:
-        product_response = ProductResponseSearchALicious.model_validate(json_response)
+        product_response = PRODUCT_RESPONSE_SEARCH_A_LICIOUS_ADAPTER.validate_json(response.content)
     except ValidationError as e:
         logger.error(f"Failed to validate product data: {e}")
-        raise ResourceNotFoundException(f"Failed to validate product data retrieved from OFF: {barcode}") from e
+        raise ProductNotFoundException(
+            f"Failed to validate product data retrieved from OFF: {barcode}", ProductFailureReason.VALIDATION_FAILURE
+        ) from e
 
     if not product_response.hits:
         logger.warning(f"No hits found for params: {params}")
-        raise ResourceNotFoundException(f"No hits returned by OFF API: {barcode}")
+        raise ProductNotFoundException(
+            f"No hits returned by OFF API: {barcode}", ProductFailureReason.UPSTREAM_NOT_FOUND
+        )
 
     product_data = product_response.hits[0]
 
     return product_data
 
 
+def get_requested_product_fields() -> List[str]:
+    """Return the OFF fields to request: the fields of ProductData, and the product names in the supported locales"""
+    return [*OFF_PRODUCT_FIELDS, *(f"product_name_{locale}" for locale in get_i18n().get_supported_locales())]
+
+
+def _is_not_found_error(exception: Exception) -> bool:
+    """Check if the OFF API answered that the product doesn't exist"""
+    return isinstance(exception, httpx.HTTPStatusError) and exception.response.status_code == 404
+
+
+async def get_data_from_off_search_a_licious_batch(barcodes: List[str]) -> Dict[str, ProductData]:
+    """
+    Retrieve the product data of several products with a single OFF search-a-licious query
+
+    Args:
+        barcodes: The product barcodes
+    Returns:
+        The ProductData of the products found, by barcode (products unknown to search-a-licious are missing)
+    Raises:
+        ResourceNotFoundException: If the search fails or data validation fails
+    """
+    url = "https://search.openfoodfacts.org/search"
+    params = {
+        "q": " OR ".join(f"code:{barcode}" for barcode in barcodes),
+        "fields": ",".join(["code", *get_requested_product_fields()]),
+        "page_size": str(len(barcodes)),
+    }
+
+    try:
+        async with get_upstream_guard(SEARCH_A_LICIOUS).call():
+            response = await get_http_client().get(url, params=params)
+            response.raise_for_status()  # Raise exception for 4XX/5XX responses
+    except ServiceUnavailableException:
+        raise
+    except Exception as e:
+        logger.warning(f"Can't get products data from OFF API: {len(barcodes)} barcodes")
+        raise ResourceNotFoundException("Can't get products data from OFF API") from e
+
+    try:
+        product_response = PRODUCT_RESPONSE_SEARCH_A_LICIOUS_BATCH_ADAPTER.validate_json(response.content)
+    except ValidationError as e:
+        logger.error(f"Failed to validate products data: {e}")
+        raise ResourceNotFoundException("Failed to validate products data retrieved from OFF") from e
+
+    requested_barcodes = set(barcodes)
+    return {hit.code: hit.to_product_data() for hit in product_response.hits if hit.code in requested_barcodes}
+
+
+async def get_product_data(barcode: str) -> ProductData:
+    """
+    Get the product data from the caches, or from OFF if it is not cached.
+
+    The in-memory cache of the worker is read first, then the on-disk store shared by all the workers,
+    then the local index built from the OFF dumps. Concurrent lookups of the same product are coalesced,
+    so only one of them reads the store and calls OFF.
+    The product data holds the names in all the supported locales, so all the locales share the same cache entries.
+
+    Args:
+        barcode: The product barcode
+
+    Returns:
+        The ProductData of the product
+    """
+    if product_data := get_product_cache().get(barcode):
+        return product_data
+
+    return await product_data_lookups.do(barcode, lambda: _fetch_product_data(barcode))
+
+
+async def _fetch_product_data(barcode: str) -> ProductData:
+    """
+    Get the product data from the on-disk store or the local index, or from OFF (API v3 hedged by search-a-licious),
+    and fill the caches. When both OFF endpoints are unavailable, an expired copy of the product is served if any.
+
+    Args:
+        barcode: The product barcode
+
+    Returns:
+        The ProductData of the product
+    """
+    if product_data := await _get_cached_product_data(barcode):
+        return product_data
+
+    # Hedge OFF API v3 with search-a-licious when v3 is slower than usual, or when its circuit is open
+    try:
+        product_data = await get_product_hedged_fetcher().fetch(
+            (OFF_V3, lambda: get_data_from_off_v3(barcode)),
+            (SEARCH_A_LICIOUS, lambda: get_data_from_off_search_a_licious(barcode)),
+        )
+    except ServiceUnavailableException:
+        # OFF is failing: serve the expired copy of the product, if the store still has it
+        if product_data := await asyncio.to_thread(get_product_store().get, barcode, include_expired=True):
+            logger.warning(f"OFF unavailable, serving expired product data: {barcode}")
+            return product_data
+        raise
+    await _cache_product_data(barcode, product_data)
+    return product_data
+
+
+async def get_products_data(barcodes: List[str]) -> Dict[str, ProductData | BaseAppException]:
+    """
+    Get the product data of several products.
+
+    Cached and indexed products are read locally. The others are fetched with a few combined search-a-licious queries,
+    and the products missing from the search results are looked up one by one, with a bounded concurrency.
+
+    Args:
+        barcodes: The product barcodes
+
+    Returns:
+        The ProductData of each barcode, or the exception raised while getting it
+    """
+    products_data: Dict[str, ProductData | BaseAppException] = {}
+    missing_barcodes = []
+    for barcode in dict.fromkeys(barcodes):
+        if product_data := await _get_cached_product_data(barcode):
+            products_data[barcode] = product_data
+        else:
+            missing_barcodes.append(barcode)
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCH_LOOKUPS)
+
+    async def lookup_product(barcode: str) -> None:
+        async with semaphore:
+            try:
+                products_data[barcode] = await get_product_data(barcode)
+            except BaseAppException as e:
+                products_data[barcode] = e
+
+    async def search_products(barcodes_to_search: List[str]) -> None:
+        async with semaphore:
+            try:
+                found_products = await get_data_from_off_search_a_licious_batch(barcodes_to_search)
+            except BaseAppException:
+                found_products = {}
+
+        for barcode, product_data in found_products.items():
+            await _cache_product_data(barcode, product_data)
+            products_data[barcode] = product_data
+
+        await asyncio.gather(
+            *(lookup_product(barcode) for barcode in barcodes_to_search if barcode not in found_products)
+        )
+
+    await asyncio.gather(
+        *(
+            search_products(missing_barcodes[index : index + MAX_BARCODES_PER_SEARCH])
+            for index in range(0, len(missing_barcodes), MAX_BARCODES_PER_SEARCH)
+        )
+    )
+    return products_data
+
+
+async def _get_cached_product_data(barcode: str) -> ProductData | None:
+    """
+    Get the product data from the in-memory cache, then from the on-disk store, then from the local index
+    built from the OFF dumps (filling the in-memory cache)
+    """
+    if product_data := get_product_cache().get(barcode):
+        return product_data
+
+    # The SQLite databases are read in a thread, so a locked or slow disk doesn't block the event loop
+    product_data = await asyncio.to_thread(_get_stored_product_data, barcode)
+    if product_data:
+        get_product_cache().set(barcode, product_data)
+        return product_data
+
+    return None
+
+
+def _get_stored_product_data(barcode: str) -> ProductData | None:
+    """Get the product data from the on-disk store, then from the local index (blocking)"""
+    return get_product_store().get(barcode) or get_product_index().get(barcode)
+
+
+async def _cache_product_data(barcode: str, product_data: ProductData) -> None:
+    """Store the product data in the in-memory cache and in the on-disk store"""
+    get_product_cache().set(barcode, product_data)
+    await asyncio.to_thread(get_product_store().set, barcode, product_data)
+
+
 async def get_pain_report(barcode: str, locale: str) -> PainReport:
     """
     Compute the pain report for a product based on its barcode.
 
+    The barcode is canonicalized first, so all its spellings share the same cache entries.
+    Barcodes that recently failed (unknown to OFF, no breeding type...) are answered from the negative cache,
+    without getting the product data again.
+
     Args:
         barcode: The product barcode
-        locale: alpha2 locale (fr, en...)
+        locale: alpha2 locale (fr, en...), used to select the product name
 
     Returns:
         The PainReport
+    Raises:
+        InvalidBarcodeException: If the barcode is not a valid GTIN
     """
-    # Get the product data
-    product_data = await get_data_from_off_v3(barcode, locale)
+    barcode = canonicalize_barcode(barcode)
+    negative_cache = get_negative_cache()
+    if failure := negative_cache.get(barcode):
+        raise failure
+
+    try:
+        # Get the product data
+        product_data = await get_product_data(barcode)
 
-    # Create calculator with the retrieved data
-    calculator = PainReportCalculator(product_data)
+        # Create calculator with the retrieved data
+        calculator = PainReportCalculator(product_data)
 
-    # Generate and return the pain report
-    return calculator.get_pain_report()
+        # Generate and return the pain report
+        return calculator.get_pain_report(locale)
+    except ProductNotFoundException as e:
+        negative_cache.set(barcode, e)
+        raise
 
 
-def get_knowledge_panel_response(pain_report: PainReport, translator: Callable) -> KnowledgePanelResponse:
+async def get_pain_reports(barcodes: List[str], locale: str) -> Dict[str, PainReport | BaseAppException]:
+    """
+    Compute the pain reports of several products.
+
+    The barcodes are canonicalized first, so the spellings of the same product are looked up once.
+
+    Args:
+        barcodes: The product barcodes
+        locale: alpha2 locale (fr, en...), used to select the product names
+
+    Returns:
+        The PainReport of each requested barcode, or the exception raised while computing it
+    """
+    canonical_barcodes: Dict[str, str] = {}
+    failures: Dict[str, BaseAppException] = {}
+    negative_cache = get_negative_cache()
+    for requested_barcode in dict.fromkeys(barcodes):
+        try:
+            barcode = canonical_barcodes[requested_barcode] = canonicalize_barcode(requested_barcode)
+        except InvalidBarcodeException as e:
+            failures[requested_barcode] = e
+            continue
+        if barcode not in failures and (failure := negative_cache.get(barcode)):
+            failures[barcode] = failure
+
+    products_data = await get_products_data(
+        [barcode for barcode in dict.fromkeys(canonical_barcodes.values()) if barcode not in failures]
+    )
+
+    reports_by_barcode: Dict[str, PainReport | BaseAppException] = {}
+    for barcode, product_data in products_data.items():
+        if isinstance(product_data, BaseAppException):
+            reports_by_barcode[barcode] = product_data
+        else:
+            try:
+                reports_by_barcode[barcode] = PainReportCalculator(product_data).get_pain_report(locale)
+            except BaseAppException as e:
+                reports_by_barcode[barcode] = e
+
+        if isinstance(pain_report := reports_by_barcode[barcode], ProductNotFoundException):
+            negative_cache.set(barcode, pain_report)
+
+    # Keep the order of the requested barcodes
+    return {
+        requested_barcode: failures.get(requested_barcode)
+        or failures.get(canonical_barcodes[requested_barcode])
+        or reports_by_barcode[canonical_barcodes[requested_barcode]]
+        for requested_barcode in dict.fromkeys(barcodes)
+    }
+
+
+async def get_breeding_types_comparison(barcode: str, locale: str) -> BreedingTypesComparisonResponse:
+    """
+    Compare the time in pain of a product with every breeding type of its animals, its weights being kept.
+
+    The product data is got once, like for the knowledge panel, and the failures are stored in the negative cache.
+
+    Args:
+        barcode: The product barcode
+        locale: alpha2 locale (fr, en...), used to select the product name
+
+    Returns:
+        The time in pain of each animal with each breeding type, and its difference with the product
+    Raises:
+        InvalidBarcodeException: If the barcode is not a valid GTIN
+    """
+    barcode = canonicalize_barcode(barcode)
+    negative_cache = get_negative_cache()
+    if failure := negative_cache.get(barcode):
+        raise failure
+
+    try:
+        product_data = await get_product_data(barcode)
+        comparisons = PainReportCalculator(product_data).compare_breeding_types()
+    except ProductNotFoundException as e:
+        negative_cache.set(barcode, e)
+        raise
+
+    return BreedingTypesComparisonResponse(
+        animals=[_get_animal_breeding_types_comparison(comparison) for comparison in comparisons],
+        product=ProductInfo(image_url=product_data.image_url, name=product_data.get_product_name(locale)),
+    )
+
+
+def _get_animal_breeding_types_comparison(comparison: BreedingTypesComparison) -> AnimalBreedingTypesComparison:
+    """Build the response model of the comparison of the breeding types of an animal"""
+    breeding_types = []
+    for breeding_type, pain_matrix in comparison.pain_matrices_by_breeding_type.items():
+        delta_pain_matrix = comparison.delta_pain_matrices_by_breeding_type[breeding_type]
+        breeding_types.append(
+            BreedingTypePain(
+                breeding_type=breeding_type,
+                seconds_in_pain=pain_matrix.to_dict(),
+                total_seconds_in_pain=pain_matrix.total_seconds_in_pain,
+                delta_seconds_in_pain=delta_pain_matrix.to_dict(),
+                delta_total_seconds_in_pain=delta_pain_matrix.total_seconds_in_pain,
+            )
+        )
+
+    return AnimalBreedingTypesComparison(
+        animal_type=comparison.animal_type,
+        breeding_type=comparison.breeding_type_with_weight.breeding_type,
+        animal_product_weight=comparison.breeding_type_with_weight.animal_product_weight,
+        seconds_in_pain=comparison.pain_matrix.to_dict(),
+        total_seconds_in_pain=comparison.pain_matrix.total_seconds_in_pain,
+        breeding_types=breeding_types,
+    )
+
+
+# Constant parts of the panels, shared by all the locales
+SUFFERING_FOOTPRINT_ICON_URL = HttpUrl("https://iili.io/3o05WOX.png")
+SUFFERING_FOOTPRINT_TOPICS = ("suffering-footprint",)
+PANEL_LINK_ELEMENTS = tuple(
+    Element(element_type="panel", panel_element=PanelElement(panel_id=panel_id))
+    for panel_id in ["intensities_definitions", "physical_pain", "psychological_pain"]
+)
+
+
+def _get_text_element(text: str) -> Element:
+    """Create a text element with HTML content for use in a panel"""
+    return Element(element_type="text", text_element=TextElement(html=text))
+
+
+@dataclass(frozen=True, slots=True)
+class PanelArtifacts:
+    """
+    Parts of the knowledge panels that only depend on the locale: translated labels, texts and static panels.
+
+    They are built once per locale from the gettext catalogs, and shared by all the responses of the locale,
+    so the panels and elements must not be modified.
+    """
+
+    animal_names: Mapping[AnimalType, str]
+    # The breeding types of the different animals sharing a value (e.g. free_range) share a label
+    breeding_type_names: Mapping[LayingHenBreedingType | BroilerChickenBreedingType, str]
+    intensity_names: Mapping[PainIntensity, str]
+    main_panel_header: Tuple[Element, ...]
+    main_panel_title_element: TitleElement
+    breeding_type_and_weight_template: str
+    intensities_definitions_panel: Panel
+    pain_panel_headers: Mapping[PainType, Tuple[Element, ...]]
+    pain_panel_footers: Mapping[PainType, Element]
+    pain_panel_title_elements: Mapping[PainType, TitleElement]
+
+    @classmethod
+    def build(cls, _: Callable) -> "PanelArtifacts":
+        """
+        Translate the labels and render the static parts of the panels.
+
+        Args:
+            _: The translation function of the locale
+
+        Returns:
+            The artifacts of the locale
+        """
+        durations_introduction = _get_text_element(
+            _(
+                "The durations below represent the suffering time caused "
+                "by the production of animal-derived ingredients in this product:"
+            )
+        )
+        return cls(
+            animal_names=MappingProxyType({animal_type: animal_type.translated_name(_) for animal_type in AnimalType}),
+            breeding_type_names=MappingProxyType(
+                {
+                    breeding_type: breeding_type.translated_name(_)
+                    for breeding_type in [*LayingHenBreedingType, *BroilerChickenBreedingType]
+                }
+            ),
+            intensity_names=MappingProxyType(
+                {pain_intensity: pain_intensity.translated_name(_) for pain_intensity in PainIntensity}
+            ),
+            main_panel_header=(
+                _get_text_element(
+                    _(
+                        "The <a href='https://empreinte-souffrance.org/'>Welfare Footprint</a> is calculated based "
+                        "on research from the <a href='https://welfarefootprint.org/'>Welfare Footprint Institute</a> "
+                        "which developed a scientifically rigorous methodology for assessing "
+                        "and quantifying animal welfare in food production systems."
+                    )
+                ),
+                _get_text_element(
+                    _(
+                        "It is unique in providing a comprehensive, biologically meaningful measure of "
+                        "the time animals spend in pain of varying intensities."
+                    )
+                ),
+                _get_text_element(
+                    _(
+                        "The time in pain and details shown below are based on the following data "
+                        "(provided by the Open Food Facts community)"
+                    )
+                ),
+            ),
+            main_panel_title_element=TitleElement(
+                grade="c",
+                icon_url=SUFFERING_FOOTPRINT_ICON_URL,
+                name="suffering-footprint",
+                subtitle=_("What is the welfare footprint?"),
+                title=_("Welfare footprint"),
+                type="grade",
+            ),
+            breeding_type_and_weight_template=_(
+                "<b>{animal_name} :</b><ul>"
+                "<li>Production system: <b>{breeding_type}</b></li>"
+                "<li>Quantity of egg in the product: <b>{weight}g</b></li></ul>"
+            ),
+            intensities_definitions_panel=Panel(
+                elements=[
+                    _get_text_element(
+                        _(
+                            "<b>Annoying</b>: Noticeable discomfort that can be ignored. Does not interfere with daily "
+                            "activities or motivated behaviors (exploration, comfort, maintenance). "
+                            "No visible expressions of pain or physiological disturbances."
+                        )
+                    ),
+                    _get_text_element(
+                        _(
+                            "<b>Hurtful</b>: Persistent pain with the possibility of brief moments of forgetting "
+                            "during distractions. Reduces the frequency of motivated behaviors and partially alters "
+                            "functional capabilities, while allowing essential activities to be carried out."
+                        )
+                    ),
+                    _get_text_element(
+                        _(
+                            "<b>Disabling</b>: Constant pain that takes priority over most behaviors. "
+                            "Prevents positive well-being and drastically alters activity level. "
+                            "Requires stronger painkillers and causes inattention to the environment."
+                        )
+                    ),
+                    _get_text_element(
+                        _(
+                            "<b>Excruciating</b>: Extreme unbearable pain, even briefly. "
+                            "In humans, this would mark the threshold of suffering below which many people "
+                            "choose to end their lives rather than endure it. Triggers involuntary manifestations "
+                            "(screams, tremors, extreme agitation) and cannot be relieved."
+                        )
+                    ),
+                ],
+                level="info",
+                title_element=TitleElement(
+                    grade="c",
+                    title=_("Intensity categories definitions"),
+                    type="grade",
+                ),
+                topics=list(SUFFERING_FOOTPRINT_TOPICS),
+            ),
+            pain_panel_headers=MappingProxyType(
+                {
+                    PainType.PHYSICAL: (
+                        _get_text_element(
+                            _(
+                                "<b>Physical pain</b> includes all bodily suffering experienced by animals: "
+                                "fractures, wounds, diseases, breathing difficulties, etc."
+                            )
+                        ),
+                        durations_introduction,
+                    ),
+                    PainType.PSYCHOLOGICAL: (
+                        _get_text_element(
+                            _(
+                                "<b>Psychological pain</b> includes mental suffering experienced by animals: "
+                                "stress, anxiety, inability to express natural behaviors, etc."
+                            )
+                        ),
+                        durations_introduction,
+                    ),
+                }
+            ),
+            pain_panel_footers=MappingProxyType(
+                {
+                    PainType.PHYSICAL: _get_text_element(
+                        _(
+                            "You can find more details about the different types of physical suffering "
+                            "<a href='https://empreinte-souffrance.org/'>on our website</a>."
+                        )
+                    ),
+                    PainType.PSYCHOLOGICAL: _get_text_element(
+                        _(
+                            "You can find more details about the different types of psychological suffering "
+                            "<a href='https://empreinte-souffrance.org/'>on our website</a>."
+                        )
+                    ),
+                }
+            ),
+            pain_panel_title_elements=MappingProxyType(
+                {
+                    PainType.PHYSICAL: TitleElement(
+                        grade="c", name="physical-pain", title=_("Physical pain"), type="grade"
+                    ),
+                    PainType.PSYCHOLOGICAL: TitleElement(
+                        grade="c", name="psychological-pain", title=_("Psychological pain"), type="grade"
+                    ),
+                }
+            ),
+        )
+
+
+@lru_cache
+def get_panel_artifacts(locale: str) -> PanelArtifacts:
+    """Return the artifacts of a locale (the default locale if it isn't supported), built once"""
+    return PanelArtifacts.build(get_i18n().get_translator(locale))
+
+
+def build_panel_artifacts() -> None:
+    """Build the artifacts of all the supported locales, at startup"""
+    for locale in get_i18n().get_supported_locales():
+        get_panel_artifacts(locale)
+
+
+def get_knowledge_panel_response(
+    pain_report: PainReport, translator: Callable, locale: str | None = None
+) -> KnowledgePanelResponse:
     """
     Create a complete knowledge panel response with all panels related to suffering footprint.
 
     Args:
         pain_report: The pain report containing all animal data and pain durations
         translator: The translation function to use for i18n
+        locale: alpha2 locale (fr, en...) of the translator, to use its prebuilt artifacts
 
     Returns:
         A complete KnowledgePanelResponse containing main panel, intensity definitions,
         physical pain data and psychological pain data
     """
-    panel_generator = KnowledgePanelGenerator(pain_report, translator)
+    artifacts = get_panel_artifacts(locale) if locale else None
+    panel_generator = KnowledgePanelGenerator(pain_report, translator, artifacts)
     return panel_generator.get_response()
 
 
 class KnowledgePanelGenerator:
     """
     Class responsible for generating knowledge panel responses based on pain reports.
+
+    The parts of the panels that only depend on the locale come from its PanelArtifacts:
+    only the fragments of the animals of the pain report are rendered.
     """
 
-    def __init__(self, pain_report: PainReport, translator: Callable):
+    def __init__(self, pain_report: PainReport, translator: Callable, artifacts: PanelArtifacts | None = None):
         """
         Initialize the generator with a pain report and translator.
 
         Args:
             pain_report: The pain report containing animal data and pain durations
             translator: The translation function to use for i18n
+            artifacts: The prebuilt artifacts of the locale of the translator, built from the translator if None
         """
         self.pain_report = pain_report
         self._ = translator
+        self.artifacts = artifacts or PanelArtifacts.build(translator)
 
     def get_response(self) -> KnowledgePanelResponse:
         """
@@ -186,7 +736,8 @@ class KnowledgePanelGenerator:
         Returns:
             A complete KnowledgePanelResponse with all necessary panels
         """
-        return KnowledgePanelResponse(
+        # The panels are made of models already validated, so they are not validated again
+        return KnowledgePanelResponse.model_construct(
             panels={
                 "main": self.create_main_panel(),
                 "intensities_definitions": self.create_intensities_definitions_panel(),
@@ -210,108 +761,35 @@ class KnowledgePanelGenerator:
             A panel with general information and links to detailed panels
         """
         elements = [
-            self._get_text_element(
-                self._(
-                    "The <a href='https://empreinte-souffrance.org/'>Welfare Footprint</a> is calculated based "
-                    "on research from the <a href='https://welfarefootprint.org/'>Welfare Footprint Institute</a> "
-                    "which developed a scientifically rigorous methodology for assessing "
-                    "and quantifying animal welfare in food production systems."
-                )
-            ),
-            self._get_text_element(
-                self._(
-                    "It is unique in providing a comprehensive, biologically meaningful measure of "
-                    "the time animals spend in pain of varying intensities."
-                )
-            ),
-            self._get_text_element(
-                self._(
-                    "The time in pain and details shown below are based on the following data "
-                    "(provided by the Open Food Facts community)"
+            *self.artifacts.main_panel_header,
+            *(
+                _get_text_element(
+                    self._get_breeding_type_and_weight_html(animal.animal_type, animal.breeding_type_with_weight)
                 )
+                for animal in self.pain_report.animals
             ),
+            *PANEL_LINK_ELEMENTS,
         ]
 
-        for animal in self.pain_report.animals:
-            elements.append(
-                self._get_text_element(
-                    self._get_breeding_type_and_weight_html(animal.animal_type, animal.breeding_type_with_weight)
-                )
-            )
-
-        elements.extend(
-            [
-                Element(element_type="panel", panel_element=PanelElement(panel_id="intensities_definitions")),
-                Element(element_type="panel", panel_element=PanelElement(panel_id="physical_pain")),
-                Element(element_type="panel", panel_element=PanelElement(panel_id="psychological_pain")),
-            ]
-        )
-
-        return Panel(
+        return Panel.model_construct(
             elements=elements,
             level="info",
-            title_element=TitleElement(
-                grade="c",
-                icon_url=HttpUrl("https://iili.io/3o05WOX.png"),
-                name="suffering-footprint",
-                subtitle=self._("What is the welfare footprint?"),
-                title=self._("Welfare footprint"),
-                type="grade",
-            ),
-            topics=["suffering-footprint"],
+            title_element=self.artifacts.main_panel_title_element,
+            topics=list(SUFFERING_FOOTPRINT_TOPICS),
         )
 
     def create_intensities_definitions_panel(self) -> Panel:
         """
-        Create a panel explaining the different pain intensity levels.
+        Return the panel explaining the different pain intensity levels.
 
         This panel provides detailed definitions for each pain intensity level:
         Agonie (Excruciating), Souffrance (Disabling), Douleur (Hurtful), and Inconfort (Annoying).
         The definitions help users understand the severity of each level.
 
         Returns:
-            A panel with definitions for each pain intensity level
+            A panel with definitions for each pain intensity level, prebuilt for the locale
         """
-        return Panel(
-            elements=[
-                self._get_text_element(
-                    self._(
-                        "<b>Annoying</b>: Noticeable discomfort that can be ignored. Does not interfere with daily "
-                        "activities or motivated behaviors (exploration, comfort, maintenance). "
-                        "No visible expressions of pain or physiological disturbances."
-                    )
-                ),
-                self._get_text_element(
-                    self._(
-                        "<b>Hurtful</b>: Persistent pain with the possibility of brief moments of forgetting during "
-                        "distractions. Reduces the frequency of motivated behaviors and partially alters functional "
-                        "capabilities, while allowing essential activities to be carried out."
-                    )
-                ),
-                self._get_text_element(
-                    self._(
-                        "<b>Disabling</b>: Constant pain that takes priority over most behaviors. "
-                        "Prevents positive well-being and drastically alters activity level. "
-                        "Requires stronger painkillers and causes inattention to the environment."
-                    )
-                ),
-                self._get_text_element(
-                    self._(
-                        "<b>Excruciating</b>: Extreme unbearable pain, even briefly. "
-                        "In humans, this would mark the threshold of suffering below which many people "
-                        "choose to end their lives rather than endure it. Triggers involuntary manifestations "
-                        "(screams, tremors, extreme agitation) and cannot be relieved."
-                    )
-                ),
-            ],
-            level="info",
-            title_element=TitleElement(
-                grade="c",
-                title=self._("Intensity categories definitions"),
-                type="grade",
-            ),
-            topics=["suffering-footprint"],
-        )
+        return self.artifacts.intensities_definitions_panel
 
     def get_animal_pain_for_panel(self, animal_type: AnimalType, pain_type: PainType) -> Element | None:
         """
@@ -334,7 +812,7 @@ class KnowledgePanelGenerator:
         animal_html = self._generate_animal_pain_html(animal_pain_report=animal_data, pain_type=pain_type)
 
         # Return the text element
-        return self._get_text_element(animal_html)
+        return _get_text_element(animal_html)
 
     def create_physical_pain_panel(self) -> Panel:
         """
@@ -343,43 +821,7 @@ class KnowledgePanelGenerator:
         Returns:
             A panel with physical pain information organized by animal
         """
-        elements = [
-            self._get_text_element(
-                self._(
-                    "<b>Physical pain</b> includes all bodily suffering experienced by animals: "
-                    "fractures, wounds, diseases, breathing difficulties, etc."
-                )
-            ),
-            self._get_text_element(
-                self._(
-                    "The durations below represent the suffering time caused "
-                    "by the production of animal-derived ingredients in this product:"
-                )
-            ),
-        ]
-
-        # Add each animal from the pain report
-        for animal in self.pain_report.animals:
-            animal_element = self.get_animal_pain_for_panel(animal.animal_type, PainType.PHYSICAL)
-            if animal_element:
-                elements.append(animal_element)
-
-        # Add footer
-        elements.append(
-            self._get_text_element(
-                self._(
-                    "You can find more details about the different types of physical suffering "
-                    "<a href='https://empreinte-souffrance.org/'>on our website</a>."
-                )
-            )
-        )
-
-        return Panel(
-            elements=elements,
-            level="info",
-            title_element=TitleElement(grade="c", name="physical-pain", title=self._("Physical pain"), type="grade"),
-            topics=["suffering-footprint"],
-        )
+        return self._create_pain_panel(PainType.PHYSICAL)
 
     def create_psychological_pain_panel(self) -> Panel:
         """
@@ -388,58 +830,35 @@ class KnowledgePanelGenerator:
         Returns:
             A panel with psychological pain information organized by animal
         """
-        elements = [
-            self._get_text_element(
-                self._(
-                    "<b>Psychological pain</b> includes mental suffering experienced by animals: "
-                    "stress, anxiety, inability to express natural behaviors, etc."
-                )
-            ),
-            self._get_text_element(
-                self._(
-                    "The durations below represent the suffering time caused "
-                    "by the production of animal-derived ingredients in this product:"
-                )
-            ),
-        ]
+        return self._create_pain_panel(PainType.PSYCHOLOGICAL)
+
+    def _create_pain_panel(self, pain_type: PainType) -> Panel:
+        """
+        Create a panel displaying the pain of a type by animal type, between the prebuilt header and footer.
+
+        Args:
+            pain_type: The type of pain to display (physical or psychological)
+
+        Returns:
+            A panel with the pain information organized by animal
+        """
+        elements = list(self.artifacts.pain_panel_headers[pain_type])
 
         # Add each animal from the pain report
         for animal in self.pain_report.animals:
-            animal_element = self.get_animal_pain_for_panel(animal.animal_type, PainType.PSYCHOLOGICAL)
+            animal_element = self.get_animal_pain_for_panel(animal.animal_type, pain_type)
             if animal_element:
                 elements.append(animal_element)
 
-        # Add footer
-        elements.append(
-            self._get_text_element(
-                self._(
-                    "You can find more details about the different types of psychological suffering "
-                    "<a href='https://empreinte-souffrance.org/'>on our website</a>."
-                )
-            )
-        )
+        elements.append(self.artifacts.pain_panel_footers[pain_type])
 
-        return Panel(
+        return Panel.model_construct(
             elements=elements,
             level="info",
-            title_element=TitleElement(
-                grade="c", name="psychological-pain", title=self._("Psychological pain"), type="grade"
-            ),
-            topics=["suffering-footprint"],
+            title_element=self.artifacts.pain_panel_title_elements[pain_type],
+            topics=list(SUFFERING_FOOTPRINT_TOPICS),
         )
 
-    def _get_text_element(self, text: str) -> Element:
-        """
-        Create a text element with HTML content for use in a panel.
-
-        Args:
-            text: The HTML content as a string
-
-        Returns:
-            An Element object with the text content properly wrapped
-        """
-        return Element(element_type="text", text_element=TextElement(html=text))
-
     def _get_breeding_type_and_weight_html(
         self, animal_type: AnimalType, breeding_type_with_weight: BreedingTypeAndWeight
     ) -> str:
@@ -457,14 +876,9 @@ class KnowledgePanelGenerator:
         Returns:
             Formatted HTML string with animal information
         """
-        html_template = self._(
-            "<b>{animal_name} :</b><ul>"
-            "<li>Production system: <b>{breeding_type}</b></li>"
-            "<li>Quantity of egg in the product: <b>{weight}g</b></li></ul>"
-        )
-        return html_template.format(
-            animal_name=animal_type.translated_name(self._),
-            breeding_type=breeding_type_with_weight.breeding_type.translated_name(self._),
+        return self.artifacts.breeding_type_and_weight_template.format(
+            animal_name=self.artifacts.animal_names[animal_type],
+            breeding_type=self.artifacts.breeding_type_names[breeding_type_with_weight.breeding_type],
             weight=int(breeding_type_with_weight.animal_product_weight),
         )
 
@@ -517,14 +931,16 @@ class KnowledgePanelGenerator:
             return ""
 
         # Start with animal name and breeding type
-        animal_type = animal_pain_report.animal_type
-        breeding_type = animal_pain_report.breeding_type_with_weight.breeding_type
-        html_parts = [f"<b>{animal_type.translated_name(self._)} - {breeding_type.translated_name(self._)}</b>"]
+        animal_name = self.artifacts.animal_names[animal_pain_report.animal_type]
+        breeding_type_name = self.artifacts.breeding_type_names[
+            animal_pain_report.breeding_type_with_weight.breeding_type
+        ]
+        html_parts = [f"<b>{animal_name} - {breeding_type_name}</b>"]
 
         # Add pain levels in standardized order
         html_parts.append("<ul>")
         for pain_level_data in pain_levels:
-            intensity_label = pain_level_data.pain_intensity.translated_name(self._)
+            intensity_label = self.artifacts.intensity_names[pain_level_data.pain_intensity]
             duration = self._format_duration(pain_level_data.seconds_in_pain)
 
             html_parts.append(f"<li><b>{intensity_label}</b> : {duration}</li>")
@@ -0,0 +1,113 @@
+"""
+Cache of the rendered knowledge panel responses, as the JSON bytes sent to the clients.
+
+A knowledge panel only depends on the pain report, the locale and the methodology data, so the responses are keyed
+by a fingerprint of the pain report, the locale and METHODOLOGY_VERSION. A changed product gives another pain report,
+hence another key: the cache doesn't need to be invalidated, the stale entries are evicted as least recently used.
+The translations and the code of the panels only change with a new deployment, which starts with an empty cache.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Tuple
+
+from app.business.open_food_facts.knowledge_panel import get_knowledge_panel_response
+from app.business.open_food_facts.pain_rate_table import TIME_IN_PAIN_FOR_100G_TABLE
+from app.business.open_food_facts.product_cache import CacheStats
+from app.schemas.open_food_facts.internal import PainReport
+
+KNOWLEDGE_PANEL_CACHE_MAX_ENTRIES = 4096
+KNOWLEDGE_PANEL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Version of the methodology data: a hash of the pain rate table, which changes with any of the time in pain values
+METHODOLOGY_VERSION = hashlib.blake2b(TIME_IN_PAIN_FOR_100G_TABLE.tobytes(), digest_size=8).hexdigest()
+
+
+def get_pain_report_fingerprint(pain_report: PainReport) -> str:
+    """Return a hash of everything a knowledge panel shows from the pain report, stable across processes"""
+    content = [
+        pain_report.product_name,
+        str(pain_report.product_image_url or ""),
+        *(
+            [
+                animal.animal_type,
+                animal.breeding_type_with_weight.breeding_type,
+                animal.breeding_type_with_weight.animal_product_weight,
+                list(animal.pain_matrix),
+            ]
+            for animal in pain_report.animals
+        ),
+    ]
+    return hashlib.blake2b(json.dumps(content).encode(), digest_size=16).hexdigest()
+
+
+class KnowledgePanelCache:
+    """
+    Bounded in-memory cache of the serialized knowledge panel responses.
+
+    The least recently used entries are evicted when the cache holds too many entries or too many bytes.
+    """
+
+    def __init__(
+        self, max_entries: int = KNOWLEDGE_PANEL_CACHE_MAX_ENTRIES, max_bytes: int = KNOWLEDGE_PANEL_CACHE_MAX_BYTES
+    ):
+        """
+        Args:
+            max_entries: Maximum number of responses kept in the cache
+            max_bytes: Maximum size of the cached responses, in bytes
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Tuple[str, str, str], bytes] = OrderedDict()
+        self._stats = CacheStats()
+
+    def get_response_bytes(self, pain_report: PainReport, locale: str, translator: Callable) -> bytes:
+        """
+        Return the serialized knowledge panel response of the pain report, rendering it on a miss.
+
+        Args:
+            pain_report: The pain report of the product
+            locale: alpha2 locale (fr, en...) of the translator
+            translator: The translation function to use for i18n
+
+        Returns:
+            The JSON of the KnowledgePanelResponse
+        """
+        key = (get_pain_report_fingerprint(pain_report), locale, METHODOLOGY_VERSION)
+        if (response_bytes := self._entries.get(key)) is not None:
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return response_bytes
+
+        self._stats.misses += 1
+        response = get_knowledge_panel_response(pain_report=pain_report, translator=translator, locale=locale)
+        response_bytes = response.__pydantic_serializer__.to_json(response)
+        self._set(key, response_bytes)
+        return response_bytes
+
+    def clear(self) -> None:
+        """Remove all the entries and reset the counters"""
+        self._entries.clear()
+        self._stats = CacheStats()
+
+    def stats(self) -> CacheStats:
+        """Return a snapshot of the cache counters"""
+        return self._stats.model_copy(update={"entries": len(self._entries)})
+
+    def _set(self, key: Tuple[str, str, str], response_bytes: bytes) -> None:
+        if len(response_bytes) > self.max_bytes:
+            return
+
+        self._entries[key] = response_bytes
+        self._stats.size_in_bytes += len(response_bytes)
+        while len(self._entries) > self.max_entries or self._stats.size_in_bytes > self.max_bytes:
+            _, evicted_bytes = self._entries.popitem(last=False)
+            self._stats.size_in_bytes -= len(evicted_bytes)
+            self._stats.evictions += 1
+
+
+@lru_cache()
+def get_knowledge_panel_cache() -> KnowledgePanelCache:
+    return KnowledgePanelCache()
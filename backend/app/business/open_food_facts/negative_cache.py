@@ -0,0 +1,99 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict
+
+from app.business.open_food_facts.product_cache import CacheStats
+from app.config.exceptions import ProductNotFoundException
+from app.enums.open_food_facts.enums import ProductFailureReason
+
+NEGATIVE_CACHE_MAX_ENTRIES = 50_000
+
+# A product missing from OFF or without breeding type may be added or fixed by a contributor,
+# while a validation failure is more likely a transient issue of OFF or of our schemas
+NEGATIVE_CACHE_TTL_IN_SECONDS_BY_REASON = {
+    ProductFailureReason.UPSTREAM_NOT_FOUND: 60 * 60,
+    ProductFailureReason.VALIDATION_FAILURE: 5 * 60,
+    ProductFailureReason.NO_BREEDING_TYPE: 6 * 60 * 60,
+    ProductFailureReason.ZERO_WEIGHT: 6 * 60 * 60,
+}
+
+
+@dataclass(slots=True)
+class _NegativeEntry:
+    message: str
+    reason: ProductFailureReason
+    expires_at: float
+
+
+class NegativeCache:
+    """
+    Bounded in-memory cache of the barcodes for which no pain report can be computed, with the reason why.
+
+    Each reason has its own TTL, and the least recently used entries are evicted when the cache is full.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES,
+        ttl_by_reason: Dict[ProductFailureReason, float] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_entries: Maximum number of barcodes kept in the cache
+            ttl_by_reason: Time to live of an entry by failure reason, in seconds (reasons without TTL are not cached)
+            clock: Monotonic clock used to compute expirations (can be replaced in tests)
+        """
+        self.max_entries = max_entries
+        self.ttl_by_reason = NEGATIVE_CACHE_TTL_IN_SECONDS_BY_REASON if ttl_by_reason is None else ttl_by_reason
+        self._clock = clock
+        self._entries: OrderedDict[str, _NegativeEntry] = OrderedDict()
+        self._stats = CacheStats()
+
+    def get(self, barcode: str) -> ProductNotFoundException | None:
+        """Return a new exception describing the cached failure of this barcode, or None if it is not cached"""
+        entry = self._entries.get(barcode)
+        if entry is None:
+            self._stats.misses += 1
+            return None
+
+        if entry.expires_at <= self._clock():
+            del self._entries[barcode]
+            self._stats.expirations += 1
+            self._stats.misses += 1
+            return None
+
+        self._entries.move_to_end(barcode)
+        self._stats.hits += 1
+        return ProductNotFoundException(entry.message, entry.reason)
+
+    def set(self, barcode: str, exception: ProductNotFoundException) -> None:
+        """Cache the failure of this barcode, if its reason is known and has a TTL"""
+        if exception.reason is None or (ttl := self.ttl_by_reason.get(exception.reason)) is None:
+            return
+
+        self._entries[barcode] = _NegativeEntry(exception.message, exception.reason, self._clock() + ttl)
+        self._entries.move_to_end(barcode)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+    def invalidate(self, barcode: str) -> None:
+        """Remove a barcode from the cache, if present"""
+        self._entries.pop(barcode, None)
+
+    def clear(self) -> None:
+        """Remove all the entries and reset the counters"""
+        self._entries.clear()
+        self._stats = CacheStats()
+
+    def stats(self) -> CacheStats:
+        """Return a snapshot of the cache counters"""
+        return self._stats.model_copy(update={"entries": len(self._entries)})
+
+
+@lru_cache()
+def get_negative_cache() -> NegativeCache:
+    return NegativeCache()
@@ -0,0 +1,212 @@
+"""
+Incremental sync of the local product index from the daily delta exports of Open Food Facts.
+
+Each delta export contains the products modified during its time window. Only the products whose indexed fields
+changed are written, the products that are no longer animal products are removed, and the cached data of exactly
+these products is invalidated (see product_invalidation).
+
+Delta exports: https://static.openfoodfacts.org/data/delta/
+"""
+
+import gzip
+import json
+import logging
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pydantic import BaseModel
+
+from app.business.open_food_facts.off_dump import get_product_barcode, is_animal_product, project_product
+from app.business.open_food_facts.product_index import ProductIndex
+from app.business.open_food_facts.product_invalidation import invalidate_products
+from app.config.http_client import get_http_client
+
+logger = logging.getLogger("app")
+
+OFF_DELTA_URL = "https://static.openfoodfacts.org/data/delta/"
+DELTA_FILE_PATTERN = re.compile(r"^openfoodfacts_products_(\d+)_(\d+)\.json\.gz$")
+
+# Import position of a completely applied delta file
+DELTA_APPLIED_POSITION = -1
+
+# Changes older than this are removed from the log: the workers poll it every minute
+PRODUCT_CHANGES_RETENTION_IN_SECONDS = 7 * 24 * 60 * 60
+
+
+class SyncReport(BaseModel):
+    """
+    Summary of a sync.
+    """
+
+    delta_files: int = 0
+    scanned_products: int = 0
+    updated_products: int = 0
+    deleted_products: int = 0
+    seconds: float = 0
+
+
+async def list_delta_files() -> List[Tuple[str, int]]:
+    """
+    List the delta exports published by OFF.
+
+    Returns:
+        The name and the end of the time window (as a timestamp) of each delta file, oldest first
+    """
+    response = await get_http_client().get(f"{OFF_DELTA_URL}index.txt")
+    response.raise_for_status()
+
+    delta_files = []
+    for name in response.text.split():
+        if match := DELTA_FILE_PATTERN.match(name):
+            delta_files.append((name, int(match.group(2))))
+    return sorted(delta_files, key=lambda delta_file: delta_file[1])
+
+
+async def download_delta_file(name: str, destination: Path) -> None:
+    """Download a delta file chunk by chunk, without loading it in memory"""
+    async with get_http_client().stream("GET", f"{OFF_DELTA_URL}{name}") as response:
+        response.raise_for_status()
+        with destination.open("wb") as file:
+            async for chunk in response.aiter_bytes():
+                file.write(chunk)
+
+
+def iter_delta_file(path: Path, start_position: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Read the products of a gzipped JSONL delta file.
+
+    Unlike the full dumps, every line is parsed: a product whose animal categories were removed
+    must be removed from the index.
+
+    Yields:
+        The position after the line (its 1-based line number) and the product
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as delta_file:
+        for position, line in enumerate(delta_file, start=1):
+            if position <= start_position:
+                continue
+            try:
+                yield position, json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Invalid JSON at line {position} of {path}")
+                yield position, {}
+
+
+def apply_delta_file(path: Path, index: ProductIndex, source: str, report: SyncReport, batch_size: int = 1_000) -> None:
+    """
+    Apply a delta file to the product index, by batches, and invalidate the cached data of the changed products.
+
+    The position reached is saved with each batch, so an interrupted sync resumes after the last applied batch.
+
+    Args:
+        path: Path of the downloaded delta file
+        index: The product index to update
+        source: Name of the delta file, under which the position is saved
+        report: The sync report to update
+        batch_size: Number of products compared and written at once
+    """
+    batch: List[Dict[str, Any]] = []
+    start_position = position = index.get_import_position(source)
+    for position, product in iter_delta_file(path, start_position):
+        report.scanned_products += 1
+        if product.get("code"):
+            batch.append(product)
+        if len(batch) >= batch_size:
+            _apply_batch(batch, index, source, position, report)
+            batch = []
+
+    _apply_batch(batch, index, source, position, report)
+    index.write_batch([], source, DELTA_APPLIED_POSITION)
+
+
+def _apply_batch(
+    products: List[Dict[str, Any]], index: ProductIndex, source: str, position: int, report: SyncReport
+) -> None:
+    """
+    Write the products whose indexed fields changed, remove the ones that are no longer animal products.
+
+    The cached data of the changed products is invalidated, including the products missing from the index.
+
+    The products are keyed by their canonical barcode, the ones whose code is not a valid GTIN are skipped.
+    """
+    products_with_barcode = [
+        (barcode, product) for product in products if (barcode := get_product_barcode(product)) is not None
+    ]
+    indexed_products = index.get_products([barcode for barcode, _ in products_with_barcode])
+
+    updated_products: Dict[str, Dict[str, Any]] = {}
+    deleted_barcodes = set()
+    # Products that are not indexed, but may have been fetched from the API and stored
+    unindexed_barcodes = set()
+    for barcode, product in products_with_barcode:
+        indexed_product = indexed_products.get(barcode)
+        if not is_animal_product(product):
+            if indexed_product is None:
+                unindexed_barcodes.add(barcode)
+            elif not _is_older(product, indexed_product):
+                deleted_barcodes.add(barcode)
+            continue
+
+        projected_product = project_product(product)
+        if projected_product is None or (indexed_product is not None and _is_older(projected_product, indexed_product)):
+            continue
+        if indexed_product is None or _without_modification_time(indexed_product) != _without_modification_time(
+            projected_product
+        ):
+            updated_products[barcode] = projected_product
+        deleted_barcodes.discard(barcode)
+
+    index.write_batch(
+        updated_products.values(), source, position, deleted_barcodes=deleted_barcodes, track_changes=True
+    )
+    invalidate_products(dict.fromkeys([*updated_products, *deleted_barcodes, *unindexed_barcodes]))
+    report.updated_products += len(updated_products)
+    report.deleted_products += len(deleted_barcodes)
+
+
+def _is_older(product: Dict[str, Any], indexed_product: Dict[str, Any]) -> bool:
+    """Check if the product is older than the indexed one, when a delta file is applied after a more recent one"""
+    return product.get("last_modified_t", 0) < indexed_product.get("last_modified_t", 0)
+
+
+def _without_modification_time(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove last_modified_t, which changes on every edit, even of fields that are not indexed"""
+    return {field: value for field, value in product.items() if field != "last_modified_t"}
+
+
+async def sync_product_index(index: ProductIndex, since: int | None = None, batch_size: int = 1_000) -> SyncReport:
+    """
+    Apply the delta files not applied yet whose time window ends after `since`.
+
+    Args:
+        index: The product index to update
+        since: Timestamp before which the index is up to date, by default the most recent modification time
+            of the indexed products (the index is built from a dump at least as recent)
+        batch_size: Number of products compared and written at once
+
+    Returns:
+        The sync report
+    """
+    if since is None:
+        since = index.get_max_last_modified_t()
+
+    report = SyncReport()
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as work_directory:
+        for name, end in await list_delta_files():
+            if end <= since or index.get_import_position(name) == DELTA_APPLIED_POSITION:
+                continue
+
+            logger.info(f"Applying delta file {name}")
+            path = Path(work_directory) / name
+            await download_delta_file(name, path)
+            apply_delta_file(path, index, name, report, batch_size)
+            path.unlink()
+            report.delta_files += 1
+
+    index.prune_changes(time.time() - PRODUCT_CHANGES_RETENTION_IN_SECONDS)
+    report.seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,237 @@
+"""
+Streaming import of the Open Food Facts dumps (JSONL, gzipped or not, and Parquet) into the local product index.
+
+Only the products whose categories match a breeding type of TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE are kept,
+projected to the fields of ProductData and keyed by their canonical barcode, like the lookups. The dumps are read
+in constant memory, and the import can be resumed from the last written batch.
+"""
+
+import gzip
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pydantic import BaseModel
+
+from app.business.open_food_facts.barcode import canonicalize_barcode
+from app.business.open_food_facts.breeding_type_index import BreedingTypeIndex
+from app.business.open_food_facts.product_index import ProductIndex
+from app.config.exceptions import InvalidBarcodeException
+from app.config.i18n import get_i18n
+from app.enums.open_food_facts.enums import TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE
+from app.schemas.open_food_facts.external import OFF_PRODUCT_FIELDS, prune_ingredients
+
+logger = logging.getLogger("app")
+
+# All the category tags used to detect a breeding type
+# (OFF adds the ancestors of the categories to categories_tags, so the descendants of these tags are kept too)
+ANIMAL_PRODUCT_TAGS = BreedingTypeIndex(TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE).tags
+
+# Fields kept for each product, in addition to its names in the supported locales (product_name_{locale})
+PRODUCT_INDEX_FIELDS = ["code", "last_modified_t", *OFF_PRODUCT_FIELDS]
+
+
+class ImportReport(BaseModel):
+    """
+    Summary of an import.
+    """
+
+    scanned_products: int = 0
+    imported_products: int = 0
+    seconds: float = 0
+
+    @property
+    def products_per_second(self) -> float:
+        """Number of scanned products per second"""
+        return self.scanned_products / self.seconds if self.seconds else 0
+
+
+def is_animal_product(product: Dict[str, Any]) -> bool:
+    """Check if one of the categories of the product is used to detect a breeding type"""
+    return not ANIMAL_PRODUCT_TAGS.isdisjoint(product.get("categories_tags") or ())
+
+
+def get_product_barcode(product: Dict[str, Any]) -> str | None:
+    """
+    Return the canonical barcode of a product of the dumps, or None if its code is not a valid GTIN.
+
+    OFF strips the leading zeros of some codes (e.g. the UPC-A 036000291452 can be stored as 36000291452),
+    so the short codes are padded to a GTIN-8 or an EAN-13 before being canonicalized.
+    """
+    code = str(product.get("code") or "").strip()
+    if code.isdigit() and len(code) < 13:
+        code = code.zfill(8 if len(code) <= 8 else 13)
+    try:
+        return canonicalize_barcode(code)
+    except InvalidBarcodeException:
+        return None
+
+
+def project_product(product: Dict[str, Any]) -> Dict[str, Any] | None:
+    """
+    Keep only the fields of the product stored in the index, and its non-empty names in the supported locales.
+
+    Returns:
+        The projected product, with its canonical barcode as code, or None if its code is not a valid GTIN
+    """
+    if (barcode := get_product_barcode(product)) is None:
+        return None
+    projected_product = {field: product[field] for field in PRODUCT_INDEX_FIELDS if product.get(field) is not None}
+    projected_product["code"] = barcode
+    for locale in get_i18n().get_supported_locales():
+        if name := product.get(f"product_name_{locale}"):
+            projected_product[f"product_name_{locale}"] = name
+    projected_product.setdefault("product_name", "")
+    if "ingredients" in projected_product:
+        projected_product["ingredients"] = prune_ingredients(projected_product["ingredients"])
+    return projected_product
+
+
+def iter_jsonl_dump(path: Path, start_position: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Read the animal products of an OFF JSONL dump (gzipped if its name ends with .gz), line by line.
+
+    Lines that don't contain any animal product tag are skipped without being parsed, which avoids
+    decoding the JSON of the vast majority of the products.
+
+    Args:
+        path: Path of the dump
+        start_position: Number of lines to skip, to resume an import
+
+    Yields:
+        The position after the line (its 1-based line number) and the product
+    """
+    open_dump = gzip.open if path.suffix == ".gz" else open
+    with open_dump(path, "rt", encoding="utf-8") as dump:
+        for position, line in enumerate(dump, start=1):
+            if position <= start_position or not any(tag in line for tag in ANIMAL_PRODUCT_TAGS):
+                yield position, {}
+                continue
+            try:
+                yield position, json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Invalid JSON at line {position} of {path}")
+                yield position, {}
+
+
+def iter_parquet_dump(
+    path: Path, start_position: int = 0, batch_size: int = 10_000
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Read the animal products of an OFF Parquet dump, by batches of rows and only the needed columns.
+
+    Requires pyarrow (uv sync --extra parquet).
+
+    Args:
+        path: Path of the dump
+        start_position: Number of rows to skip, to resume an import
+        batch_size: Number of rows read at once
+
+    Yields:
+        The position after the row (its 1-based row number) and the product
+    """
+    try:
+        import pyarrow.parquet as pq  # type: ignore[import-untyped]
+    except ImportError as e:
+        raise ImportError("pyarrow is required to import Parquet dumps: uv sync --extra parquet") from e
+
+    parquet_file = pq.ParquetFile(path)
+    columns = [field for field in PRODUCT_INDEX_FIELDS if field in parquet_file.schema_arrow.names]
+    position = 0
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        if position + batch.num_rows <= start_position:
+            position += batch.num_rows
+            yield position, {}
+            continue
+        for row in batch.to_pylist():
+            position += 1
+            if position <= start_position or not is_animal_product(row):
+                yield position, {}
+                continue
+            yield position, _flatten_localized_names(row)
+
+
+def _flatten_localized_names(product: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert the product name of the Parquet dump, a list of {"lang", "text"}, into the JSONL fields
+    (product_name for the main language, product_name_{lang} for each language)
+    """
+    names = product.get("product_name")
+    if not isinstance(names, list):
+        return product
+
+    product = dict(product)
+    product["product_name"] = None
+    for name in names:
+        if name.get("lang") == "main":
+            product["product_name"] = name.get("text")
+        else:
+            product[f"product_name_{name.get('lang')}"] = name.get("text")
+    if product["product_name"] is None and names:
+        product["product_name"] = names[0].get("text")
+    return product
+
+
+def import_dump(
+    path: Path,
+    index: ProductIndex,
+    batch_size: int = 1_000,
+    resume: bool = True,
+    progress_interval: float = 10,
+) -> ImportReport:
+    """
+    Import the animal products of an OFF dump into the product index.
+
+    The products are written by batches, each batch saving the position reached in the dump,
+    so an interrupted import resumes after the last written batch.
+
+    Args:
+        path: Path of the dump (.jsonl, .jsonl.gz or .parquet)
+        index: The product index to fill
+        batch_size: Number of products written at once
+        resume: If False, the import starts from the beginning of the dump
+        progress_interval: Minimum delay between two progress logs, in seconds
+
+    Returns:
+        The import report, with the throughput
+    """
+    source = str(path.resolve())
+    if not resume:
+        index.reset_import_position(source)
+    start_position = index.get_import_position(source)
+    if start_position:
+        logger.info(f"Resuming import of {path} after position {start_position}")
+
+    products = (
+        iter_parquet_dump(path, start_position) if path.suffix == ".parquet" else iter_jsonl_dump(path, start_position)
+    )
+
+    report = ImportReport()
+    start = last_progress_log = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+    position = start_position
+    for position, product in products:
+        if position <= start_position:
+            continue
+        report.scanned_products += 1
+        if product and is_animal_product(product) and (projected_product := project_product(product)):
+            batch.append(projected_product)
+
+        if len(batch) >= batch_size:
+            report.imported_products += index.write_batch(batch, source, position)
+            batch = []
+
+        now = time.perf_counter()
+        if now - last_progress_log >= progress_interval:
+            last_progress_log = now
+            report.seconds = now - start
+            logger.info(
+                f"{report.scanned_products} products scanned, {report.imported_products} imported "
+                f"({report.products_per_second:.0f} products/s)"
+            )
+
+    report.imported_products += index.write_batch(batch, source, position)
+    report.seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,93 @@
+"""
+Dense table of the time in pain per 100g of animal product,
+compiled at import time from TIME_IN_PAIN_FOR_100G_IN_SECONDS.
+
+The table is a NumPy array indexed by the ordinals of the enums: animal type × breeding type × pain type × intensity.
+The combinations missing from TIME_IN_PAIN_FOR_100G_IN_SECONDS are 0. Its first two axes are flattened into rows,
+so the pain matrices of one or many products come from a single broadcasted multiplication
+of their rows by their weights.
+The same goes for comparing the breeding types of an animal: their rows are looked up at once with the same weight.
+"""
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from app.enums.open_food_facts.enums import (
+    TIME_IN_PAIN_FOR_100G_IN_SECONDS,
+    AnimalType,
+    BroilerChickenBreedingType,
+    LayingHenBreedingType,
+    PainIntensity,
+    PainType,
+)
+
+ANIMAL_TYPES = tuple(AnimalType)
+# The breeding types of the different animals sharing a value (e.g. free_range) share an ordinal
+BREEDING_TYPES = tuple(
+    dict.fromkeys(str(breeding_type) for breeding_type in [*LayingHenBreedingType, *BroilerChickenBreedingType])
+)
+PAIN_TYPES = tuple(PainType)
+PAIN_INTENSITIES = tuple(PainIntensity)
+
+_ANIMAL_TYPE_ORDINALS = {animal_type: ordinal for ordinal, animal_type in enumerate(ANIMAL_TYPES)}
+_BREEDING_TYPE_ORDINALS = {breeding_type: ordinal for ordinal, breeding_type in enumerate(BREEDING_TYPES)}
+
+
+def _compile_time_in_pain_table() -> np.ndarray:
+    """Build the read-only array of the time in pain per 100g, in seconds, from the nested dictionaries"""
+    table = np.zeros((len(ANIMAL_TYPES), len(BREEDING_TYPES), len(PAIN_TYPES), len(PAIN_INTENSITIES)))
+    for animal_type, time_in_pain_by_breeding_type in TIME_IN_PAIN_FOR_100G_IN_SECONDS.items():
+        for breeding_type, time_in_pain_by_pain_type in time_in_pain_by_breeding_type.items():  # type: ignore[attr-defined]
+            for pain_type, time_in_pain_by_intensity in time_in_pain_by_pain_type.items():
+                for pain_intensity, time_in_pain in time_in_pain_by_intensity.items():
+                    table[
+                        _ANIMAL_TYPE_ORDINALS[animal_type],
+                        _BREEDING_TYPE_ORDINALS[breeding_type],
+                        PAIN_TYPES.index(pain_type),
+                        PAIN_INTENSITIES.index(pain_intensity),
+                    ] = time_in_pain
+    table.flags.writeable = False
+    return table
+
+
+TIME_IN_PAIN_FOR_100G_TABLE = _compile_time_in_pain_table()
+# Breeding types with a time in pain, by animal type, in the order of TIME_IN_PAIN_FOR_100G_IN_SECONDS
+BREEDING_TYPES_BY_ANIMAL_TYPE: Dict[AnimalType, Tuple[LayingHenBreedingType | BroilerChickenBreedingType, ...]] = {
+    animal_type: tuple(time_in_pain_by_breeding_type)  # type: ignore[arg-type]
+    for animal_type, time_in_pain_by_breeding_type in TIME_IN_PAIN_FOR_100G_IN_SECONDS.items()
+}
+# Same table with one row per (animal type, breeding type)
+TIME_IN_PAIN_FOR_100G_ROWS = TIME_IN_PAIN_FOR_100G_TABLE.reshape(-1, len(PAIN_TYPES), len(PAIN_INTENSITIES))
+
+
+def get_pain_rate_row(animal_type: AnimalType, breeding_type: str) -> int:
+    """
+    Return the row of TIME_IN_PAIN_FOR_100G_ROWS of this animal type and breeding type.
+
+    Raises:
+        KeyError: If the breeding type is unknown
+    """
+    return _ANIMAL_TYPE_ORDINALS[animal_type] * len(BREEDING_TYPES) + _BREEDING_TYPE_ORDINALS[breeding_type]
+
+
+def compute_seconds_in_pain(
+    rows: Sequence[int] | npt.NDArray[np.intp], weights: Sequence[float] | npt.NDArray[np.float64]
+) -> npt.NDArray[np.int64]:
+    """
+    Compute the time in pain of many animal products at once.
+
+    Args:
+        rows: Row of the animal type and breeding type of each animal product (see get_pain_rate_row)
+        weights: Weight of each animal product, in grams (no time in pain if the weight is <= 0)
+
+    Returns:
+        The seconds in pain of each animal product, as an array of shape (products, pain types, pain intensities)
+    """
+    weights = np.maximum(np.asarray(weights, dtype=np.float64), 0)
+    seconds_in_pain = (
+        TIME_IN_PAIN_FOR_100G_ROWS[np.asarray(rows, dtype=np.intp)] * weights[:, np.newaxis, np.newaxis] / 100
+    )
+    # Truncated like int(), the weights being positive
+    return seconds_in_pain.astype(np.int64)
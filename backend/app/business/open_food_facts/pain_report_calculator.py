@@ -1,17 +1,29 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
+import numpy as np
+import numpy.typing as npt
+
+from app.business.open_food_facts.breeding_type_index import get_breeding_type_index
 from app.business.open_food_facts.egg_weight_calculator import calculate_egg_weight
-from app.config.exceptions import ResourceNotFoundException
+from app.business.open_food_facts.pain_rate_table import (
+    BREEDING_TYPES_BY_ANIMAL_TYPE,
+    compute_seconds_in_pain,
+    get_pain_rate_row,
+)
+from app.config.exceptions import ProductNotFoundException
 from app.enums.open_food_facts.enums import (
-    TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE,
-    TIME_IN_PAIN_FOR_100G_IN_SECONDS,
     AnimalType,
     LayingHenBreedingType,
-    PainIntensity,
-    PainType,
+    ProductFailureReason,
 )
 from app.schemas.open_food_facts.external import ProductData
-from app.schemas.open_food_facts.internal import AnimalPainReport, BreedingTypeAndWeight, PainLevelData, PainReport
+from app.schemas.open_food_facts.internal import (
+    AnimalPainReport,
+    BreedingTypeAndWeight,
+    BreedingTypesComparison,
+    PainMatrix,
+    PainReport,
+)
 
 
 class PainReportCalculator:
@@ -19,17 +31,19 @@ class PainReportCalculator:
     Class to calculate the pain report for an animal product.
     """
 
-    def __init__(self, product_data: ProductData):
+    def __init__(self, product_data: ProductData, egg_weight: float | None = None):
         """
         Initialize the calculator with product data.
 
         Args:
             product_data: ProductData instance containing categories_tags and labels_tags.
+            egg_weight: Weight of the eggs of the product, if already computed (e.g. for a batch of products)
         """
         self.product_data = product_data
+        self.egg_weight = egg_weight
         self.breeding_types_with_weights = self._compute_breeding_types_with_weights()
 
-    def get_pain_report(self) -> PainReport:
+    def get_pain_report(self, locale: str | None = None) -> PainReport:
         """
         Generate a pain report based on breeding types and weights.
 
@@ -37,82 +51,137 @@ class PainReportCalculator:
         a list of pain levels categorized by pain type (physical/psychological)
         and breeding type information.
 
+        Args:
+            locale: alpha2 locale (fr, en...) of the product name, the main product name is used if None
+
         Returns:
             A complete pain report
         """
-        if not self.breeding_types_with_weights:
-            raise ResourceNotFoundException("Can't find valid breeding type or animal product weight for this product")
+        self._check_breeding_types_with_weights()
 
-        animal_reports = []
+        # Time in pain of all the animals of the product, computed at once
+        breeding_types_by_animal = list(self.breeding_types_with_weights.items())
+        seconds_in_pain_by_animal = self._compute_seconds_in_pain(breeding_types_by_animal)
 
-        # Process each animal type and its breeding type
-        for animal_type, breeding_type in self.breeding_types_with_weights.items():
-            # Generate all pain levels for this animal
-            pain_levels = self._generate_pain_levels_for_animal(animal_type, breeding_type)
-
-            # Add animal report to the list
-            animal_reports.append(
-                AnimalPainReport(
-                    animal_type=animal_type, pain_levels=pain_levels, breeding_type_with_weight=breeding_type
-                )
+        animal_reports = [
+            AnimalPainReport(
+                animal_type=animal_type,
+                pain_matrix=PainMatrix(seconds_in_pain.ravel().tolist()),
+                breeding_type_with_weight=breeding_type,
             )
+            for (animal_type, breeding_type), seconds_in_pain in zip(
+                breeding_types_by_animal, seconds_in_pain_by_animal, strict=True
+            )
+        ]
 
         return PainReport(
             animals=animal_reports,
-            product_name=self.product_data.product_name,
+            product_name=self.product_data.get_product_name(locale),
             product_image_url=self.product_data.image_url,
         )
 
-    def _generate_pain_levels_for_animal(
-        self, animal_type: AnimalType, breeding_type: BreedingTypeAndWeight
-    ) -> List[PainLevelData]:
+    def compare_breeding_types(self) -> List[BreedingTypesComparison]:
         """
-        Generate pain levels for a specific animal type and breeding type.
+        Compare the time in pain of the animal products with every breeding type of their animal.
 
-        Args:
-            animal_type: The type of animal
-            breeding_type: The breeding type with weight information
+        The weights of the product are kept, and the pain matrices of all the breeding types of all the animals
+        come from a single lookup in the pain rate table.
 
         Returns:
-            List of PainLevelData objects for all pain types and intensities
+            The comparison of each animal of the product
+
+        Raises:
+            ProductNotFoundException: If the product has no breeding type or no animal product weight
         """
-        pain_levels = []
+        self._check_breeding_types_with_weights()
+
+        # For each animal, the row of the breeding type of the product followed by the rows of its breeding types
+        rows: List[int] = []
+        weights: List[float] = []
+        for animal_type, breeding_type in self.breeding_types_with_weights.items():
+            breeding_types = BREEDING_TYPES_BY_ANIMAL_TYPE[animal_type]
+            rows.append(get_pain_rate_row(animal_type, breeding_type.breeding_type))
+            rows.extend(get_pain_rate_row(animal_type, other_breeding_type) for other_breeding_type in breeding_types)
+            weights.extend([breeding_type.animal_product_weight] * (len(breeding_types) + 1))
+        seconds_in_pain = compute_seconds_in_pain(rows, weights)
+
+        comparisons = []
+        start = 0
+        for animal_type, breeding_type in self.breeding_types_with_weights.items():
+            breeding_types = BREEDING_TYPES_BY_ANIMAL_TYPE[animal_type]
+            end = start + 1 + len(breeding_types)
+            # Flattened pain matrices of the breeding types, and their differences with the one of the product
+            matrices = seconds_in_pain[start + 1 : end].reshape(len(breeding_types), -1)
+            delta_matrices = matrices - seconds_in_pain[start].ravel()
+            comparisons.append(
+                BreedingTypesComparison(
+                    animal_type=animal_type,
+                    breeding_type_with_weight=breeding_type,
+                    pain_matrix=PainMatrix(seconds_in_pain[start].ravel().tolist()),
+                    pain_matrices_by_breeding_type={
+                        other_breeding_type: PainMatrix(matrix)
+                        for other_breeding_type, matrix in zip(breeding_types, matrices.tolist(), strict=True)
+                    },
+                    delta_pain_matrices_by_breeding_type={
+                        other_breeding_type: PainMatrix(delta_matrix)
+                        for other_breeding_type, delta_matrix in zip(
+                            breeding_types, delta_matrices.tolist(), strict=True
+                        )
+                    },
+                )
+            )
+            start = end
+        return comparisons
 
-        # Process each pain type
-        for pain_type in PainType:
-            pain_levels.extend(self._generate_pain_levels_for_type(animal_type, breeding_type, pain_type))
+    def _check_breeding_types_with_weights(self) -> None:
+        """
+        Check that the product has at least one animal product with a breeding type and a weight.
 
-        return pain_levels
+        Raises:
+            ProductNotFoundException: With the reason of the failure otherwise
+        """
+        if not self.breeding_types_with_weights:
+            reason = (
+                ProductFailureReason.ZERO_WEIGHT
+                if self._get_breeding_types()
+                else ProductFailureReason.NO_BREEDING_TYPE
+            )
+            raise ProductNotFoundException(
+                "Can't find valid breeding type or animal product weight for this product", reason
+            )
 
-    def _generate_pain_levels_for_type(
-        self, animal_type: AnimalType, breeding_type: BreedingTypeAndWeight, pain_type: PainType
-    ) -> List[PainLevelData]:
+    @staticmethod
+    def _compute_seconds_in_pain(
+        breeding_types_by_animal: List[Tuple[AnimalType, BreedingTypeAndWeight]],
+    ) -> npt.NDArray[np.int64]:
         """
-        Generate pain levels for a specific animal, breeding type, and pain type.
+        Compute the time in pain of several animals with a single lookup in the pain rate table.
 
         Args:
-            animal_type: The type of animal
-            breeding_type: The breeding type with weight information
-            pain_type: The type of pain (physical or psychological)
+            breeding_types_by_animal: Animal types with their breeding type and weight
 
         Returns:
-            List of PainLevelData objects for all pain intensities of the given type
+            The seconds in pain of each animal, as an array of shape (animals, pain types, pain intensities)
         """
-        pain_levels = []
+        rows = [
+            get_pain_rate_row(animal_type, breeding_type.breeding_type)
+            for animal_type, breeding_type in breeding_types_by_animal
+        ]
+        weights = [breeding_type.animal_product_weight for _, breeding_type in breeding_types_by_animal]
+        return compute_seconds_in_pain(rows, weights)
 
-        # Process each pain intensity for this pain type
-        for pain_intensity in PainIntensity:
-            # Calculate seconds in pain for this animal, pain type, and intensity
-            seconds_in_pain = self._calculate_time_in_pain_for_animal_with_type(
-                animal_type, breeding_type, pain_type, pain_intensity
-            )
+    def _build_pain_matrix(self, animal_type: AnimalType, breeding_type: BreedingTypeAndWeight) -> PainMatrix:
+        """
+        Build the pain matrix of a single animal.
 
-            # Add pain level entry
-            pain_levels.append(
-                PainLevelData(pain_intensity=pain_intensity, pain_type=pain_type, seconds_in_pain=seconds_in_pain)
-            )
+        Args:
+            animal_type: The type of animal
+            breeding_type: The breeding type with weight information
 
-        return pain_levels
+        Returns:
+            The seconds in pain of the animal for all pain types and intensities
+        """
+        return PainMatrix(self._compute_seconds_in_pain([(animal_type, breeding_type)])[0].ravel().tolist())
 
     def _compute_breeding_types_with_weights(self) -> Dict[AnimalType, BreedingTypeAndWeight]:
         """
@@ -137,22 +206,16 @@ class PainReportCalculator:
         Returns:
             A dictionary mapping animal types to BreedingTypeAndWeight objects with detected breeding types
         """
-        breeding_types_by_animal = {}
         countries_tags = self.product_data.countries_tags
-        for animal_type, tags_by_breeding_type in TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE.items():
-            # Example of what we get from the for loop:
-            # animal_type: AnimalType.LAYING_HEN
-            # tags_by_breeding_type: LayingHenBreedingType.FURNISHED_CAGE: ["en:cage-chicken-eggs"]
-            matched_breeding_types = [
-                breeding_type
-                for breeding_type, tags in tags_by_breeding_type.items()
-                if self.product_data.categories_tags and any(tag in self.product_data.categories_tags for tag in tags)
-            ]
-
-            # Check if only one breeding_type matched
-            if len(matched_breeding_types) == 1:
-                breeding_type = matched_breeding_types[0].get_more_specific_breeding_from_country(countries_tags)
-                breeding_types_by_animal[animal_type] = BreedingTypeAndWeight(breeding_type=breeding_type)
+        # Example of a match: the "en:cage-chicken-eggs" tag gives LayingHenBreedingType.CAGE for AnimalType.LAYING_HEN
+        # The animal types matching several breeding types are left out
+        breeding_type_match = get_breeding_type_index().match(self.product_data.categories_tags)
+        breeding_types_by_animal = {
+            animal_type: BreedingTypeAndWeight(
+                breeding_type=breeding_type.get_more_specific_breeding_from_country(countries_tags)
+            )
+            for animal_type, breeding_type in breeding_type_match.breeding_types.items()
+        }
         return breeding_types_by_animal
 
     def _get_breeding_types_with_weights(
@@ -172,7 +235,7 @@ class PainReportCalculator:
 
         for animal_type, breeding_type in breeding_types_by_animal.items():
             if animal_type == AnimalType.LAYING_HEN:
-                weight = calculate_egg_weight(self.product_data)
+                weight = calculate_egg_weight(self.product_data) if self.egg_weight is None else self.egg_weight
 
                 # We only return breeding types (and their weights) if the weight of the animal-based product is > 0
                 if weight > 0:
@@ -180,37 +243,3 @@ class PainReportCalculator:
                     breeding_types_with_weights[animal_type] = breeding_type
 
         return breeding_types_with_weights
-
-    def _calculate_time_in_pain_for_animal_with_type(
-        self,
-        animal_type: AnimalType,
-        breeding_type_with_weight: BreedingTypeAndWeight,
-        pain_type: PainType,
-        pain_intensity: PainIntensity,
-    ) -> int:
-        """
-        Calculates time in pain for a given animal type, breeding type, pain type, and pain intensity.
-
-        Args:
-            animal_type: The type of animal
-            breeding_type_with_weight: A BreedingTypeAndWeight object
-            pain_type: The type of pain (physical or psychological)
-            pain_intensity: Pain intensity (from PainIntensity enum)
-
-        Returns:
-            Duration of pain in seconds
-        """
-        if breeding_type_with_weight.animal_product_weight <= 0:
-            return 0
-
-        # Get the time in pain per 100g for this combination of parameters
-        # Default to 0 if any level in the hierarchy is missing
-        try:
-            breeding_type = breeding_type_with_weight.breeding_type
-            time_in_pain = TIME_IN_PAIN_FOR_100G_IN_SECONDS[animal_type][breeding_type][pain_type][pain_intensity]  # type: ignore[index]
-        except (KeyError, TypeError):
-            # This combination of animal, breeding type, pain type, and intensity is not defined
-            return 0
-
-        # Scale the time in pain based on the weight of animal product
-        return int(time_in_pain * breeding_type_with_weight.animal_product_weight / 100)
@@ -0,0 +1,125 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Hashable
+
+from pydantic import BaseModel
+
+from app.schemas.open_food_facts.external import ProductData
+
+PRODUCT_CACHE_MAX_ENTRIES = 2048
+PRODUCT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+PRODUCT_CACHE_TTL_IN_SECONDS = 6 * 60 * 60
+
+
+class CacheStats(BaseModel):
+    """
+    Counters of a cache, for monitoring.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    size_in_bytes: int = 0
+
+
+@dataclass(slots=True)
+class _CacheEntry:
+    product_data: ProductData
+    size_in_bytes: int
+    expires_at: float
+
+
+class ProductCache:
+    """
+    Bounded in-memory cache of validated ProductData.
+
+    Entries expire after a TTL, and the least recently used entries are evicted
+    when the cache holds too many entries or too many (approximate) bytes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = PRODUCT_CACHE_MAX_ENTRIES,
+        max_bytes: int = PRODUCT_CACHE_MAX_BYTES,
+        ttl: float = PRODUCT_CACHE_TTL_IN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_entries: Maximum number of products kept in the cache
+            max_bytes: Maximum approximate size of the cached products, in bytes
+            ttl: Time to live of an entry, in seconds
+            clock: Monotonic clock used to compute expirations (can be replaced in tests)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, _CacheEntry] = OrderedDict()
+        self._stats = CacheStats()
+
+    def get(self, key: Hashable) -> ProductData | None:
+        """Return the cached product for this key, or None if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats.misses += 1
+            return None
+
+        if entry.expires_at <= self._clock():
+            self._remove(key)
+            self._stats.expirations += 1
+            self._stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._stats.hits += 1
+        return entry.product_data
+
+    def set(self, key: Hashable, product_data: ProductData) -> None:
+        """Store a product in the cache, evicting the least recently used entries if needed"""
+        size_in_bytes = self._estimate_size(product_data)
+        if size_in_bytes > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = _CacheEntry(product_data, size_in_bytes, self._clock() + self.ttl)
+        self._stats.size_in_bytes += size_in_bytes
+
+        while len(self._entries) > self.max_entries or self._stats.size_in_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self._stats.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a product from the cache, if present"""
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Remove all the entries and reset the counters"""
+        self._entries.clear()
+        self._stats = CacheStats()
+
+    def stats(self) -> CacheStats:
+        """Return a snapshot of the cache counters"""
+        return self._stats.model_copy(update={"entries": len(self._entries)})
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._stats.size_in_bytes -= entry.size_in_bytes
+
+    @staticmethod
+    def _estimate_size(product_data: ProductData) -> int:
+        """Approximate the memory used by a product with the size of its JSON serialization"""
+        return len(product_data.__pydantic_serializer__.to_json(product_data))
+
+
+@lru_cache()
+def get_product_cache() -> ProductCache:
+    return ProductCache()
@@ -0,0 +1,240 @@
+"""
+Local index of the animal products of Open Food Facts, built from the OFF dumps.
+
+The knowledge panel path reads it before calling OFF, so indexed products are served without any network call.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import pydantic_core
+from pydantic import ValidationError
+
+from app.business.open_food_facts.product_store import connect_sqlite_database
+from app.schemas.open_food_facts.external import ProductData
+
+logger = logging.getLogger("app")
+
+PRODUCT_INDEX_PATH_ENV = "PRODUCT_INDEX_PATH"
+DEFAULT_PRODUCT_INDEX_PATH = Path("data") / "off_product_index.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    barcode TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    last_modified_t INTEGER
+);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    barcode TEXT NOT NULL,
+    changed_at REAL NOT NULL
+);
+"""
+
+
+class ProductIndex:
+    """
+    Index of products by barcode, stored in a SQLite database.
+
+    Each product is stored as the zlib-compressed JSON of its OFF fields, including its names in all the
+    languages, of which the ProductData keeps the supported locales.
+    The index also keeps the position reached by each import, so an interrupted import can be resumed,
+    and a log of the barcodes changed by the syncs, so the application workers can invalidate their caches.
+    """
+
+    def __init__(self, path: Path | str):
+        """
+        Args:
+            path: Path of the SQLite database file, created if needed
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    def get(self, barcode: str) -> ProductData | None:
+        """Return the indexed product for this barcode, with its names in the supported locales, or None"""
+        try:
+            with self._lock:
+                row = self._connect().execute("SELECT payload FROM products WHERE barcode = ?", (barcode,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Can't read product {barcode} from the product index: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        try:
+            return ProductData.model_validate_json(zlib.decompress(row[0]))
+        except (zlib.error, ValidationError) as e:
+            logger.warning(f"Invalid product {barcode} in the product index: {e}")
+            return None
+
+    def get_products(self, barcodes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return the indexed products among these barcodes, as dicts of OFF fields"""
+        if not barcodes:
+            return {}
+        placeholders = ",".join("?" * len(barcodes))
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(f"SELECT barcode, payload FROM products WHERE barcode IN ({placeholders})", barcodes)
+                .fetchall()
+            )
+        return {barcode: json.loads(zlib.decompress(payload)) for barcode, payload in rows}
+
+    def iter_products(self, batch_size: int = 1_000) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over all the indexed products, as dicts of OFF fields, in barcode order.
+
+        The products are read by pages of batch_size, so the index stays usable during the iteration.
+        """
+        last_barcode = ""
+        while True:
+            with self._lock:
+                rows = (
+                    self._connect()
+                    .execute(
+                        "SELECT barcode, payload FROM products WHERE barcode > ? ORDER BY barcode LIMIT ?",
+                        (last_barcode, batch_size),
+                    )
+                    .fetchall()
+                )
+            for _, payload in rows:
+                yield json.loads(zlib.decompress(payload))
+            if len(rows) < batch_size:
+                return
+            last_barcode = rows[-1][0]
+
+    def write_batch(
+        self,
+        products: Iterable[dict[str, Any]],
+        source: str | None = None,
+        position: int = 0,
+        deleted_barcodes: Iterable[str] = (),
+        track_changes: bool = False,
+    ) -> int:
+        """
+        Insert or replace products, and save the position reached by the import in the same transaction.
+
+        Args:
+            products: The products, as dicts of OFF fields containing at least "code"
+            source: Name of the import source (e.g. the dump path), if the position must be saved
+            position: Position in the source after this batch
+            deleted_barcodes: Barcodes of the products to remove from the index
+            track_changes: If True, the written and removed barcodes are added to the log of changes
+
+        Returns:
+            The number of written products
+        """
+        rows = [
+            (product["code"], zlib.compress(pydantic_core.to_json(product)), product.get("last_modified_t"))
+            for product in products
+        ]
+        deleted_rows = [(barcode,) for barcode in deleted_barcodes]
+        with self._lock:
+            connection = self._connect()
+            with _transaction(connection):
+                connection.executemany(
+                    "INSERT OR REPLACE INTO products (barcode, payload, last_modified_t) VALUES (?, ?, ?)", rows
+                )
+                connection.executemany("DELETE FROM products WHERE barcode = ?", deleted_rows)
+                if track_changes:
+                    changed_at = time.time()
+                    connection.executemany(
+                        "INSERT INTO changes (barcode, changed_at) VALUES (?, ?)",
+                        [(barcode, changed_at) for barcode, *_ in rows + deleted_rows],
+                    )
+                if source is not None:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO imports (source, position) VALUES (?, ?)", (source, position)
+                    )
+        return len(rows)
+
+    def get_changes_since(self, seq: int) -> Tuple[int, List[str]]:
+        """
+        Return the barcodes changed after the given sequence number of the log of changes.
+
+        Returns:
+            The last sequence number of the log (to pass to the next call) and the changed barcodes
+        """
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute("SELECT seq, barcode FROM changes WHERE seq > ? ORDER BY seq", (seq,))
+                .fetchall()
+            )
+        return (rows[-1][0] if rows else seq), [barcode for _, barcode in rows]
+
+    def get_last_change_seq(self) -> int:
+        """Return the sequence number of the last change, 0 if there is none"""
+        with self._lock:
+            return self._connect().execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def prune_changes(self, older_than: float) -> int:
+        """Remove the changes logged before the given timestamp, and return their number"""
+        with self._lock:
+            return self._connect().execute("DELETE FROM changes WHERE changed_at < ?", (older_than,)).rowcount
+
+    def get_max_last_modified_t(self) -> int:
+        """Return the most recent modification time of the indexed products, 0 if the index is empty"""
+        with self._lock:
+            return self._connect().execute("SELECT COALESCE(MAX(last_modified_t), 0) FROM products").fetchone()[0]
+
+    def get_import_position(self, source: str) -> int:
+        """Return the position reached by the import of this source, 0 if it never ran"""
+        with self._lock:
+            row = self._connect().execute("SELECT position FROM imports WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else 0
+
+    def reset_import_position(self, source: str) -> None:
+        """Forget the position reached by the import of this source, so the next import starts from the beginning"""
+        with self._lock:
+            self._connect().execute("DELETE FROM imports WHERE source = ?", (source,))
+
+    def count(self) -> int:
+        """Return the number of indexed products"""
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the connection to the database"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the connection on first use, so each worker process gets its own one"""
+        if self._connection is None:
+            self._connection = connect_sqlite_database(self.path, SCHEMA)
+        return self._connection
+
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection) -> Iterator[None]:
+    """Run the statements of the block in a single transaction, on a connection in autocommit mode"""
+    connection.execute("BEGIN")
+    try:
+        yield
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+@lru_cache()
+def get_product_index() -> ProductIndex:
+    return ProductIndex(os.getenv(PRODUCT_INDEX_PATH_ENV, DEFAULT_PRODUCT_INDEX_PATH))
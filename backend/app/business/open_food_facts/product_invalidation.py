@@ -0,0 +1,75 @@
+"""
+Invalidation of the cached data of products changed upstream.
+
+The delta sync of the product index logs the changed barcodes in the index, and removes them from the on-disk store
+shared by the workers. Each worker polls this log to remove them from its own in-memory caches,
+so the pain reports and knowledge panels are computed again from the new product data.
+"""
+
+import asyncio
+import logging
+from typing import Iterable
+
+from app.business.open_food_facts.negative_cache import get_negative_cache
+from app.business.open_food_facts.product_cache import get_product_cache
+from app.business.open_food_facts.product_index import ProductIndex
+from app.business.open_food_facts.product_store import get_product_store
+
+logger = logging.getLogger("app")
+
+PRODUCT_CHANGES_POLL_INTERVAL_IN_SECONDS = 60
+
+
+def invalidate_products(barcodes: Iterable[str], in_memory_only: bool = False) -> int:
+    """
+    Remove the cached data of these products, and their cached failures.
+
+    Args:
+        barcodes: Barcodes of the changed products
+        in_memory_only: If True, the on-disk store is left untouched (already invalidated by the sync)
+
+    Returns:
+        The number of invalidated products
+    """
+    product_cache = get_product_cache()
+    product_store = get_product_store()
+    negative_cache = get_negative_cache()
+    count = 0
+    for barcode in barcodes:
+        count += 1
+        negative_cache.invalidate(barcode)
+        product_cache.invalidate(barcode)
+        if not in_memory_only:
+            product_store.invalidate(barcode)
+    return count
+
+
+def apply_product_index_changes(index: ProductIndex, last_seq: int) -> int:
+    """
+    Invalidate the in-memory caches of the products changed in the index since the given sequence number.
+
+    Returns:
+        The sequence number to pass to the next call
+    """
+    seq, barcodes = index.get_changes_since(last_seq)
+    if barcodes:
+        count = invalidate_products(dict.fromkeys(barcodes), in_memory_only=True)
+        logger.info(f"{count} products changed upstream invalidated")
+    return seq
+
+
+async def watch_product_index_changes(
+    index: ProductIndex, interval: float = PRODUCT_CHANGES_POLL_INTERVAL_IN_SECONDS
+) -> None:
+    """
+    Poll the log of changes of the index until cancelled, invalidating the changed products.
+
+    Only the changes logged after the start of the watch are applied: the caches of a new worker are empty anyway.
+    """
+    last_seq = await asyncio.to_thread(index.get_last_change_seq)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            last_seq = await asyncio.to_thread(apply_product_index_changes, index, last_seq)
+        except Exception as e:
+            logger.warning(f"Can't read the changes of the product index: {e}")
@@ -0,0 +1,214 @@
+"""
+Persistent product cache stored in a local SQLite database.
+
+The database is opened in WAL mode, so all the uvicorn workers of a host can read it concurrently
+while one of them writes, and a freshly started worker can serve popular products without calling OFF.
+The methods of the store are blocking: the request handlers call them with asyncio.to_thread.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+from pydantic import ValidationError
+
+from app.schemas.open_food_facts.external import ProductData
+
+logger = logging.getLogger("app")
+
+PRODUCT_STORE_PATH_ENV = "PRODUCT_STORE_PATH"
+DEFAULT_PRODUCT_STORE_PATH = Path("data") / "off_products.sqlite3"
+PRODUCT_STORE_TTL_IN_SECONDS = 3 * 24 * 60 * 60
+PRODUCT_STORE_MAX_BYTES = 512 * 1024 * 1024
+PRODUCT_STORE_SWEEP_INTERVAL_IN_SECONDS = 10 * 60
+
+# Version of the stored payloads: a hash of the ProductData schema, so the products stored before a change of its
+# fields (e.g. without the quantity or the ingredients) are read as misses, then swept when they expire
+PRODUCT_PAYLOAD_VERSION = hashlib.blake2b(
+    json.dumps(ProductData.model_json_schema(), sort_keys=True).encode(), digest_size=4
+).hexdigest()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_fetched_at ON products (fetched_at);
+"""
+
+
+class ProductStore:
+    """
+    On-disk cache of products, stored as zlib-compressed JSON along with their fetch time.
+
+    Expired entries are removed by a sweep, which also removes the oldest entries
+    when the total size of the payloads exceeds the size cap.
+    The rows are keyed by the key of the product and the payload version, so the stale payloads are never read.
+    The sweep runs in a background task of each worker, see sweep_product_store_periodically.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        ttl: float = PRODUCT_STORE_TTL_IN_SECONDS,
+        max_bytes: int = PRODUCT_STORE_MAX_BYTES,
+        payload_version: str = PRODUCT_PAYLOAD_VERSION,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            path: Path of the SQLite database file, created if needed
+            ttl: Time to live of an entry, in seconds
+            max_bytes: Maximum total size of the compressed payloads, in bytes
+            payload_version: Version of the payloads read and written by this store
+            clock: Wall clock used for the fetch times, shared by all the processes (can be replaced in tests)
+        """
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.payload_version = payload_version
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    def get(self, key: str, include_expired: bool = False) -> ProductData | None:
+        """
+        Return the stored product for this key, or None if it is missing, expired or unreadable
+
+        Args:
+            key: Key of the product
+            include_expired: If True, an expired product not swept yet is returned too (used when OFF is down)
+        """
+        min_fetched_at = float("-inf") if include_expired else self._clock() - self.ttl
+        try:
+            with self._lock:
+                row = (
+                    self._connect()
+                    .execute(
+                        "SELECT payload FROM products WHERE key = ? AND fetched_at > ?",
+                        (self._get_row_key(key), min_fetched_at),
+                    )
+                    .fetchone()
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Can't read product {key} from the product store: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        try:
+            return ProductData.model_validate_json(zlib.decompress(row[0]))
+        except (zlib.error, ValidationError) as e:
+            logger.warning(f"Invalid product {key} in the product store: {e}")
+            return None
+
+    def set(self, key: str, product_data: ProductData) -> None:
+        """Store a product with the current time as fetch time"""
+        payload = zlib.compress(product_data.__pydantic_serializer__.to_json(product_data))
+        now = self._clock()
+        try:
+            with self._lock:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO products (key, payload, size, fetched_at) VALUES (?, ?, ?, ?)",
+                    (self._get_row_key(key), payload, len(payload), now),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Can't write product {key} to the product store: {e}")
+
+    def invalidate(self, key: str) -> None:
+        """Remove a product from the store, if present"""
+        try:
+            with self._lock:
+                self._connect().execute("DELETE FROM products WHERE key = ?", (self._get_row_key(key),))
+        except sqlite3.Error as e:
+            logger.warning(f"Can't remove product {key} from the product store: {e}")
+
+    def sweep(self) -> int:
+        """
+        Remove the expired entries, then the oldest ones until the store fits in its size cap.
+
+        Returns:
+            The number of removed entries
+        """
+        now = self._clock()
+        try:
+            with self._lock:
+                connection = self._connect()
+                expired = connection.execute("DELETE FROM products WHERE fetched_at <= ?", (now - self.ttl,)).rowcount
+                over_size = connection.execute(
+                    """
+                    DELETE FROM products WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY fetched_at DESC, key) AS cumulative_size
+                            FROM products
+                        )
+                        WHERE cumulative_size > ?
+                    )
+                    """,
+                    (self.max_bytes,),
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Can't sweep the product store: {e}")
+            return 0
+
+        return expired + over_size
+
+    def close(self) -> None:
+        """Close the connection to the database"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _get_row_key(self, key: str) -> str:
+        return f"{key}@{self.payload_version}"
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the connection on first use, so each worker process gets its own one"""
+        if self._connection is None:
+            self._connection = connect_sqlite_database(self.path, SCHEMA)
+        return self._connection
+
+
+def connect_sqlite_database(path: Path, schema: str) -> sqlite3.Connection:
+    """
+    Open a SQLite database in WAL mode, in autocommit mode, and create its schema if needed.
+
+    Args:
+        path: Path of the database file, created with its parent directories if needed
+        schema: SQL script creating the tables and indexes (with IF NOT EXISTS clauses)
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(schema)
+    return connection
+
+
+async def sweep_product_store_periodically(
+    store: ProductStore, interval: float = PRODUCT_STORE_SWEEP_INTERVAL_IN_SECONDS
+) -> None:
+    """Sweep the store in a thread now, then at each interval until cancelled"""
+    while True:
+        removed = await asyncio.to_thread(store.sweep)
+        if removed:
+            logger.info(f"{removed} products removed from the product store")
+        await asyncio.sleep(interval)
+
+
+@lru_cache()
+def get_product_store() -> ProductStore:
+    return ProductStore(os.getenv(PRODUCT_STORE_PATH_ENV, DEFAULT_PRODUCT_STORE_PATH))
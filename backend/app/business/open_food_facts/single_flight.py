@@ -0,0 +1,62 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class _Call(Generic[T]):
+    task: asyncio.Task[T]
+    waiters: int = 0
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesce concurrent calls sharing the same key into a single execution.
+
+    While a call for a key is in flight, other callers for the same key await its result
+    (or its exception) instead of starting a new one.
+
+    The call runs in its own task: a cancelled caller stops waiting without cancelling the call
+    for the others, and the call is only cancelled when all its callers have been cancelled.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call[T]] = {}
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run the function, or join the call already in flight for this key.
+
+        Args:
+            key: Key identifying the call (e.g. the barcode)
+            function: Coroutine function to run if no call is in flight for this key
+
+        Returns:
+            The result of the call
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(function()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Forget the call first, so a caller arriving before the task ends starts a new call
+                # instead of joining the cancelled one
+                self._forget(key, call)
+                call.task.cancel()
+
+    def in_flight(self) -> int:
+        """Return the number of calls currently in flight"""
+        return len(self._calls)
+
+    def _forget(self, key: Hashable, call: _Call[T]) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,226 @@
+"""
+Ancestry index of the Open Food Facts taxonomies (categories, labels, ingredients), built from a local copy
+of their JSON exports.
+
+Taxonomies: https://static.openfoodfacts.org/data/taxonomies/categories.json (and labels.json, ingredients.json)
+
+Each tag of the taxonomies gets an ordinal in topological order (parents first), and only the ordinals of its parents
+are kept, so the index grows with the number of edges of the taxonomies. The ancestry of all the tags with respect to
+a few tags (e.g. the rule tags of the breeding types) is computed in a single pass, as bitsets of a few bits.
+The index is saved to a zlib-compressed binary file, loaded at startup without parsing the taxonomies again.
+"""
+
+import json
+import logging
+import os
+import struct
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+logger = logging.getLogger("app")
+
+TAXONOMY_INDEX_PATH_ENV = "OFF_TAXONOMY_INDEX_PATH"
+DEFAULT_TAXONOMY_INDEX_PATH = Path("data") / "off_taxonomy_index.bin"
+
+# Format of the binary file: magic, then the number of tags, the length of the joined tags and the number of edges,
+# followed by the joined tags, the number of parents of each tag and the ordinals of the parents
+FILE_MAGIC = b"OFFTAXO2"
+HEADER = struct.Struct("<III")
+
+
+class TaxonomyIndex:
+    """
+    Tags of the taxonomies, in topological order, with the ordinals of their parents.
+    """
+
+    def __init__(self, tags: List[str], parents: List[Tuple[int, ...]]):
+        """
+        Args:
+            tags: Tag of each ordinal, the parents of a tag coming before it
+            parents: Ordinals of the parents of each ordinal
+        """
+        self.tags = tags
+        self.parents = parents
+        self._ordinals = {tag: ordinal for ordinal, tag in enumerate(tags)}
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def get_ordinal(self, tag: str) -> int | None:
+        """Return the ordinal of the tag, None if it isn't in the taxonomies"""
+        return self._ordinals.get(tag)
+
+    def get_ancestors(self, tag: str) -> Set[str]:
+        """Return the ancestors of the tag, including itself (empty if it isn't in the taxonomies)"""
+        ordinal = self._ordinals.get(tag)
+        if ordinal is None:
+            return set()
+        ancestors = {ordinal}
+        stack = [ordinal]
+        while stack:
+            for parent in self.parents[stack.pop()]:
+                if parent not in ancestors:
+                    ancestors.add(parent)
+                    stack.append(parent)
+        return {self.tags[ancestor] for ancestor in ancestors}
+
+    def get_descendants(self, ancestor: str) -> List[str]:
+        """Return the ancestor and all its descendants (empty if it isn't in the taxonomies)"""
+        ordinal = self._ordinals.get(ancestor)
+        if ordinal is None:
+            return []
+        # The descendants come after the ancestor, and after their parents
+        descendants = {ordinal}
+        for child in range(ordinal + 1, len(self.tags)):
+            if not descendants.isdisjoint(self.parents[child]):
+                descendants.add(child)
+        return [self.tags[descendant] for descendant in sorted(descendants)]
+
+    def is_descendant(self, tag: str, ancestor: str) -> bool:
+        """Check if the tag is the ancestor or one of its descendants"""
+        return ancestor in self.get_ancestors(tag)
+
+    def get_ancestors_bitsets(self, tags: Sequence[str]) -> Dict[str, int]:
+        """
+        Compute which of the given tags are the ancestors of each tag of the taxonomies.
+
+        Args:
+            tags: The ancestors to look for, bit i of the bitsets standing for tags[i]
+
+        Returns:
+            The bitset of the ancestors among the given tags (including itself) of each tag descending
+            from at least one of them
+        """
+        bitsets = [0] * len(self.tags)
+        for index, tag in enumerate(tags):
+            if (ordinal := self._ordinals.get(tag)) is not None:
+                bitsets[ordinal] |= 1 << index
+        # The parents of a tag come before it, so their bitsets are complete when it is reached
+        for ordinal, parents in enumerate(self.parents):
+            for parent in parents:
+                bitsets[ordinal] |= bitsets[parent]
+        return {self.tags[ordinal]: bitset for ordinal, bitset in enumerate(bitsets) if bitset}
+
+    @classmethod
+    def from_parents(cls, parents_by_tag: Dict[str, List[str]]) -> "TaxonomyIndex":
+        """
+        Build the index from the parents of each tag.
+
+        The tags are numbered in topological order (parents first). The edges creating cycles are ignored.
+        """
+        tags: List[str] = []
+        ordinals: Dict[str, int] = {}
+        in_progress: set[str] = set()
+
+        for root in parents_by_tag:
+            if root in ordinals:
+                continue
+            # Iterative depth-first search, a tag being numbered after all its parents
+            stack = [(root, iter(parents_by_tag.get(root, ())))]
+            in_progress.add(root)
+            while stack:
+                tag, parents = stack[-1]
+                for parent in parents:
+                    if parent in ordinals:
+                        continue
+                    if parent in in_progress:
+                        logger.warning(f"Cycle in the taxonomy between {tag} and {parent}, edge ignored")
+                        continue
+                    in_progress.add(parent)
+                    stack.append((parent, iter(parents_by_tag.get(parent, ()))))
+                    break
+                else:
+                    stack.pop()
+                    in_progress.discard(tag)
+                    if tag not in ordinals:
+                        ordinals[tag] = len(tags)
+                        tags.append(tag)
+
+        parent_ordinals = [
+            # The parents numbered after the tag are the ignored edges of a cycle
+            tuple(ordinals[parent] for parent in parents_by_tag.get(tag, ()) if ordinals[parent] < ordinal)
+            for ordinal, tag in enumerate(tags)
+        ]
+        return cls(tags, parent_ordinals)
+
+    def save(self, path: Path) -> None:
+        """Save the index to a binary file"""
+        joined_tags = "\n".join(self.tags).encode()
+        parent_ordinals = [parent for parents in self.parents for parent in parents]
+        chunks = [
+            HEADER.pack(len(self.tags), len(joined_tags), len(parent_ordinals)),
+            joined_tags,
+            struct.pack(f"<{len(self.parents)}I", *(len(parents) for parents in self.parents)),
+            struct.pack(f"<{len(parent_ordinals)}I", *parent_ordinals),
+        ]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(FILE_MAGIC + zlib.compress(b"".join(chunks)))
+
+    @classmethod
+    def load(cls, path: Path) -> "TaxonomyIndex":
+        """
+        Load an index saved with save().
+
+        Raises:
+            ValueError: If the file isn't a taxonomy index
+        """
+        content = path.read_bytes()
+        if not content.startswith(FILE_MAGIC):
+            raise ValueError(f"{path} is not a taxonomy index")
+        data = zlib.decompress(content[len(FILE_MAGIC) :])
+        tag_count, tags_length, edge_count = HEADER.unpack_from(data)
+        offset = HEADER.size
+        tags = data[offset : offset + tags_length].decode().split("\n") if tag_count else []
+        offset += tags_length
+        parent_counts = struct.unpack_from(f"<{tag_count}I", data, offset)
+        offset += 4 * tag_count
+        parent_ordinals = struct.unpack_from(f"<{edge_count}I", data, offset)
+
+        parents: List[Tuple[int, ...]] = []
+        start = 0
+        for parent_count in parent_counts:
+            parents.append(parent_ordinals[start : start + parent_count])
+            start += parent_count
+        return cls(tags, parents)
+
+
+def read_taxonomy_json(paths: Iterable[Path]) -> Dict[str, List[str]]:
+    """
+    Read the parents of each tag from OFF taxonomy JSON exports ({tag: {"parents": [...], ...}}).
+
+    The taxonomies are merged, their tags being prefixed by their language (e.g. en:eggs).
+    """
+    parents_by_tag: Dict[str, List[str]] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as taxonomy_file:
+            taxonomy = json.load(taxonomy_file)
+        for tag, entry in taxonomy.items():
+            parents = parents_by_tag.setdefault(tag, [])
+            parents.extend(parent for parent in entry.get("parents") or () if parent not in parents)
+    return parents_by_tag
+
+
+def load_taxonomy_index(path: Path | str | None = None) -> TaxonomyIndex | None:
+    """
+    Load the taxonomy index from its binary file (OFF_TAXONOMY_INDEX_PATH by default).
+
+    Returns:
+        The index, or None if the file doesn't exist or is invalid (only exact tags are matched then)
+    """
+    path = Path(path) if path else Path(os.getenv(TAXONOMY_INDEX_PATH_ENV, DEFAULT_TAXONOMY_INDEX_PATH))
+    if not path.exists():
+        logger.info(f"No taxonomy index at {path}, only the exact tags are used to detect the breeding types")
+        return None
+    try:
+        return TaxonomyIndex.load(path)
+    except (OSError, ValueError, zlib.error, struct.error) as e:
+        logger.warning(f"Can't load the taxonomy index {path}: {e}")
+        return None
+
+
+@lru_cache
+def get_taxonomy_index() -> TaxonomyIndex | None:
+    """Return the taxonomy index of OFF_TAXONOMY_INDEX_PATH, loaded once"""
+    return load_taxonomy_index()
@@ -0,0 +1,258 @@
+"""
+Protection of the OFF endpoints against their failures: a circuit breaker and an adaptive concurrency limit
+per endpoint. When an endpoint fails or slows down, the calls to it are rejected immediately instead of
+waiting for the timeouts, and the knowledge panel path falls back to the other endpoint or to cached data.
+"""
+
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from enum import StrEnum, auto
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Dict
+
+import httpx
+from pydantic import BaseModel
+
+from app.config.exceptions import ServiceUnavailableException
+
+logger = logging.getLogger("app")
+
+# Names of the guarded OFF endpoints (also used as source names by the hedged fetcher)
+OFF_V3 = "off_v3"
+SEARCH_A_LICIOUS = "search_a_licious"
+
+
+class CircuitState(StrEnum):
+    CLOSED = auto()
+    OPEN = auto()
+    HALF_OPEN = auto()
+
+
+class UpstreamStatus(BaseModel):
+    """
+    State of the protection of an endpoint, for monitoring.
+    """
+
+    state: CircuitState
+    consecutive_failures: int
+    in_flight: int
+    concurrency_limit: float
+    rejected_calls: int
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker: opens after failure_threshold consecutive failures, and rejects the calls while open.
+
+    After reset_timeout seconds, the circuit is half-open: a single probe call is allowed.
+    Its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(
+        self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            failure_threshold: Number of consecutive failures opening the circuit
+            reset_timeout: Delay after which an open circuit lets a probe call through, in seconds
+            clock: Monotonic clock (can be replaced in tests)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self._clock = clock
+        self._opened_at: float | None = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> CircuitState:
+        if self._opened_at is None:
+            return CircuitState.CLOSED
+        if self._clock() - self._opened_at < self.reset_timeout:
+            return CircuitState.OPEN
+        return CircuitState.HALF_OPEN
+
+    def allow_call(self) -> bool:
+        """Check if a call can be made, and reserve the probe call when the circuit is half-open"""
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("Circuit closed")
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self._opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+
+    def record_cancellation(self) -> None:
+        """Release the probe call when it was cancelled, without changing the state"""
+        self._probe_in_flight = False
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    Limit of concurrent calls adapted with AIMD (additive increase, multiplicative decrease).
+
+    The limit grows by 1 / limit on each fast successful call (so by ~1 per round of calls),
+    and is multiplied by backoff_ratio on a failure or a call slower than latency_threshold.
+    Only the calls started after the last decrease can decrease it again, so a burst of failures
+    of concurrent calls decreases the limit once.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 20,
+        min_limit: float = 2,
+        max_limit: float = 200,
+        latency_threshold: float = 2.0,
+        backoff_ratio: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            initial_limit: Limit of concurrent calls at startup
+            min_limit: Minimum limit
+            max_limit: Maximum limit
+            latency_threshold: Latency above which a call is considered as a sign of overload, in seconds
+            backoff_ratio: Ratio applied to the limit on overload
+            clock: Monotonic clock (can be replaced in tests)
+        """
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self._clock = clock
+        self._decreased_at = float("-inf")
+
+    def try_acquire(self) -> bool:
+        """Reserve a slot for a call, if the limit is not reached"""
+        if self.in_flight >= self.limit:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, started_at: float, failed: bool | None) -> None:
+        """
+        Release the slot of a call and adapt the limit.
+
+        Args:
+            started_at: Clock time at which the call started
+            failed: If the call failed, or None if it was cancelled (the limit is left unchanged)
+        """
+        self.in_flight -= 1
+        if failed is None:
+            return
+
+        now = self._clock()
+        if failed or now - started_at > self.latency_threshold:
+            if started_at >= self._decreased_at:
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                self._decreased_at = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class UpstreamGuard:
+    """
+    Circuit breaker and adaptive concurrency limit of an OFF endpoint.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        breaker: CircuitBreaker | None = None,
+        concurrency_limit: AdaptiveConcurrencyLimit | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self.concurrency_limit = concurrency_limit or AdaptiveConcurrencyLimit(clock=clock)
+        self.rejected_calls = 0
+        self._clock = clock
+
+    @asynccontextmanager
+    async def call(self) -> AsyncIterator[None]:
+        """
+        Guard a call to the endpoint, made in the body of the context manager.
+
+        Network errors, 5XX and 429 responses, and the rate limit rejections raised by the call count as failures
+        of the endpoint.
+        Other errors (e.g. 404 for an unknown product) mean that the endpoint works.
+
+        Raises:
+            ServiceUnavailableException: If the circuit is open or the concurrency limit is reached
+        """
+        if not self.breaker.allow_call():
+            self.rejected_calls += 1
+            raise ServiceUnavailableException(f"Circuit open for {self.name}")
+        if not self.concurrency_limit.try_acquire():
+            self.breaker.record_cancellation()
+            self.rejected_calls += 1
+            raise ServiceUnavailableException(f"Concurrency limit reached for {self.name}")
+
+        started_at = self._clock()
+        failed: bool | None = None
+        try:
+            yield
+            failed = False
+        except Exception as e:
+            failed = is_upstream_failure(e)
+            raise
+        finally:
+            self.concurrency_limit.release(started_at, failed)
+            if failed is None:
+                self.breaker.record_cancellation()
+            elif failed:
+                self.breaker.record_failure()
+                if self.breaker.state == CircuitState.OPEN:
+                    logger.warning(f"Circuit open for {self.name}")
+            else:
+                self.breaker.record_success()
+
+    def status(self) -> UpstreamStatus:
+        return UpstreamStatus(
+            state=self.breaker.state,
+            consecutive_failures=self.breaker.consecutive_failures,
+            in_flight=self.concurrency_limit.in_flight,
+            concurrency_limit=self.concurrency_limit.limit,
+            rejected_calls=self.rejected_calls,
+        )
+
+
+def is_upstream_failure(exception: Exception) -> bool:
+    """Check if an exception raised by a call shows that the endpoint is failing or overloaded"""
+    if isinstance(exception, ServiceUnavailableException):  # Rate limited by the outbound rate limiter
+        return True
+    if isinstance(exception, httpx.HTTPStatusError):
+        status_code = exception.response.status_code
+        return status_code >= 500 or status_code == 429
+    return isinstance(exception, httpx.TransportError)
+
+
+@lru_cache()
+def get_upstream_guards() -> Dict[str, UpstreamGuard]:
+    failure_threshold = int(os.getenv("OFF_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    reset_timeout = float(os.getenv("OFF_CIRCUIT_RESET_TIMEOUT", "30"))
+    return {
+        name: UpstreamGuard(name, CircuitBreaker(failure_threshold, reset_timeout))
+        for name in (OFF_V3, SEARCH_A_LICIOUS)
+    }
+
+
+def get_upstream_guard(name: str) -> UpstreamGuard:
+    return get_upstream_guards()[name]
@@ -5,6 +5,8 @@ Defines custom exceptions and utilities for consistent error handling.
 
 import logging
 
+from app.enums.open_food_facts.enums import ProductFailureReason
+
 logger = logging.getLogger("app")
 
 
@@ -34,8 +36,48 @@ class ResourceNotFoundException(BaseAppException):
     default_message = "Resource not found"
 
 
+class ProductNotFoundException(ResourceNotFoundException):
+    """Exception raised when a product doesn't exist on OFF or can't be used to compute a pain report."""
+
+    def __init__(self, message=None, reason: ProductFailureReason | None = None):
+        """
+        Initialize the exception with a message and the reason of the failure.
+
+        Args:
+            message: The error message
+            reason: Why the product can't be used, if the failure is permanent enough to be cached
+        """
+        super().__init__(message)
+        self.reason = reason
+
+
 class ExternalServiceException(BaseAppException):
     """Exception raised when an external service fails."""
 
     status_code = 502
     default_message = "External service error"
+
+
+class ServiceUnavailableException(BaseAppException):
+    """Exception raised when an external service is not called because it is failing or overloaded."""
+
+    status_code = 503
+    default_message = "Service temporarily unavailable"
+
+    def __init__(self, message=None, retry_after: float | None = None):
+        """
+        Initialize the exception with a message and the delay after which the service may be available again.
+
+        Args:
+            message: The error message
+            retry_after: Delay before retrying, in seconds, sent in the Retry-After header of the response
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class InvalidBarcodeException(BaseAppException):
+    """Exception raised when a barcode is not a valid GTIN."""
+
+    status_code = 400
+    default_message = "Invalid barcode"
@@ -0,0 +1,151 @@
+"""
+Application-scoped HTTP client used for all the calls to Open Food Facts.
+
+The client is created once in the FastAPI lifespan, so connections to OFF are kept alive and reused
+between requests instead of paying a new TCP + TLS handshake for every knowledge panel.
+Its requests to the OFF hosts go through the rate limiter (see rate_limiter).
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+import httpx
+from pydantic import BaseModel
+
+from app.config.rate_limiter import RateLimitedTransport, RequestPriority, create_token_buckets, request_priority
+
+logger = logging.getLogger("app")
+
+ENV_PREFIX = "OFF_HTTP_"
+USER_AGENT = "SufferingFootprint/0.1.0 (https://empreinte-souffrance.org)"
+
+
+class HttpClientSettings(BaseModel):
+    """
+    Pool, timeout and protocol settings of the shared HTTP client.
+
+    Every field can be overridden with an environment variable prefixed by OFF_HTTP_ (e.g. OFF_HTTP_READ_TIMEOUT=5).
+    Rate limits are given as comma-separated host=requests_per_minute pairs
+    (e.g. OFF_HTTP_RATE_LIMITS=world.openfoodfacts.org=100,search.openfoodfacts.org=600).
+    """
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0  # in seconds
+    connect_timeout: float = 3.0  # in seconds
+    read_timeout: float = 10.0  # in seconds
+    write_timeout: float = 5.0  # in seconds
+    pool_timeout: float = 5.0  # in seconds
+    http2: bool = True
+    warmup_urls: List[str] = ["https://world.openfoodfacts.org", "https://search.openfoodfacts.org"]
+    # Requests per minute allowed by OFF for each host (https://openfoodfacts.github.io/openfoodfacts-server/api/)
+    rate_limits: Dict[str, int] = {"world.openfoodfacts.org": 100, "search.openfoodfacts.org": 600}
+
+    @classmethod
+    def from_env(cls) -> "HttpClientSettings":
+        """Build the settings from the default values and the OFF_HTTP_* environment variables"""
+        values: dict[str, str | list[str] | dict[str, str]] = {}
+        for name in cls.model_fields:
+            raw_value = os.getenv(f"{ENV_PREFIX}{name.upper()}")
+            if raw_value is None:
+                continue
+            if name == "warmup_urls":
+                values[name] = raw_value.split(",")
+            elif name == "rate_limits":
+                values[name] = dict(pair.split("=", 1) for pair in raw_value.split(",") if pair)
+            else:
+                values[name] = raw_value
+        return cls.model_validate(values)
+
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def create_http_client(
+    settings: HttpClientSettings | None = None, transport: httpx.AsyncBaseTransport | None = None
+) -> httpx.AsyncClient:
+    """
+    Create a pooled HTTP client, rate limited for the OFF hosts.
+
+    Args:
+        settings: Pool, timeout, protocol and rate limit settings, read from the environment if not given
+        transport: Optional transport replacing the network one (e.g. httpx.MockTransport in tests)
+
+    Returns:
+        A new httpx.AsyncClient, that the caller is responsible for closing
+    """
+    settings = settings or HttpClientSettings.from_env()
+    transport = transport or httpx.AsyncHTTPTransport(
+        http2=settings.http2,
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+    )
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            connect=settings.connect_timeout,
+            read=settings.read_timeout,
+            write=settings.write_timeout,
+            pool=settings.pool_timeout,
+        ),
+        headers={"User-Agent": USER_AGENT},
+        transport=RateLimitedTransport(transport, create_token_buckets(settings.rate_limits)),
+    )
+
+
+async def warmup_http_client(client: httpx.AsyncClient, urls: List[str]) -> None:
+    """
+    Open the connections to the given hosts so the first requests don't pay for the handshakes.
+    A failing warmup is only logged: the connection will be opened by the first real request.
+    """
+    with request_priority(RequestPriority.BACKGROUND):
+        results = await asyncio.gather(*(client.head(url) for url in urls), return_exceptions=True)
+    for url, result in zip(urls, results, strict=True):
+        if isinstance(result, BaseException):
+            logger.warning(f"Can't warm up HTTP connection to {url}: {result!r}")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared HTTP client.
+
+    The client is normally created by the application lifespan. When the lifespan did not run
+    (scripts, direct calls in tests), a client is lazily created with the default settings.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+def set_http_client(client: httpx.AsyncClient | None) -> None:
+    """Replace the shared HTTP client (None resets it, a new one will be created on next use)"""
+    global _http_client
+    _http_client = client
+
+
+@asynccontextmanager
+async def http_client_lifespan(
+    settings: HttpClientSettings | None = None, transport: httpx.AsyncBaseTransport | None = None
+) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Create, warm up and install the shared HTTP client for the lifetime of the application, then close it.
+
+    Args:
+        settings: Pool, timeout and protocol settings, read from the environment if not given
+        transport: Optional transport replacing the network one
+    """
+    settings = settings or HttpClientSettings.from_env()
+    client = create_http_client(settings, transport)
+    set_http_client(client)
+    try:
+        await warmup_http_client(client, settings.warmup_urls)
+        yield client
+    finally:
+        set_http_client(None)
+        await client.aclose()
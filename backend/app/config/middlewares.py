@@ -1,3 +1,4 @@
+import math
 from urllib.parse import parse_qs
 
 from fastapi import Request
@@ -66,6 +67,11 @@ class GlobalExceptionMiddleware(BaseHTTPMiddleware):
             if 500 <= status_code < 600:
                 detail = "An unexpected server error occurred"
 
+            # Tell the client when to retry if the service is overloaded
+            headers = {}
+            if (retry_after := getattr(e, "retry_after", None)) is not None:
+                headers["Retry-After"] = str(math.ceil(retry_after))
+
             # Create JSON response with error details
             return JSONResponse(
                 status_code=status_code,
@@ -75,4 +81,5 @@ class GlobalExceptionMiddleware(BaseHTTPMiddleware):
                         "message": detail,
                     }
                 },
+                headers=headers,
             )
@@ -0,0 +1,238 @@
+"""
+Outbound rate limiting of the calls to Open Food Facts, which enforces per-IP rate limits.
+
+Every request to a rate-limited host takes a token from the bucket of the host. When the bucket is empty,
+the requests wait in a priority queue, so the knowledge panels requested by users go before the background jobs.
+A 429 response pauses the bucket of the host for the delay of its Retry-After header (or an exponential backoff),
+and the request is retried if its priority allows waiting that long. A request never waits for a token longer
+than the maximum wait of its priority: it fails fast instead, so a long pause doesn't block the users' requests.
+The rate limited requests which aren't retried raise ServiceUnavailableException, with the delay before retrying.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import httpx
+
+from app.config.exceptions import ServiceUnavailableException
+
+logger = logging.getLogger("app")
+
+RETRYABLE_METHODS = {"GET", "HEAD"}
+
+
+class RequestPriority(IntEnum):
+    """Priority of the outbound requests (lower values go first)"""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+# Longest delay a request may wait for the end of a 429 pause before being retried, by priority, in seconds
+MAX_RETRY_WAIT_IN_SECONDS = {RequestPriority.INTERACTIVE: 2.0, RequestPriority.BACKGROUND: 120.0}
+# Longest delay a request may wait for a token before failing, by priority, in seconds
+MAX_TOKEN_WAIT_IN_SECONDS = {RequestPriority.INTERACTIVE: 5.0, RequestPriority.BACKGROUND: 300.0}
+
+_request_priority: ContextVar[RequestPriority] = ContextVar("request_priority", default=RequestPriority.INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: RequestPriority) -> Iterator[None]:
+    """Give a priority to the outbound requests made in the block (and in the tasks it creates)"""
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at a constant rate, whose waiters are served by priority, then in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            rate: Number of tokens added per second
+            capacity: Maximum number of tokens (the allowed burst)
+            clock: Monotonic clock (can be replaced in tests)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future[None]]] = []
+        self._arrival_order = itertools.count()
+        self._wakeup: asyncio.TimerHandle | None = None
+
+    async def acquire(
+        self, priority: RequestPriority = RequestPriority.INTERACTIVE, max_wait: float | None = None
+    ) -> None:
+        """
+        Take a token, waiting for it after the waiters of higher or equal priority if the bucket is empty.
+
+        Args:
+            priority: Priority of the request
+            max_wait: Longest wait for the token, in seconds (MAX_TOKEN_WAIT_IN_SECONDS of the priority by default)
+
+        Raises:
+            ServiceUnavailableException: If the bucket is paused for longer than the maximum wait,
+                or if no token was given in time
+        """
+        if not self._waiters and self._try_take():
+            return
+
+        if max_wait is None:
+            max_wait = MAX_TOKEN_WAIT_IN_SECONDS[priority]
+        if (pause := self._paused_until - self._clock()) > max_wait:
+            raise ServiceUnavailableException(
+                f"Rate limited, no request allowed for more than {max_wait:.1f}s", retry_after=pause
+            )
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrival_order), future))
+        self._dispatch()
+        try:
+            # The future is cancelled on timeout, so the dispatch skips it
+            await asyncio.wait_for(future, timeout=max_wait)
+        except asyncio.TimeoutError:
+            raise ServiceUnavailableException(
+                f"Rate limited, no token given within {max_wait:.1f}s", retry_after=max_wait
+            ) from None
+
+    def pause(self, seconds: float) -> None:
+        """Empty the bucket and stop refilling it for the given delay (e.g. after a 429 response)"""
+        self._refill()
+        self._tokens = 0
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def waiting(self) -> int:
+        """Return the number of requests waiting for a token"""
+        return sum(not future.done() for _, _, future in self._waiters)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        refill_from = max(self._updated_at, self._paused_until)
+        if now > refill_from:
+            self._tokens = min(self.capacity, self._tokens + (now - refill_from) * self.rate)
+        self._updated_at = max(now, self._updated_at)
+
+    def _try_take(self) -> bool:
+        self._refill()
+        if self._clock() < self._paused_until or self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _dispatch(self) -> None:
+        """Give the available tokens to the waiters, and schedule the next dispatch if some are left"""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():  # Cancelled waiter
+                heapq.heappop(self._waiters)
+                continue
+            if not self._try_take():
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+        if self._waiters:
+            delay = max(self._paused_until - self._clock(), (1 - self._tokens) / self.rate, 0.001)
+            self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Transport taking a token from the bucket of the host before each request, and handling the 429 responses.
+
+    A 429 response which isn't retried raises ServiceUnavailableException, so the callers don't take it
+    for an error of the request.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        buckets: Dict[str, TokenBucket],
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+    ):
+        """
+        Args:
+            transport: The transport sending the requests
+            buckets: Token bucket of each rate-limited host (requests to other hosts are not limited)
+            max_retries: Maximum number of retries of a request answered with a 429 response
+            backoff_base: Pause after a first 429 response without Retry-After header, doubled at each retry
+        """
+        self.transport = transport
+        self.buckets = buckets
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        bucket = self.buckets.get(request.url.host)
+        if bucket is None:
+            return await self.transport.handle_async_request(request)
+
+        priority = _request_priority.get()
+        attempt = 0
+        while True:
+            await bucket.acquire(priority)
+            response = await self.transport.handle_async_request(request)
+            if response.status_code != 429:
+                return response
+
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is None:
+                delay = self.backoff_base * 2**attempt
+            bucket.pause(delay)
+            logger.warning(f"Rate limited by {request.url.host}, paused for {delay:.1f}s")
+
+            if (
+                attempt >= self.max_retries
+                or request.method not in RETRYABLE_METHODS
+                or delay > MAX_RETRY_WAIT_IN_SECONDS[priority]
+            ):
+                await response.aclose()
+                raise ServiceUnavailableException(f"Rate limited by {request.url.host}", retry_after=delay)
+            await response.aclose()
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return the delay of a Retry-After header (a number of seconds or an HTTP date), in seconds"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def create_token_buckets(requests_per_minute_by_host: Dict[str, int]) -> Dict[str, TokenBucket]:
+    """Create the token bucket of each host, allowing a burst of one minute of requests"""
+    return {
+        host: TokenBucket(rate=requests_per_minute / 60, capacity=requests_per_minute)
+        for host, requests_per_minute in requests_per_minute_by_host.items()
+    }
@@ -86,6 +86,15 @@ class PainType(StrEnum):
         return mappings.get(self.value, self.value)
 
 
+class ProductFailureReason(StrEnum):
+    """Why no pain report can be computed for a product"""
+
+    UPSTREAM_NOT_FOUND = auto()
+    VALIDATION_FAILURE = auto()
+    NO_BREEDING_TYPE = auto()
+    ZERO_WEIGHT = auto()
+
+
 # Time in pain by animal type, per 100g, in seconds, separated by pain type
 TIME_IN_PAIN_FOR_100G_IN_SECONDS = {
     AnimalType.LAYING_HEN: {
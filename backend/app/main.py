@@ -1,8 +1,17 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.open_food_facts.routes import router as off_router
+from app.business.open_food_facts.breeding_type_index import get_breeding_type_index
+from app.business.open_food_facts.knowledge_panel import build_panel_artifacts
+from app.business.open_food_facts.product_index import get_product_index
+from app.business.open_food_facts.product_invalidation import watch_product_index_changes
+from app.business.open_food_facts.product_store import get_product_store, sweep_product_store_periodically
+from app.config.http_client import http_client_lifespan
 from app.config.logging import setup_logging
 from app.config.middlewares import (
     GlobalExceptionMiddleware,
@@ -13,10 +22,33 @@ from app.config.middlewares import (
 setup_logging()
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the application-scoped resources at startup and release them at shutdown.
+    """
+    product_store = get_product_store()
+    product_store_sweep = asyncio.create_task(sweep_product_store_periodically(product_store))
+    # Load the taxonomy index before the first request
+    get_breeding_type_index()
+    # Translate the labels and render the static parts of the knowledge panels of each locale
+    build_panel_artifacts()
+    product_changes_watch = asyncio.create_task(watch_product_index_changes(get_product_index()))
+    try:
+        async with http_client_lifespan():
+            yield
+    finally:
+        product_changes_watch.cancel()
+        product_store_sweep.cancel()
+        product_store.close()
+        get_product_index().close()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Suffering Footprint API",
     description="API for calculating and displaying the suffering footprint of food products",
+    lifespan=lifespan,
 )
 
 
@@ -1,25 +1,97 @@
-from typing import List
+from typing import Any, Dict, List
 
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, ConfigDict, HttpUrl, SkipValidation, TypeAdapter, field_serializer, model_validator
+
+from app.config.i18n import get_i18n
+
+# Fields kept for each node of the ingredients tree, in addition to its sub-ingredients
+INGREDIENT_FIELDS = ("id", "percent_estimate")
 
 
 class ProductData(BaseModel):
     """
     Product data model for search-a-licious request.
+
+    The localized names of the product (product_name_{locale} in OFF) are kept in product_names
+    for the supported locales only, so a single ProductData serves all the locales.
     """
 
+    # The product_name_{locale} fields are received as extra fields, moved to product_names after validation
+    model_config = ConfigDict(extra="allow")
+
     categories_tags: List[str] | None = None
     labels_tags: List[str] | None = None
     image_url: HttpUrl | None = None
     product_name: str
+    product_names: Dict[str, str] = {}
     product_quantity_unit: str | None = None
     product_quantity: float | None = None
+    quantity: str | None = None
     allergens_tags: List[str] | None = None
     ingredients_tags: List[str] | None = None
-    ingredients: List[dict] | None = None
+    # Raw ingredients tree of OFF, not validated when the product is parsed: get_ingredients() prunes it when a
+    # calculator reads it, and it is saved pruned
+    ingredients: SkipValidation[List[dict] | None] = None
     countries: str | None = None
     countries_tags: List[str] | None = None
 
+    @model_validator(mode="after")
+    def collect_localized_product_names(self) -> "ProductData":
+        extra_fields = self.__pydantic_extra__ or {}
+        if not extra_fields:
+            return self
+        product_names = dict(self.product_names)
+        for locale in get_i18n().get_supported_locales():
+            # Names identical to the main one are not kept, get_product_name falls back to it
+            name = extra_fields.get(f"product_name_{locale}")
+            if isinstance(name, str) and name and name != self.product_name:
+                product_names[locale] = name
+        self.product_names = product_names
+        self.__pydantic_extra__ = {}
+        return self
+
+    @field_serializer("ingredients")
+    def serialize_ingredients(self, ingredients: Any) -> List[dict] | None:
+        return prune_ingredients(ingredients)
+
+    def get_ingredients(self) -> List[dict] | None:
+        """Return the ingredients tree, with only the fields read by the calculators"""
+        return prune_ingredients(self.ingredients)
+
+    def get_product_name(self, locale: str | None = None) -> str:
+        """Return the name of the product in the given locale, or its main name if OFF doesn't provide it"""
+        if locale is None:
+            return self.product_name
+        return self.product_names.get(locale, self.product_name)
+
+
+def prune_ingredients(ingredients: Any) -> List[dict] | None:
+    """
+    Keep only the fields of the ingredients tree read by the calculators (id, percent_estimate, ingredients),
+    as the full tree is the largest part of a product. The tree is walked iteratively, whatever its depth.
+    """
+    if not isinstance(ingredients, list):
+        return None
+    pruned_ingredients: List[dict] = []
+    stack = [(ingredients, pruned_ingredients)]
+    while stack:
+        source_ingredients, target_ingredients = stack.pop()
+        for ingredient in source_ingredients:
+            if not isinstance(ingredient, dict):
+                continue
+            pruned_ingredient = {field: ingredient[field] for field in INGREDIENT_FIELDS if field in ingredient}
+            target_ingredients.append(pruned_ingredient)
+            if isinstance(sub_ingredients := ingredient.get("ingredients"), list):
+                pruned_ingredient["ingredients"] = []
+                stack.append((sub_ingredients, pruned_ingredient["ingredients"]))
+    return pruned_ingredients
+
+
+# Fields of ProductData to request from OFF (the fetchers add the product_name_{locale} fields).
+# The ingredients tree gives the share of egg in composite products: it makes the responses larger,
+# but it is only validated when read, and pruned to INGREDIENT_FIELDS when the product is saved.
+OFF_PRODUCT_FIELDS = [field for field in ProductData.model_fields if field != "product_names"]
+
 
 class ProductResponse(BaseModel):
     """
@@ -36,3 +108,29 @@ class ProductResponseSearchALicious(BaseModel):
     """
 
     hits: List[ProductData]
+
+
+class ProductDataWithCode(ProductData):
+    """
+    Product data model with its barcode, for search-a-licious requests returning several products.
+    """
+
+    code: str
+
+    def to_product_data(self) -> ProductData:
+        """Return the ProductData without the barcode, without validating it again"""
+        return ProductData.model_construct(**{field: getattr(self, field) for field in ProductData.model_fields})
+
+
+class ProductResponseSearchALiciousBatch(BaseModel):
+    """
+    Response model for OFF search-a-licious API request on several barcodes.
+    """
+
+    hits: List[ProductDataWithCode]
+
+
+# Reusable adapters, validating the OFF responses directly from the raw JSON bytes
+PRODUCT_RESPONSE_ADAPTER = TypeAdapter(ProductResponse)
+PRODUCT_RESPONSE_SEARCH_A_LICIOUS_ADAPTER = TypeAdapter(ProductResponseSearchALicious)
+PRODUCT_RESPONSE_SEARCH_A_LICIOUS_BATCH_ADAPTER = TypeAdapter(ProductResponseSearchALiciousBatch)
@@ -1,6 +1,7 @@
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List
 
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 
 from app.enums.open_food_facts.enums import (
     AnimalType,
@@ -11,34 +12,152 @@ from app.enums.open_food_facts.enums import (
 )
 
 
-# Pain report models, used for calculation
-class BreedingTypeAndWeight(BaseModel):
+# Pain report records, used for calculation. They are slotted classes, not validated models:
+# pydantic models are only built for the API responses.
+@dataclass(slots=True)
+class BreedingTypeAndWeight:
     breeding_type: LayingHenBreedingType | BroilerChickenBreedingType
     animal_product_weight: float = 0  # in grams
 
 
-class PainLevelData(BaseModel):
+@dataclass(slots=True, frozen=True)
+class PainLevelData:
     pain_intensity: PainIntensity
     pain_type: PainType
     seconds_in_pain: int
 
 
-class AnimalPainReport(BaseModel):
+# Layout of the pain matrices: one row per pain type and one column per pain intensity, in the order of the enums
+PAIN_MATRIX_TYPES = tuple(PainType)
+PAIN_MATRIX_INTENSITIES = tuple(PainIntensity)
+_PAIN_TYPE_ORDINALS = {pain_type: ordinal for ordinal, pain_type in enumerate(PAIN_MATRIX_TYPES)}
+_PAIN_INTENSITY_ORDINALS = {pain_intensity: ordinal for ordinal, pain_intensity in enumerate(PAIN_MATRIX_INTENSITIES)}
+# Pain intensities with their column, in the order of PainIntensity.get_intensity_order()
+_ORDERED_INTENSITY_COLUMNS = tuple(
+    (pain_intensity, _PAIN_INTENSITY_ORDINALS[pain_intensity]) for pain_intensity in PainIntensity.get_intensity_order()
+)
+
+
+class PainMatrix:
+    """
+    Seconds in pain of an animal for each pain type and intensity, stored as a flat tuple in the layout
+    of the pain rate table, so that any value is read by index.
+    """
+
+    __slots__ = ("_seconds_in_pain",)
+
+    def __init__(self, seconds_in_pain: Iterable[int]):
+        """
+        Args:
+            seconds_in_pain: Seconds in pain of each pain type and intensity, row by row (pain type by pain type)
+
+        Raises:
+            ValueError: If there isn't one value per pain type and intensity
+        """
+        self._seconds_in_pain = tuple(seconds_in_pain)
+        if len(self._seconds_in_pain) != len(PAIN_MATRIX_TYPES) * len(PAIN_MATRIX_INTENSITIES):
+            raise ValueError(f"A pain matrix needs {len(PAIN_MATRIX_TYPES) * len(PAIN_MATRIX_INTENSITIES)} values")
+
+    @classmethod
+    def from_pain_levels(cls, pain_levels: Iterable[PainLevelData]) -> "PainMatrix":
+        """Build the matrix of some pain levels, the missing ones being 0"""
+        seconds_in_pain = [0] * (len(PAIN_MATRIX_TYPES) * len(PAIN_MATRIX_INTENSITIES))
+        for pain_level in pain_levels:
+            seconds_in_pain[cls._get_index(pain_level.pain_type, pain_level.pain_intensity)] = (
+                pain_level.seconds_in_pain
+            )
+        return cls(seconds_in_pain)
+
+    @staticmethod
+    def _get_index(pain_type: PainType, pain_intensity: PainIntensity) -> int:
+        return _PAIN_TYPE_ORDINALS[pain_type] * len(PAIN_MATRIX_INTENSITIES) + _PAIN_INTENSITY_ORDINALS[pain_intensity]
+
+    def get_seconds_in_pain(self, pain_type: PainType, pain_intensity: PainIntensity) -> int:
+        """Return the seconds in pain of a pain type and intensity"""
+        return self._seconds_in_pain[self._get_index(pain_type, pain_intensity)]
+
+    def get_pain_levels_by_type(self, pain_type: PainType) -> List[PainLevelData]:
+        """Return the pain levels of a pain type, sorted by intensity (from the least to the most severe)"""
+        row_start = _PAIN_TYPE_ORDINALS[pain_type] * len(PAIN_MATRIX_INTENSITIES)
+        return [
+            PainLevelData(pain_intensity, pain_type, self._seconds_in_pain[row_start + column])
+            for pain_intensity, column in _ORDERED_INTENSITY_COLUMNS
+        ]
+
+    @property
+    def pain_levels(self) -> List[PainLevelData]:
+        """All the pain levels, in the layout of the matrix"""
+        return [
+            PainLevelData(pain_intensity, pain_type, self.get_seconds_in_pain(pain_type, pain_intensity))
+            for pain_type in PAIN_MATRIX_TYPES
+            for pain_intensity in PAIN_MATRIX_INTENSITIES
+        ]
+
+    @property
+    def total_seconds_in_pain(self) -> int:
+        """Seconds in pain of all pain types and intensities"""
+        return sum(self._seconds_in_pain)
+
+    def to_dict(self) -> Dict[PainType, Dict[PainIntensity, int]]:
+        """Return the seconds in pain by pain type and intensity"""
+        return {
+            pain_type: {
+                pain_intensity: self.get_seconds_in_pain(pain_type, pain_intensity)
+                for pain_intensity in PAIN_MATRIX_INTENSITIES
+            }
+            for pain_type in PAIN_MATRIX_TYPES
+        }
+
+    def __add__(self, other: "PainMatrix") -> "PainMatrix":
+        return PainMatrix(seconds + other_seconds for seconds, other_seconds in zip(self, other, strict=True))
+
+    def __mul__(self, factor: int) -> "PainMatrix":
+        return PainMatrix(seconds * factor for seconds in self)
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over the seconds in pain, row by row"""
+        return iter(self._seconds_in_pain)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PainMatrix) and self._seconds_in_pain == other._seconds_in_pain
+
+    def __repr__(self) -> str:
+        return f"PainMatrix({list(self._seconds_in_pain)})"
+
+
+@dataclass(slots=True)
+class AnimalPainReport:
     animal_type: AnimalType
-    pain_levels: List[PainLevelData]
+    pain_matrix: PainMatrix
     breeding_type_with_weight: BreedingTypeAndWeight
 
+    @property
+    def pain_levels(self) -> List[PainLevelData]:
+        """All the pain levels of the animal"""
+        return self.pain_matrix.pain_levels
+
     def get_pain_levels_by_type(self, pain_type: PainType) -> List[PainLevelData]:
         """Returns the PainLevelData objects for a specific pain type, sorted by intensity"""
-        pain_levels_by_type = [pain_level for pain_level in self.pain_levels if pain_level.pain_type is pain_type]
+        return self.pain_matrix.get_pain_levels_by_type(pain_type)
 
-        # Sort by intensity order using the class method
-        return sorted(
-            pain_levels_by_type, key=lambda pain: PainIntensity.get_intensity_order().index(pain.pain_intensity)
-        )
 
+@dataclass(slots=True)
+class BreedingTypesComparison:
+    """
+    Time in pain of the animal product of a product, with its breeding type and with every breeding type
+    of the animal, the weight being the same.
+    """
+
+    animal_type: AnimalType
+    breeding_type_with_weight: BreedingTypeAndWeight
+    pain_matrix: PainMatrix
+    pain_matrices_by_breeding_type: Dict[LayingHenBreedingType | BroilerChickenBreedingType, PainMatrix]
+    # Pain matrix of each breeding type minus the one of the product
+    delta_pain_matrices_by_breeding_type: Dict[LayingHenBreedingType | BroilerChickenBreedingType, PainMatrix]
 
-class PainReport(BaseModel):
+
+@dataclass(slots=True)
+class PainReport:
     animals: List[AnimalPainReport]
     product_name: str
     product_image_url: HttpUrl | None = None
@@ -87,3 +206,104 @@ class KnowledgePanelResponse(BaseModel):
 
     panels: Dict[str, Panel]
     product: ProductInfo
+
+
+# Breeding types comparison response models
+class BreedingTypePain(BaseModel):
+    breeding_type: LayingHenBreedingType | BroilerChickenBreedingType
+    seconds_in_pain: Dict[PainType, Dict[PainIntensity, int]]
+    total_seconds_in_pain: int
+    # Differences with the breeding type of the product (negative when the animals suffer less)
+    delta_seconds_in_pain: Dict[PainType, Dict[PainIntensity, int]]
+    delta_total_seconds_in_pain: int
+
+
+class AnimalBreedingTypesComparison(BaseModel):
+    animal_type: AnimalType
+    breeding_type: LayingHenBreedingType | BroilerChickenBreedingType
+    animal_product_weight: float  # in grams
+    seconds_in_pain: Dict[PainType, Dict[PainIntensity, int]]
+    total_seconds_in_pain: int
+    breeding_types: List[BreedingTypePain]
+
+
+class BreedingTypesComparisonResponse(BaseModel):
+    """
+    Response model for the breeding types comparison endpoint: the time in pain of the animal products
+    of the product with each breeding type of their animal.
+    """
+
+    animals: List[AnimalBreedingTypesComparison]
+    product: ProductInfo
+
+
+# Batch knowledge panels models
+MAX_BARCODES_PER_KNOWLEDGE_PANELS_REQUEST = 300
+
+
+class KnowledgePanelsRequest(BaseModel):
+    """
+    Request model for the batch knowledge panels endpoint.
+    """
+
+    barcodes: List[str] = Field(min_length=1, max_length=MAX_BARCODES_PER_KNOWLEDGE_PANELS_REQUEST)
+    locale: str | None = None
+
+
+class KnowledgePanelError(BaseModel):
+    status: int
+    message: str
+
+
+class BarcodeKnowledgePanel(BaseModel):
+    barcode: str
+    knowledge_panel: KnowledgePanelResponse | None = None
+    error: KnowledgePanelError | None = None
+
+
+class KnowledgePanelsResponse(BaseModel):
+    """
+    Response model for the batch knowledge panels endpoint, with the knowledge panel or the error of each barcode.
+    """
+
+    results: List[BarcodeKnowledgePanel]
+
+
+# Basket models
+MAX_ITEMS_PER_BASKET_REQUEST = 300
+
+
+class BasketItem(BaseModel):
+    barcode: str
+    quantity: int = Field(default=1, ge=1)
+
+
+class BasketRequest(BaseModel):
+    """
+    Request model for the basket endpoint: the products of a shopping basket, with their quantities.
+    """
+
+    items: List[BasketItem] = Field(min_length=1, max_length=MAX_ITEMS_PER_BASKET_REQUEST)
+
+
+class AnimalBasketPain(BaseModel):
+    animal_type: AnimalType
+    animal_product_weight: float  # in grams
+    seconds_in_pain: Dict[PainType, Dict[PainIntensity, int]]
+    total_seconds_in_pain: int
+
+
+class BasketPainResponse(BaseModel):
+    """
+    Response model for the basket endpoint: the time in pain of the products resolved before the deadline,
+    by animal, pain type and intensity.
+    """
+
+    animals: List[AnimalBasketPain]
+    seconds_in_pain: Dict[PainType, Dict[PainIntensity, int]]
+    total_seconds_in_pain: int
+    resolved_barcodes: List[str]
+    # Products without pain report (unknown, invalid barcode, no breeding type...)
+    errors: Dict[str, KnowledgePanelError]
+    # Products still being resolved when the deadline was reached, left out of the totals
+    unresolved_barcodes: List[str]
@@ -0,0 +1,48 @@
+"""
+Builds the ancestry index of the Open Food Facts taxonomies, used to detect the breeding types from subcategories
+and the egg ingredients of composite products.
+
+Taxonomies: https://static.openfoodfacts.org/data/taxonomies/categories.json, labels.json and ingredients.json
+
+Usage (from the backend directory):
+    uv run python -m app.scripts.build_off_taxonomy_index categories.json labels.json ingredients.json
+"""
+
+import argparse
+import logging
+import os
+import time
+from pathlib import Path
+
+from app.business.open_food_facts.taxonomy import (
+    DEFAULT_TAXONOMY_INDEX_PATH,
+    TAXONOMY_INDEX_PATH_ENV,
+    TaxonomyIndex,
+    read_taxonomy_json,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the ancestry index of the OFF taxonomies")
+    parser.add_argument("taxonomy_paths", type=Path, nargs="+", help="Paths of the OFF taxonomy JSON exports")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path(os.getenv(TAXONOMY_INDEX_PATH_ENV, DEFAULT_TAXONOMY_INDEX_PATH)),
+        help="Path of the index (default: OFF_TAXONOMY_INDEX_PATH or data/off_taxonomy_index.bin)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(message)s")
+
+    start = time.perf_counter()
+    index = TaxonomyIndex.from_parents(read_taxonomy_json(args.taxonomy_paths))
+    index.save(args.output)
+    print(
+        f"Done: {len(index)} tags indexed in {time.perf_counter() - start:.1f}s, "
+        f"{args.output.stat().st_size / 1024:.0f} KiB written to {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Imports the animal products of an Open Food Facts dump into the local product index.
+
+Dumps: https://world.openfoodfacts.org/data (openfoodfacts-products.jsonl.gz, or food.parquet)
+
+Usage (from the backend directory):
+    uv run python -m app.scripts.import_off_dump openfoodfacts-products.jsonl.gz
+"""
+
+import argparse
+import logging
+from pathlib import Path
+
+from app.business.open_food_facts.off_dump import import_dump
+from app.business.open_food_facts.product_index import get_product_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the animal products of an OFF dump into the product index")
+    parser.add_argument("dump_path", type=Path, help="Path of the dump (.jsonl, .jsonl.gz or .parquet)")
+    parser.add_argument("--batch-size", type=int, default=1_000, help="Number of products written at once")
+    parser.add_argument("--restart", action="store_true", help="Start from the beginning instead of resuming")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(message)s")
+
+    index = get_product_index()
+    print(f"Importing {args.dump_path} into {index.path}...")
+    report = import_dump(args.dump_path, index, batch_size=args.batch_size, resume=not args.restart)
+    print(
+        f"Done: {report.scanned_products} products scanned, {report.imported_products} imported "
+        f"in {report.seconds:.1f}s ({report.products_per_second:.0f} products/s), "
+        f"{index.count()} products in the index"
+    )
+
+
+if __name__ == "__main__":
+    main()
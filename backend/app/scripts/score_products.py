@@ -0,0 +1,57 @@
+"""
+Scores all the products of the local product index (or of an OFF dump), e.g. after a methodology update.
+
+The pain matrices of the animal products are written to a Parquet file (requires pyarrow) or an NDJSON file,
+depending on the extension of the output path.
+
+Usage (from the backend directory):
+    uv run python -m app.scripts.score_products scores.parquet
+    uv run python -m app.scripts.score_products scores.ndjson --dump openfoodfacts-products.jsonl.gz
+"""
+
+import argparse
+import logging
+from pathlib import Path
+
+from app.business.open_food_facts.batch_scoring import DEFAULT_CHUNK_SIZE, open_score_writer, score_products
+from app.business.open_food_facts.off_dump import iter_jsonl_dump, iter_parquet_dump
+from app.business.open_food_facts.product_index import get_product_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the pain matrices of a collection of products")
+    parser.add_argument("output_path", type=Path, help="Path of the scores (.parquet, NDJSON otherwise)")
+    parser.add_argument(
+        "--dump", type=Path, help="OFF dump to score (.jsonl, .jsonl.gz or .parquet) instead of the product index"
+    )
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Number of products scored at once by a worker"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(message)s")
+
+    if args.dump:
+        print(f"Scoring the products of {args.dump}...")
+        iter_dump = iter_parquet_dump if args.dump.suffix == ".parquet" else iter_jsonl_dump
+        products = (product for _, product in iter_dump(args.dump) if product.get("code"))
+    else:
+        index = get_product_index()
+        print(f"Scoring the {index.count()} products of {index.path}...")
+        products = index.iter_products()
+
+    writer = open_score_writer(args.output_path)
+    try:
+        report = score_products(products, writer, workers=args.workers, chunk_size=args.chunk_size)
+    finally:
+        writer.close()
+    print(
+        f"Done: {report.scanned_products} products scanned, {report.scored_products} scored "
+        f"({report.animal_products} animal products) in {report.seconds:.1f}s "
+        f"({report.products_per_second:.0f} products/s), written to {args.output_path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Applies the daily delta exports of Open Food Facts to the local product index.
+
+Run it daily (e.g. with cron) after importing a dump with import_off_dump. The application workers
+invalidate the cached data of the changed products within a minute.
+
+Usage (from the backend directory):
+    uv run python -m app.scripts.sync_off_delta
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.business.open_food_facts.off_delta_sync import sync_product_index
+from app.business.open_food_facts.product_index import get_product_index
+from app.business.open_food_facts.product_store import get_product_store
+from app.config.http_client import http_client_lifespan
+from app.config.rate_limiter import RequestPriority, request_priority
+
+
+async def sync(since: int | None, batch_size: int) -> None:
+    index = get_product_index()
+    print(f"Syncing {index.path} with the OFF delta exports...")
+    try:
+        async with http_client_lifespan():
+            with request_priority(RequestPriority.BACKGROUND):
+                report = await sync_product_index(index, since=since, batch_size=batch_size)
+    finally:
+        index.close()
+        get_product_store().close()
+    print(
+        f"Done: {report.delta_files} delta files applied, {report.scanned_products} products scanned, "
+        f"{report.updated_products} updated, {report.deleted_products} deleted in {report.seconds:.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the OFF delta exports to the product index")
+    parser.add_argument(
+        "--since",
+        type=int,
+        help="Timestamp before which the index is up to date (default: last modification time of the index)",
+    )
+    parser.add_argument("--batch-size", type=int, default=1_000, help="Number of products written at once")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(message)s")
+    asyncio.run(sync(args.since, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,28 @@
-from unittest.mock import AsyncMock, MagicMock, patch
+from typing import Callable
 
+import httpx
 import pytest
 from httpx import AsyncClient
 
+from app.business.open_food_facts.knowledge_panel_cache import get_knowledge_panel_cache
 from app.schemas.open_food_facts.external import ProductData
 
 
 @pytest.mark.asyncio
-async def test_get_off_knowledge_panel(async_client: AsyncClient, sample_product_data: ProductData):
+async def test_get_off_knowledge_panel(
+    async_client: AsyncClient, mock_off_api: Callable, sample_product_data: ProductData
+):
     """Test our knowledge panel endpoint"""
-    mock_response_data = {"product": sample_product_data}
+    mock_response_data = {"product": sample_product_data.model_dump(mode="json")}
+    mock_off_api(lambda request: httpx.Response(200, json=mock_response_data))
 
-    mock_response = AsyncMock()
-    mock_response.json = MagicMock(return_value=mock_response_data)
-    mock_response.raise_for_status = AsyncMock(return_value=None)
-
-    with patch("app.business.open_food_facts.knowledge_panel.httpx.AsyncClient") as mock_http_client:
-        # Get the instance returned by the async context
-        instance = mock_http_client.return_value.__aenter__.return_value
-        instance.get.return_value = mock_response
-        response = await async_client.get("/off/v1/knowledge-panel/1")
+    response = await async_client.get("/off/v1/knowledge-panel/3256229237063")
 
     assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    # The second response comes from the knowledge panel cache
+    assert (await async_client.get("/off/v1/knowledge-panel/3256229237063")).content == response.content
+    assert get_knowledge_panel_cache().stats().hits == 1
     # Test response has the expected structure
     response_data = response.json()
     assert "panels" in response_data
@@ -38,3 +39,141 @@ async def test_get_off_knowledge_panel(async_client: AsyncClient, sample_product
         # Check title element structure
         title_element = panel["title_element"]
         assert "title" in title_element
+
+
+@pytest.mark.asyncio
+async def test_get_off_knowledge_panels(
+    async_client: AsyncClient, mock_off_api: Callable, sample_product_data: ProductData
+):
+    """Test our batch knowledge panels endpoint, with found, unknown, non-animal and invalid products"""
+    product = sample_product_data.model_dump(mode="json")
+    search_index = {
+        "3256229237063": {**product, "code": "3256229237063"},
+        "4006381333931": {**product, "code": "4006381333931", "categories_tags": ["en:vegetables"]},
+    }
+    search_queries = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "search.openfoodfacts.org":
+            query = request.url.params["q"]
+            search_queries.append(query)
+            codes = [term.removeprefix("code:") for term in query.split(" OR ")]
+            return httpx.Response(200, json={"hits": [search_index[code] for code in codes if code in search_index]})
+        return httpx.Response(404, json={"status": "failure"})
+
+    mock_off_api(handler)
+
+    barcodes = ["5449000000996", "3256229237063", "4006381333931", "03256229237063", "123", "3256229237063"]
+    response = await async_client.post("/off/v1/knowledge-panels", json={"barcodes": barcodes, "locale": "fr"})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["barcode"] for result in results] == barcodes[:5]
+    # One combined search of the canonical barcodes, then the unknown barcode is looked up on OFF API v3 only,
+    # its 404 being final
+    assert search_queries == ["code:5449000000996 OR code:3256229237063 OR code:4006381333931"]
+
+    unknown, found, non_animal, found_with_leading_zero, invalid = results
+    assert unknown["error"]["status"] == 404
+    assert unknown["knowledge_panel"] is None
+    assert found["error"] is None
+    assert found["knowledge_panel"]["panels"]["main"]["title_element"]["title"] == "Empreinte Souffrance"
+    assert found_with_leading_zero["knowledge_panel"] == found["knowledge_panel"]
+    assert non_animal["error"]["status"] == 404
+    assert invalid["error"]["status"] == 400
+
+
+@pytest.mark.asyncio
+async def test_get_off_knowledge_panels_too_many_barcodes(async_client: AsyncClient):
+    """Test that the batch knowledge panels endpoint rejects requests with too many barcodes"""
+    response = await async_client.post("/off/v1/knowledge-panels", json={"barcodes": [str(i) for i in range(301)]})
+
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_upstream_status(async_client: AsyncClient):
+    """Test that the state of the protection of each OFF endpoint is exposed"""
+    response = await async_client.get("/off/v1/upstream-status")
+
+    assert response.status_code == 200
+    assert response.json()["off_v3"]["state"] == "closed"
+    assert response.json()["search_a_licious"]["rejected_calls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_get_off_knowledge_panel_rate_limited(async_client: AsyncClient, mock_off_api: Callable):
+    """Test that a rate limited OFF API gives a 503 response with a Retry-After header, not a 404"""
+    mock_off_api(lambda request: httpx.Response(429, headers={"Retry-After": "120"}))
+
+    response = await async_client.get("/off/v1/knowledge-panel/3256229237063")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "120"
+
+
+@pytest.mark.asyncio
+async def test_get_off_knowledge_panel_invalid_barcode(async_client: AsyncClient, mock_off_api: Callable):
+    """Test that an invalid barcode is rejected without calling OFF"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise AssertionError("OFF should not be called")
+
+    mock_off_api(handler)
+
+    response = await async_client.get("/off/v1/knowledge-panel/3256229237064")
+
+    assert response.status_code == 400
+    assert response.json()["error"]["message"] == "Invalid check digit: 3256229237064"
+
+
+@pytest.mark.asyncio
+async def test_get_off_breeding_types_comparison(
+    async_client: AsyncClient, mock_off_api: Callable, sample_product_data: ProductData
+):
+    """Test our breeding types comparison endpoint, for furnished cage eggs"""
+    mock_off_api(lambda request: httpx.Response(200, json={"product": sample_product_data.model_dump(mode="json")}))
+
+    response = await async_client.get("/off/v1/knowledge-panel/3256229237063/compare")
+
+    assert response.status_code == 200
+    response_data = response.json()
+    assert response_data["product"]["name"] == "Fake product name"
+    [animal] = response_data["animals"]
+    assert animal["animal_type"] == "laying_hen"
+    assert animal["breeding_type"] == "furnished_cage"
+    breeding_types = {breeding_type["breeding_type"]: breeding_type for breeding_type in animal["breeding_types"]}
+    assert list(breeding_types) == ["conventional_cage", "furnished_cage", "barn", "free_range"]
+    assert breeding_types["furnished_cage"]["delta_total_seconds_in_pain"] == 0
+    assert breeding_types["furnished_cage"]["total_seconds_in_pain"] == animal["total_seconds_in_pain"]
+    assert breeding_types["free_range"]["delta_total_seconds_in_pain"] == (
+        breeding_types["free_range"]["total_seconds_in_pain"] - animal["total_seconds_in_pain"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_off_basket(async_client: AsyncClient, mock_off_api: Callable, sample_product_data: ProductData):
+    """Test our basket endpoint, with a found product and an unknown one"""
+    product = sample_product_data.model_dump(mode="json")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "3256229237063" in str(request.url):
+            return httpx.Response(200, json={"product": product, "hits": [product]})
+        return httpx.Response(404, json={"status": "failure", "hits": []})
+
+    mock_off_api(handler)
+
+    response = await async_client.post(
+        "/off/v1/basket",
+        json={"items": [{"barcode": "3256229237063", "quantity": 2}, {"barcode": "4006381333931"}]},
+    )
+
+    assert response.status_code == 200
+    response_data = response.json()
+    [animal] = response_data["animals"]
+    assert animal["animal_type"] == "laying_hen"
+    assert animal["animal_product_weight"] == 400
+    assert response_data["total_seconds_in_pain"] == animal["total_seconds_in_pain"] > 0
+    assert response_data["resolved_barcodes"] == ["3256229237063"]
+    assert response_data["errors"]["4006381333931"]["status"] == 404
+    assert response_data["unresolved_barcodes"] == []
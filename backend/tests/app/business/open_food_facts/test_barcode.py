@@ -0,0 +1,33 @@
+import pytest
+
+from app.business.open_food_facts.barcode import canonicalize_barcode
+from app.config.exceptions import InvalidBarcodeException
+
+
+@pytest.mark.parametrize(
+    "barcode, canonical_barcode",
+    [
+        ("3256229237063", "3256229237063"),  # EAN-13
+        ("03256229237063", "3256229237063"),  # GTIN-14
+        ("036000291452", "0036000291452"),  # UPC-A
+        ("0036000291452", "0036000291452"),  # UPC-A as EAN-13
+        ("00036000291452", "0036000291452"),  # UPC-A as GTIN-14
+        ("40170725", "40170725"),  # GTIN-8
+        ("0000040170725", "40170725"),  # GTIN-8 as EAN-13
+        ("10036000291459", "10036000291459"),  # GTIN-14 with a packaging indicator
+        (" 3256229237063\n", "3256229237063"),
+    ],
+)
+def test_canonicalize_barcode(barcode: str, canonical_barcode: str):
+    """Test that the spellings of a GTIN are canonicalized to the OFF product code"""
+    assert canonicalize_barcode(barcode) == canonical_barcode
+
+
+@pytest.mark.parametrize(
+    "barcode",
+    ["3256229237064", "123", "32562292370631", "325622923706a", "３２５６２２９２３７０６３", "", "325622923706300"],
+)
+def test_canonicalize_barcode_rejects_invalid_barcodes(barcode: str):
+    """Test that barcodes with a wrong length, non-digit characters or a wrong check digit are rejected"""
+    with pytest.raises(InvalidBarcodeException):
+        canonicalize_barcode(barcode)
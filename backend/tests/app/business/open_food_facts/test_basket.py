@@ -0,0 +1,63 @@
+import asyncio
+from typing import Callable
+
+import httpx
+import pytest
+
+from app.business.open_food_facts.basket import get_basket_pain
+from app.business.open_food_facts.pain_report_calculator import PainReportCalculator
+from app.enums.open_food_facts.enums import AnimalType
+from app.schemas.open_food_facts.external import ProductData
+from app.schemas.open_food_facts.internal import BasketItem
+
+
+@pytest.mark.asyncio
+async def test_get_basket_pain(mock_off_api: Callable, sample_product_data: ProductData):
+    """Test that the pain reports are multiplied by their quantities and summed, the failures being reported"""
+    product = sample_product_data.model_dump(mode="json")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "3256229237063" in str(request.url):
+            return httpx.Response(200, json={"product": product, "hits": [product]})
+        return httpx.Response(404, json={"status": "failure", "hits": []})
+
+    mock_off_api(handler)
+
+    basket_pain = await get_basket_pain(
+        [
+            BasketItem(barcode="3256229237063", quantity=2),
+            BasketItem(barcode="03256229237063"),
+            BasketItem(barcode="4006381333931"),
+            BasketItem(barcode="123"),
+        ],
+        locale="en",
+    )
+
+    [animal] = PainReportCalculator(sample_product_data).get_pain_report().animals
+    assert basket_pain.resolved_barcodes == ["3256229237063"]
+    assert basket_pain.pain_matrices_by_animal == {AnimalType.LAYING_HEN: animal.pain_matrix * 3}
+    assert basket_pain.animal_product_weights == {AnimalType.LAYING_HEN: 600}
+    assert basket_pain.pain_matrix == animal.pain_matrix * 3
+    assert set(basket_pain.failures) == {"4006381333931", "123"}
+    assert basket_pain.unresolved_barcodes == []
+
+
+@pytest.mark.asyncio
+async def test_get_basket_pain_deadline(mock_off_api: Callable, sample_product_data: ProductData):
+    """Test that the partial totals are returned when the deadline is reached, with the unresolved barcodes"""
+    product = sample_product_data.model_dump(mode="json")
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if "4006381333931" in str(request.url):
+            await asyncio.sleep(10)
+        return httpx.Response(200, json={"product": product, "hits": [product]})
+
+    mock_off_api(handler)
+
+    basket_pain = await get_basket_pain(
+        [BasketItem(barcode="3256229237063"), BasketItem(barcode="4006381333931")], locale="en", deadline=0.2
+    )
+
+    assert basket_pain.resolved_barcodes == ["3256229237063"]
+    assert basket_pain.unresolved_barcodes == ["4006381333931"]
+    assert basket_pain.animal_product_weights == {AnimalType.LAYING_HEN: 200}
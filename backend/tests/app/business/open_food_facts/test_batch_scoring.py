@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from app.business.open_food_facts.batch_scoring import (
+    SECONDS_IN_PAIN_COLUMNS,
+    open_score_writer,
+    score_chunk,
+    score_products,
+)
+from app.business.open_food_facts.pain_report_calculator import PainReportCalculator
+from app.business.open_food_facts.product_index import ProductIndex
+from app.schemas.open_food_facts.external import ProductData
+
+
+def make_products(count: int) -> List[Dict[str, Any]]:
+    """Return products alternating cage eggs, free range eggs without weight, and non-animal products"""
+    products: List[Dict[str, Any]] = []
+    for i in range(count):
+        if i % 3 == 0:
+            products.append(
+                {
+                    "code": f"{i:08d}",
+                    "product_name": "Eggs",
+                    "categories_tags": ["en:cage-chicken-eggs"],
+                    "countries_tags": ["en:france"],
+                    "product_quantity": str(50 + i),
+                    "product_quantity_unit": "g",
+                }
+            )
+        elif i % 3 == 1:
+            products.append({"code": f"{i:08d}", "categories_tags": ["en:free-range-chicken-eggs"]})
+        else:
+            products.append({"code": f"{i:08d}", "categories_tags": ["en:fruits"], "product_quantity": "unknown"})
+    return products
+
+
+def test_score_chunk_matches_pain_report():
+    """Test that the chunk scores are the times in pain of the pain reports"""
+    products = make_products(6)
+
+    scores = score_chunk(products)
+
+    assert scores.scanned_products == 6
+    assert scores.barcodes == ["00000000", "00000003"]
+    assert scores.breeding_types == ["furnished_cage", "furnished_cage"]
+    for barcode, seconds_in_pain in zip(scores.barcodes, scores.seconds_in_pain, strict=True):
+        product = next(product for product in products if product["code"] == barcode)
+        pain_report = PainReportCalculator(ProductData.model_validate(product)).get_pain_report()
+        expected = [pain_level.seconds_in_pain for pain_level in pain_report.animals[0].pain_levels]
+        assert seconds_in_pain.ravel().tolist() == expected
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_score_products_to_ndjson(tmp_path: Path, workers: int):
+    """Test that the scores of all the chunks are streamed in order, in the current process or in a pool"""
+    output_path = tmp_path / "scores.ndjson"
+    writer = open_score_writer(output_path)
+
+    report = score_products(make_products(100), writer, workers=workers, chunk_size=7)
+    writer.close()
+
+    records = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert report.scanned_products == 100
+    assert report.scored_products == report.animal_products == 34
+    assert report.products_per_second > 0
+    assert [record["code"] for record in records] == [f"{i:08d}" for i in range(0, 100, 3)]
+    assert records[0]["animal_type"] == "laying_hen"
+    assert records[0]["animal_product_weight"] == 50
+    assert records[0]["physical_disabling_seconds"] == 550
+
+
+def test_score_index_products_to_parquet(tmp_path: Path):
+    """Test that the products of the index are scored into a Parquet file"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    index = ProductIndex(tmp_path / "index.sqlite3")
+    index.write_batch(make_products(10))
+    output_path = tmp_path / "scores.parquet"
+    writer = open_score_writer(output_path)
+
+    report = score_products(index.iter_products(batch_size=3), writer, workers=1, chunk_size=4)
+    writer.close()
+
+    table = pq.read_table(output_path)
+    assert report.scanned_products == 10
+    assert table.num_rows == 4
+    assert table.column_names == [
+        "code",
+        "animal_type",
+        "breeding_type",
+        "animal_product_weight",
+        *SECONDS_IN_PAIN_COLUMNS,
+    ]
@@ -0,0 +1,48 @@
+from app.business.open_food_facts.breeding_type_index import BreedingTypeIndex, get_breeding_type_index
+from app.enums.open_food_facts.enums import AnimalType, BroilerChickenBreedingType, LayingHenBreedingType
+
+
+def test_match_breeding_types():
+    """Test that each animal type gets the breeding type of its tags, in the order of the rules"""
+    index = BreedingTypeIndex(
+        {
+            AnimalType.LAYING_HEN: {
+                LayingHenBreedingType.FREE_RANGE: ["en:free-range-chicken-eggs", "en:organic-eggs"],
+                LayingHenBreedingType.BARN: ["en:barn-chicken-eggs"],
+            },
+            AnimalType.BROILER_CHICKEN: {BroilerChickenBreedingType.FREE_RANGE: ["en:free-range-chicken"]},
+        }
+    )
+
+    match = index.match(["en:free-range-chicken", "en:free-range-chicken-eggs", "en:organic-eggs", "en:eggs"])
+
+    assert list(match.breeding_types.items()) == [
+        (AnimalType.LAYING_HEN, LayingHenBreedingType.FREE_RANGE),
+        (AnimalType.BROILER_CHICKEN, BroilerChickenBreedingType.FREE_RANGE),
+    ]
+    assert not match.conflicting_animal_types
+
+
+def test_match_conflicting_breeding_types():
+    """Test that an animal type matching several breeding types is a conflict, without affecting the others"""
+    match = get_breeding_type_index().match(["en:barn-chicken-eggs", "en:cage-chicken-eggs"])
+
+    assert match.breeding_types == {}
+    assert match.conflicting_animal_types == {AnimalType.LAYING_HEN}
+    assert get_breeding_type_index().match(None).breeding_types == {}
+
+
+def test_match_with_many_rule_tags():
+    """Test the detection with thousands of rule tags, some of them shared by several breeding types"""
+    index = BreedingTypeIndex(
+        {
+            AnimalType.LAYING_HEN: {
+                LayingHenBreedingType.BARN: [f"en:barn-{i}" for i in range(5000)] + ["en:shared"],
+                LayingHenBreedingType.FREE_RANGE: [f"en:free-range-{i}" for i in range(5000)] + ["en:shared"],
+            }
+        }
+    )
+
+    assert len(index.tags) == 10001
+    assert index.match(["en:barn-4999"]).breeding_types == {AnimalType.LAYING_HEN: LayingHenBreedingType.BARN}
+    assert index.match(["en:shared"]).conflicting_animal_types == {AnimalType.LAYING_HEN}
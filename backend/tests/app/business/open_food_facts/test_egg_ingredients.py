@@ -0,0 +1,82 @@
+from app.business.open_food_facts.egg_ingredients import get_egg_share
+from app.business.open_food_facts.egg_weight_calculator import calculate_egg_weight, calculate_egg_weights
+from app.schemas.open_food_facts.external import ProductData
+
+
+def test_get_egg_share_nested_ingredients():
+    """Test that the egg ingredients are found at any depth, and their estimates summed"""
+    ingredients = [
+        {"id": "en:wheat-flour", "percent_estimate": 50},
+        {
+            "id": "en:filling",
+            "percent_estimate": 40,
+            "ingredients": [
+                {"id": "en:sugar", "percent_estimate": 30},
+                {"id": "en:egg-yolk", "percent_estimate": 10},
+            ],
+        },
+        {"id": "en:whole-egg", "percent_estimate": 10},
+    ]
+    assert get_egg_share(ingredients) == 0.2
+
+
+def test_get_egg_share_does_not_count_egg_sub_ingredients():
+    """Test that the sub-ingredients of an egg ingredient aren't counted twice"""
+    ingredients = [
+        {
+            "id": "en:egg",
+            "percent_estimate": 25,
+            "ingredients": [{"id": "en:egg-white", "percent_estimate": 15}],
+        }
+    ]
+    assert get_egg_share(ingredients) == 0.25
+
+
+def test_get_egg_share_without_egg():
+    """Test that products without egg ingredient estimate have no egg share"""
+    assert get_egg_share(None) is None
+    assert get_egg_share([{"id": "en:water", "percent_estimate": 100}]) is None
+    assert get_egg_share([{"id": "en:egg"}]) is None
+
+
+def test_get_egg_share_deep_tree():
+    """Test that a very deep ingredients tree is walked without recursion"""
+    ingredients: list = [{"id": "en:egg", "percent_estimate": 5}]
+    for _ in range(10_000):
+        ingredients = [{"id": "en:preparation", "percent_estimate": 100, "ingredients": ingredients}]
+    assert get_egg_share(ingredients) == 0.05
+
+
+def test_product_data_prunes_ingredients():
+    """Test that the ingredients tree is kept raw when parsed, and pruned to the fields used when read or saved"""
+    product_data = ProductData(
+        product_name="Mayonnaise",
+        ingredients=[
+            {
+                "id": "en:egg-yolk",
+                "text": "jaune d'oeuf",
+                "percent_estimate": 8,
+                "vegan": "no",
+                "ingredients": [{"id": "en:egg", "rank": 2}],
+            }
+        ],
+    )
+    pruned_ingredients = [{"id": "en:egg-yolk", "percent_estimate": 8, "ingredients": [{"id": "en:egg"}]}]
+    assert product_data.ingredients is not None and product_data.ingredients[0]["text"] == "jaune d'oeuf"
+    assert product_data.get_ingredients() == pruned_ingredients
+    assert ProductData.model_validate_json(product_data.model_dump_json()).ingredients == pruned_ingredients
+
+
+def test_calculate_egg_weight_of_composite_product():
+    """Test that the weight of egg of a composite product is its share of the product weight"""
+    product_data = ProductData(
+        product_name="Mayonnaise",
+        product_quantity=500,
+        product_quantity_unit="g",
+        ingredients=[
+            {"id": "en:rapeseed-oil", "percent_estimate": 80},
+            {"id": "en:egg-yolk", "percent_estimate": 8},
+        ],
+    )
+    assert calculate_egg_weight(product_data) == 40
+    assert calculate_egg_weights([product_data]).tolist() == [40]
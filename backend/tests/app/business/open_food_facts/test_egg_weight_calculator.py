@@ -0,0 +1,69 @@
+import pytest
+
+from app.business.open_food_facts.egg_weight_calculator import (
+    ParsedQuantity,
+    calculate_egg_weight,
+    calculate_egg_weights,
+    parse_egg_tags,
+    parse_quantity,
+)
+from app.schemas.open_food_facts.external import ProductData
+
+
+@pytest.mark.parametrize(
+    "quantity, expected",
+    [
+        ("12 x 53 g", ParsedQuantity(grams=636)),
+        ("6 oeufs", ParsedQuantity(eggs=6)),
+        ("10 Œufs frais", ParsedQuantity(eggs=10)),
+        ("2 × 6 pcs", ParsedQuantity(eggs=12)),
+        ("1,5 kg", ParsedQuantity(grams=1500)),
+        ("600g", ParsedQuantity(grams=600)),
+        ("12 large eggs (720 g)", ParsedQuantity(grams=720)),
+        ("6 pièces", ParsedQuantity(eggs=6)),
+        ("a dozen", ParsedQuantity()),
+        ("", ParsedQuantity()),
+    ],
+)
+def test_parse_quantity(quantity: str, expected: ParsedQuantity):
+    """Test the parsing of the free-text OFF quantities"""
+    assert parse_quantity(quantity) == expected
+
+
+def test_parse_egg_tags():
+    """Test that the pack size and the egg size are read from the tags, with or without language prefix"""
+    assert parse_egg_tags(["en:eggs", "en:large-eggs", "en:packs-of-12"]) == (12, 60)
+    assert parse_egg_tags(["pack-of-6"]) == (6, 0)
+    assert parse_egg_tags([]) == (0, 0)
+
+
+@pytest.mark.parametrize(
+    "product_data, expected_weight",
+    [
+        # product_quantity first, the eggs weighing the weight of their size grade
+        (ProductData(product_name="", product_quantity=6, product_quantity_unit="pcs"), 300),
+        (
+            ProductData(
+                product_name="", product_quantity=6, product_quantity_unit="pcs", categories_tags=["en:large-eggs"]
+            ),
+            360,
+        ),
+        (ProductData(product_name="", product_quantity=0.6, product_quantity_unit="kg", quantity="10 oeufs"), 600),
+        # Unknown unit: the free-text quantity is used
+        (ProductData(product_name="", product_quantity=6, product_quantity_unit="boxes", quantity="6 x 53 g"), 318),
+        (ProductData(product_name="", quantity="2 × 6 pcs", categories_tags=["en:medium-eggs"]), 600),
+        # Then the pack tags
+        (ProductData(product_name="", categories_tags=["en:pack-of-12", "en:gros-oeufs"]), 720),
+        (ProductData(product_name="", categories_tags=["en:pack-of-10"]), 500),
+        (ProductData(product_name="", categories_tags=["en:eggs"], quantity="a dozen"), 0),
+    ],
+)
+def test_calculate_egg_weight(product_data: ProductData, expected_weight: float):
+    """Test that the first source giving a weight is used, and that the batch computation gives the same weights"""
+    assert calculate_egg_weight(product_data) == pytest.approx(expected_weight)
+    assert calculate_egg_weights([product_data, product_data]).tolist() == pytest.approx([expected_weight] * 2)
+
+
+def test_calculate_egg_weights_empty():
+    """Test the batch computation without products"""
+    assert calculate_egg_weights([]).shape == (0,)
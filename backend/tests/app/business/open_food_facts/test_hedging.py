@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+
+from app.business.open_food_facts.hedging import (
+    LATENCY_BUCKETS_IN_SECONDS,
+    HedgedFetcher,
+    LatencyHistogram,
+    is_final_product_error,
+)
+from app.config.exceptions import ExternalServiceException, ProductNotFoundException
+from app.enums.open_food_facts.enums import ProductFailureReason
+
+
+def make_source(name: str, delay: float, calls: list, error: Exception | None = None):
+    async def fetch() -> str:
+        calls.append(name)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            calls.append(f"{name} cancelled")
+            raise
+        if error:
+            raise error
+        return name
+
+    return name, fetch
+
+
+def test_latency_histogram_percentiles():
+    """Test that percentiles are read from the bucket upper bounds"""
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.95) is None
+
+    for _ in range(90):
+        histogram.record(0.01)
+    for _ in range(10):
+        histogram.record(1.0)
+
+    assert 0.01 <= histogram.percentile(0.5) < 0.01 * 1.25
+    assert 1.0 <= histogram.percentile(0.95) < 1.0 * 1.25
+    assert histogram.percentile(1) <= LATENCY_BUCKETS_IN_SECONDS[-1]
+    assert histogram.snapshot().samples == 100
+
+
+def test_latency_histogram_decay():
+    """Test that the counts are halved when the histogram is full"""
+    histogram = LatencyHistogram(max_samples=10)
+    for _ in range(10):
+        histogram.record(0.1)
+    assert histogram.count() == 5
+
+
+def test_hedge_delay_from_histogram():
+    """Test that the hedge delay follows the percentile of the primary source, within bounds"""
+    fetcher: HedgedFetcher[str] = HedgedFetcher(default_delay=1.0, min_delay=0.05, max_delay=3.0, min_samples=10)
+    assert fetcher.get_hedge_delay("primary") == 1.0
+
+    histogram = fetcher.histograms.setdefault("primary", LatencyHistogram())
+    for _ in range(10):
+        histogram.record(0.2)
+    assert 0.2 <= fetcher.get_hedge_delay("primary") < 0.25
+
+    for _ in range(100):
+        histogram.record(30)
+    assert fetcher.get_hedge_delay("primary") == 3.0
+
+
+@pytest.mark.asyncio
+async def test_hedged_fetch_fast_primary():
+    """Test that the secondary source is not called when the primary one answers in time"""
+    calls: list = []
+    fetcher: HedgedFetcher[str] = HedgedFetcher(default_delay=0.5)
+
+    result = await fetcher.fetch(make_source("primary", 0, calls), make_source("secondary", 0, calls))
+
+    assert result == "primary"
+    assert calls == ["primary"]
+    assert fetcher.latencies()["primary"].samples == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_fetch_slow_primary():
+    """Test that the secondary source wins when the primary one is slow, and the primary call is cancelled and timed"""
+    calls: list = []
+    fetcher: HedgedFetcher[str] = HedgedFetcher(default_delay=0.01)
+
+    result = await fetcher.fetch(make_source("primary", 5, calls), make_source("secondary", 0, calls))
+    await asyncio.sleep(0)
+
+    assert result == "secondary"
+    assert calls == ["primary", "secondary", "primary cancelled"]
+    # The cancelled call is recorded with its elapsed time, at least the hedge delay
+    assert fetcher.latencies()["primary"].samples == 1
+    assert fetcher.histograms["primary"].percentile(1) >= 0.01
+
+
+@pytest.mark.asyncio
+async def test_hedged_fetch_failures():
+    """Test that the secondary source is used when the primary one fails, and the primary error raised if both fail"""
+    calls: list = []
+    fetcher: HedgedFetcher[str] = HedgedFetcher(default_delay=0.5)
+
+    result = await fetcher.fetch(
+        make_source("primary", 0, calls, ValueError("primary")), make_source("secondary", 0, calls)
+    )
+    assert result == "secondary"
+
+    with pytest.raises(ValueError, match="primary"):
+        await fetcher.fetch(
+            make_source("primary", 0, calls, ValueError("primary")),
+            make_source("secondary", 0, calls, ValueError("secondary")),
+        )
+
+
+@pytest.mark.asyncio
+async def test_hedged_fetch_primary_error_wins_when_secondary_fails_first():
+    """Test that a "not found" of the secondary source doesn't hide a later server error of the primary source"""
+    calls: list = []
+    fetcher: HedgedFetcher[str] = HedgedFetcher(default_delay=0.01)
+
+    with pytest.raises(ExternalServiceException):
+        await fetcher.fetch(
+            make_source("primary", 0.1, calls, ExternalServiceException("OFF API v3 error")),
+            make_source(
+                "secondary",
+                0,
+                calls,
+                ProductNotFoundException("Not found", ProductFailureReason.UPSTREAM_NOT_FOUND),
+            ),
+        )
+    assert calls == ["primary", "secondary"]
+
+
+@pytest.mark.asyncio
+async def test_hedged_fetch_final_error():
+    """Test that an unknown product is not looked up in the secondary source, even after the hedge delay"""
+    calls: list = []
+    fetcher: HedgedFetcher[str] = HedgedFetcher(default_delay=0.01, is_final_error=is_final_product_error)
+    not_found = ProductNotFoundException("Not found", ProductFailureReason.UPSTREAM_NOT_FOUND)
+
+    with pytest.raises(ProductNotFoundException):
+        await fetcher.fetch(make_source("primary", 0, calls, not_found), make_source("secondary", 0, calls))
+    assert calls == ["primary"]
+
+    calls.clear()
+    with pytest.raises(ProductNotFoundException):
+        await fetcher.fetch(make_source("primary", 0.05, calls, not_found), make_source("secondary", 1, calls))
+    await asyncio.sleep(0)
+    assert calls == ["primary", "secondary", "secondary cancelled"]
+
+    # A failure of the source is not final
+    calls.clear()
+    result = await fetcher.fetch(
+        make_source("primary", 0, calls, ProductNotFoundException("OFF API error")), make_source("secondary", 0, calls)
+    )
+    assert result == "secondary"
+
+
+@pytest.mark.asyncio
+async def test_hedged_fetch_disabled():
+    """Test that only the primary source is called when hedging is disabled"""
+    calls: list = []
+    fetcher: HedgedFetcher[str] = HedgedFetcher(enabled=False, default_delay=0.01)
+
+    with pytest.raises(ValueError):
+        await fetcher.fetch(make_source("primary", 0.05, calls, ValueError()), make_source("secondary", 0, calls))
+    assert calls == ["primary"]
@@ -1,5 +1,4 @@
 from typing import Callable
-from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
 import pytest
@@ -9,6 +8,8 @@ from app.business.open_food_facts.knowledge_panel import (
     get_data_from_off_search_a_licious,
     get_data_from_off_v3,
     get_knowledge_panel_response,
+    get_pain_report,
+    get_panel_artifacts,
 )
 from app.business.open_food_facts.pain_report_calculator import PainReportCalculator
 from app.config.exceptions import ResourceNotFoundException
@@ -18,11 +19,13 @@ from app.schemas.open_food_facts.external import ProductData
 from app.schemas.open_food_facts.internal import (
     BreedingTypeAndWeight,
     KnowledgePanelResponse,
+    PainLevelData,
+    PainMatrix,
 )
 
 
 @pytest.mark.asyncio
-async def test_get_data_from_off_search_a_licious_success():
+async def test_get_data_from_off_search_a_licious_success(mock_off_api: Callable):
     """Test when the OFF API returns valid data"""
     barcode = "123456789"
     mock_response_data = {
@@ -35,75 +38,121 @@ async def test_get_data_from_off_search_a_licious_success():
             }
         ]
     }
+    mock_off_api(lambda request: httpx.Response(200, json=mock_response_data))
 
-    mock_response = AsyncMock()
-    mock_response.json = MagicMock(return_value=mock_response_data)
-    mock_response.raise_for_status = AsyncMock(return_value=None)
-
-    with patch("httpx.AsyncClient.get", return_value=mock_response):
-        result = await get_data_from_off_search_a_licious(barcode, locale="en")
+    result = await get_data_from_off_search_a_licious(barcode)
 
     assert result == ProductData.model_validate(mock_response_data["hits"][0])
 
 
 @pytest.mark.asyncio
-async def test_get_data_from_off_v3_success(sample_product_data: ProductData):
+async def test_get_data_from_off_v3_success(mock_off_api: Callable, sample_product_data: ProductData):
     """Test when the OFF API returns valid data"""
     barcode = "123456789"
-    mock_response_data = {"product": sample_product_data}
+    mock_response_data = {"product": sample_product_data.model_dump(mode="json")}
+    requested_urls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested_urls.append(request.url)
+        return httpx.Response(200, json=mock_response_data)
 
-    mock_response = AsyncMock()
-    mock_response.json = MagicMock(return_value=mock_response_data)
-    mock_response.raise_for_status = AsyncMock(return_value=None)
+    mock_off_api(handler)
 
-    with patch("httpx.AsyncClient.get", return_value=mock_response):
-        result = await get_data_from_off_v3(barcode, locale="en")
+    result = await get_data_from_off_v3(barcode)
 
     assert result == sample_product_data
+    assert len(requested_urls) == 1
+    assert requested_urls[0].path == f"/api/v3/product/{barcode}.json"
+    requested_fields = requested_urls[0].params["fields"].split(",")
+    assert "categories_tags" in requested_fields
+    assert "product_name_en" in requested_fields
+    assert "ingredients" in requested_fields
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("get_data_from_off_function", [get_data_from_off_search_a_licious, get_data_from_off_v3])
+async def test_get_data_from_off_localized_product_name(mock_off_api: Callable, get_data_from_off_function: Callable):
+    """Test that the names in the supported locales are kept, and selected at render time"""
+    product = {
+        "product_name": "Oeufs",
+        "product_name_fr": "Oeufs",
+        "product_name_en": "Eggs",
+        "product_name_de": "Eier",
+        "categories_tags": ["en:eggs"],
+    }
+    mock_off_api(lambda request: httpx.Response(200, json={"product": product, "hits": [product]}))
+
+    result = await get_data_from_off_function("123456789")
+
+    assert result.product_names == {"en": "Eggs"}
+    assert result.model_extra == {}
+    assert result.get_product_name("en") == "Eggs"
+    assert result.get_product_name("fr") == "Oeufs"
+    assert result.get_product_name() == "Oeufs"
 
 
 @pytest.mark.asyncio
-async def test_get_data_from_off_search_a_licious_no_hits():
+async def test_get_pain_report_locales_share_product_data(mock_off_api: Callable):
+    """Test that the product data is fetched once for all the locales, and the name selected for each of them"""
+    requests = []
+    product = {
+        "product_name": "Oeufs",
+        "product_name_en": "Eggs",
+        "categories_tags": ["en:cage-chicken-eggs"],
+        "product_quantity": 600,
+        "product_quantity_unit": "g",
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"product": product, "hits": [product]})
+
+    mock_off_api(handler)
+
+    english_report = await get_pain_report("3256229237063", "en")
+    french_report = await get_pain_report("3256229237063", "fr")
+
+    assert english_report.product_name == "Eggs"
+    assert french_report.product_name == "Oeufs"
+    assert len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_data_from_off_search_a_licious_no_hits(mock_off_api: Callable):
     """Test when the OFF API returns no hits"""
     barcode = "000000000"
-    mock_response_data = {"hits": []}
-
-    mock_response = AsyncMock()
-    mock_response.json = MagicMock(return_value=mock_response_data)
-    mock_response.raise_for_status = AsyncMock(return_value=None)
+    mock_off_api(lambda request: httpx.Response(200, json={"hits": []}))
 
-    with patch("httpx.AsyncClient.get", return_value=mock_response):
-        with pytest.raises(ResourceNotFoundException, match=f"No hits returned by OFF API: {barcode}"):
-            await get_data_from_off_search_a_licious(barcode, locale="en")
+    with pytest.raises(ResourceNotFoundException, match=f"No hits returned by OFF API: {barcode}"):
+        await get_data_from_off_search_a_licious(barcode)
 
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize("get_data_from_off_function", [get_data_from_off_search_a_licious, get_data_from_off_v3])
-async def test_get_data_from_off_validation_error(get_data_from_off_function: Callable):
+async def test_get_data_from_off_validation_error(mock_off_api: Callable, get_data_from_off_function: Callable):
     """Test when the OFF API returns invalid data"""
     barcode = "999999999"
-    mock_response_data = {"product": "invalid_value"}
+    mock_off_api(lambda request: httpx.Response(200, json={"product": "invalid_value"}))
 
-    mock_response = AsyncMock()
-    mock_response.json = MagicMock(return_value=mock_response_data)
-    mock_response.raise_for_status = AsyncMock(return_value=None)
-
-    with patch("httpx.AsyncClient.get", return_value=mock_response):
-        with pytest.raises(
-            ResourceNotFoundException, match=f"Failed to validate product data retrieved from OFF: {barcode}"
-        ):
-            await get_data_from_off_function(barcode, locale="en")
+    with pytest.raises(
+        ResourceNotFoundException, match=f"Failed to validate product data retrieved from OFF: {barcode}"
+    ):
+        await get_data_from_off_function(barcode)
 
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize("get_data_from_off_function", [get_data_from_off_search_a_licious, get_data_from_off_v3])
-async def test_get_data_from_off_http_call_exception(get_data_from_off_function: Callable):
+async def test_get_data_from_off_http_call_exception(mock_off_api: Callable, get_data_from_off_function: Callable):
     """Test when the OFF API returns an HTTP error"""
     barcode = "111111111"
 
-    with patch("httpx.AsyncClient.__aenter__", side_effect=httpx.ReadTimeout("Network error")):
-        with pytest.raises(ResourceNotFoundException, match=f"Can't get product data from OFF API: {barcode}"):
-            await get_data_from_off_function(barcode, locale="en")
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ReadTimeout("Network error", request=request)
+
+    mock_off_api(handler)
+
+    with pytest.raises(ResourceNotFoundException, match=f"Can't get product data from OFF API: {barcode}"):
+        await get_data_from_off_function(barcode)
 
 
 @pytest.mark.parametrize(
@@ -139,17 +188,16 @@ def test_get_breeding_types(sample_product_data: ProductData):
     assert result[AnimalType.LAYING_HEN].breeding_type == LayingHenBreedingType.FURNISHED_CAGE
 
 
-def test_generate_pain_levels_for_type(sample_product_data: ProductData):
-    """Test generating pain levels for a specific animal, breeding type, and pain type"""
+def test_pain_levels_by_type(sample_product_data: ProductData):
+    """Test getting the pain levels of a pain type from the pain matrix of an animal and breeding type"""
 
     calculator = PainReportCalculator(sample_product_data)
 
     breeding_type = BreedingTypeAndWeight(breeding_type=LayingHenBreedingType.FURNISHED_CAGE, animal_product_weight=200)
+    pain_matrix = calculator._build_pain_matrix(AnimalType.LAYING_HEN, breeding_type)
 
-    # Test generating physical pain levels
-    physical_pain_levels = calculator._generate_pain_levels_for_type(
-        AnimalType.LAYING_HEN, breeding_type, PainType.PHYSICAL
-    )
+    # Test getting the physical pain levels
+    physical_pain_levels = pain_matrix.get_pain_levels_by_type(PainType.PHYSICAL)
 
     assert len(physical_pain_levels) == 4  # One for each intensity
     for level in physical_pain_levels:
@@ -157,10 +205,8 @@ def test_generate_pain_levels_for_type(sample_product_data: ProductData):
         assert isinstance(level.pain_intensity, PainIntensity)
         assert isinstance(level.seconds_in_pain, int)
 
-    # Test generating psychological pain levels
-    psychological_pain_levels = calculator._generate_pain_levels_for_type(
-        AnimalType.LAYING_HEN, breeding_type, PainType.PSYCHOLOGICAL
-    )
+    # Test getting the psychological pain levels
+    psychological_pain_levels = pain_matrix.get_pain_levels_by_type(PainType.PSYCHOLOGICAL)
 
     assert len(psychological_pain_levels) == 4  # One for each intensity
     for level in psychological_pain_levels:
@@ -169,6 +215,51 @@ def test_generate_pain_levels_for_type(sample_product_data: ProductData):
         assert isinstance(level.seconds_in_pain, int)
 
 
+def test_compare_breeding_types(sample_product_data: ProductData):
+    """Test that the comparison gives the pain of each breeding type with the weight of the product"""
+    calculator = PainReportCalculator(sample_product_data)
+
+    [comparison] = calculator.compare_breeding_types()
+
+    assert comparison.animal_type == AnimalType.LAYING_HEN
+    assert comparison.breeding_type_with_weight.breeding_type == LayingHenBreedingType.FURNISHED_CAGE
+    assert comparison.pain_matrix == PainMatrix.from_pain_levels(calculator.get_pain_report().animals[0].pain_levels)
+    for breeding_type, pain_matrix in comparison.pain_matrices_by_breeding_type.items():
+        same_weight = BreedingTypeAndWeight(breeding_type=breeding_type, animal_product_weight=200)
+        assert pain_matrix == calculator._build_pain_matrix(AnimalType.LAYING_HEN, same_weight)
+        delta_pain_matrix = comparison.delta_pain_matrices_by_breeding_type[breeding_type]
+        assert delta_pain_matrix.total_seconds_in_pain == (
+            pain_matrix.total_seconds_in_pain - comparison.pain_matrix.total_seconds_in_pain
+        )
+    assert comparison.delta_pain_matrices_by_breeding_type[LayingHenBreedingType.FURNISHED_CAGE].pain_levels == [
+        PainLevelData(pain_intensity=level.pain_intensity, pain_type=level.pain_type, seconds_in_pain=0)
+        for level in comparison.pain_matrix.pain_levels
+    ]
+
+
+def test_pain_matrix():
+    """Test the access to the pain levels of a pain matrix by pain type and intensity"""
+    pain_matrix = PainMatrix.from_pain_levels(
+        [
+            PainLevelData(pain_intensity=PainIntensity.EXCRUCIATING, pain_type=PainType.PHYSICAL, seconds_in_pain=10),
+            PainLevelData(pain_intensity=PainIntensity.ANNOYING, pain_type=PainType.PSYCHOLOGICAL, seconds_in_pain=20),
+        ]
+    )
+
+    assert pain_matrix.get_seconds_in_pain(PainType.PHYSICAL, PainIntensity.EXCRUCIATING) == 10
+    assert pain_matrix.get_seconds_in_pain(PainType.PSYCHOLOGICAL, PainIntensity.ANNOYING) == 20
+    assert pain_matrix.get_seconds_in_pain(PainType.PHYSICAL, PainIntensity.ANNOYING) == 0
+    assert len(pain_matrix.pain_levels) == 8
+    assert PainMatrix.from_pain_levels(pain_matrix.pain_levels) == pain_matrix
+
+    physical_pain_levels = pain_matrix.get_pain_levels_by_type(PainType.PHYSICAL)
+    assert [level.pain_intensity for level in physical_pain_levels] == PainIntensity.get_intensity_order()
+    assert [level.seconds_in_pain for level in physical_pain_levels] == [0, 0, 0, 10]
+
+    with pytest.raises(ValueError):
+        PainMatrix([1, 2, 3])
+
+
 def test_knowledge_panel_generator(pain_report):
     """Test the KnowledgePanelGenerator class"""
     translator = I18N().get_translator(locale="en")
@@ -226,3 +317,20 @@ def test_get_knowledge_panel_response(pain_report):
     for panel in response.panels.values():
         assert hasattr(panel, "elements")
         assert hasattr(panel, "title_element")
+
+
+def test_panel_artifacts_are_shared_by_locale(pain_report):
+    """Test that the static parts of the panels are built once per locale, and translated"""
+    i18n = I18N()
+    english_response = get_knowledge_panel_response(pain_report, i18n.get_translator(locale="en"), locale="en")
+    other_english_response = get_knowledge_panel_response(pain_report, i18n.get_translator(locale="en"), locale="en")
+    french_response = get_knowledge_panel_response(pain_report, i18n.get_translator(locale="fr"), locale="fr")
+
+    assert get_panel_artifacts("en") is get_panel_artifacts("en")
+    assert (
+        english_response.panels["intensities_definitions"] is other_english_response.panels["intensities_definitions"]
+    )
+    assert english_response.panels["intensities_definitions"] != french_response.panels["intensities_definitions"]
+    # The responses built with and without the prebuilt artifacts are the same
+    assert english_response == get_knowledge_panel_response(pain_report, i18n.get_translator(locale="en"))
+    assert get_panel_artifacts("fr").animal_names[AnimalType.LAYING_HEN] != "Laying hen"
@@ -0,0 +1,51 @@
+import dataclasses
+
+from app.business.open_food_facts.knowledge_panel import get_knowledge_panel_response
+from app.business.open_food_facts.knowledge_panel_cache import KnowledgePanelCache, get_pain_report_fingerprint
+from app.config.i18n import I18N
+from app.schemas.open_food_facts.internal import KnowledgePanelResponse, PainReport
+
+
+def test_knowledge_panel_cache_hit(pain_report: PainReport):
+    """Test that a rendered response is reused for the same pain report and locale"""
+    translator = I18N().get_translator(locale="en")
+    cache = KnowledgePanelCache()
+
+    response_bytes = cache.get_response_bytes(pain_report, "en", translator)
+    same_pain_report = dataclasses.replace(pain_report, animals=list(pain_report.animals))
+
+    assert cache.get_response_bytes(same_pain_report, "en", translator) is response_bytes
+    assert KnowledgePanelResponse.model_validate_json(response_bytes) == get_knowledge_panel_response(
+        pain_report, translator
+    )
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+
+
+def test_knowledge_panel_cache_keys(pain_report: PainReport):
+    """Test that the locale and the content of the pain report are part of the key"""
+    cache = KnowledgePanelCache()
+    i18n = I18N()
+    renamed_pain_report = dataclasses.replace(pain_report, product_name="Other name")
+
+    english_bytes = cache.get_response_bytes(pain_report, "en", i18n.get_translator(locale="en"))
+    french_bytes = cache.get_response_bytes(pain_report, "fr", i18n.get_translator(locale="fr"))
+    renamed_bytes = cache.get_response_bytes(renamed_pain_report, "en", i18n.get_translator(locale="en"))
+
+    assert english_bytes != french_bytes
+    assert b"Other name" in renamed_bytes
+    assert get_pain_report_fingerprint(pain_report) != get_pain_report_fingerprint(renamed_pain_report)
+    assert cache.stats().misses == 3
+
+
+def test_knowledge_panel_cache_eviction(pain_report: PainReport):
+    """Test that the least recently used responses are evicted"""
+    translator = I18N().get_translator(locale="en")
+    cache = KnowledgePanelCache(max_entries=2)
+
+    for name in ["a", "b", "c"]:
+        cache.get_response_bytes(dataclasses.replace(pain_report, product_name=name), "en", translator)
+
+    stats = cache.stats()
+    assert (stats.entries, stats.evictions) == (2, 1)
+    assert stats.size_in_bytes > 0
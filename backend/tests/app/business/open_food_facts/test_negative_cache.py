@@ -0,0 +1,127 @@
+from typing import Callable, List
+
+import httpx
+import pytest
+
+from app.business.open_food_facts.knowledge_panel import get_pain_report, get_pain_reports
+from app.business.open_food_facts.negative_cache import NegativeCache, get_negative_cache
+from app.business.open_food_facts.product_invalidation import invalidate_products
+from app.config.exceptions import ProductNotFoundException
+from app.enums.open_food_facts.enums import ProductFailureReason
+from tests.conftest import FakeClock
+
+
+def test_negative_cache_ttl_by_reason(fake_clock: FakeClock):
+    """Test that each failure reason expires after its own TTL, and that failures without reason are not cached"""
+    cache = NegativeCache(
+        ttl_by_reason={ProductFailureReason.UPSTREAM_NOT_FOUND: 10, ProductFailureReason.NO_BREEDING_TYPE: 100},
+        clock=fake_clock,
+    )
+    cache.set("1", ProductNotFoundException("Not found", ProductFailureReason.UPSTREAM_NOT_FOUND))
+    cache.set("2", ProductNotFoundException("No breeding type", ProductFailureReason.NO_BREEDING_TYPE))
+    cache.set("3", ProductNotFoundException("Network error"))
+    cache.set("4", ProductNotFoundException("Invalid", ProductFailureReason.VALIDATION_FAILURE))
+
+    failure = cache.get("1")
+    assert failure is not None
+    assert failure.message == "Not found"
+    assert failure.reason == ProductFailureReason.UPSTREAM_NOT_FOUND
+    assert cache.get("3") is None
+    assert cache.get("4") is None
+
+    fake_clock.now += 10
+    assert cache.get("1") is None
+    assert cache.get("2") is not None
+    assert cache.stats().expirations == 1
+
+
+def test_negative_cache_evicts_least_recently_used():
+    """Test that the least recently used barcode is evicted when the cache is full"""
+    cache = NegativeCache(max_entries=2)
+    for barcode in ("1", "2", "3"):
+        cache.set(barcode, ProductNotFoundException("Not found", ProductFailureReason.UPSTREAM_NOT_FOUND))
+
+    assert cache.get("1") is None
+    assert cache.get("3") is not None
+    assert cache.stats().evictions == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "product, reason",
+    [
+        (None, ProductFailureReason.UPSTREAM_NOT_FOUND),
+        ({"product_name": "Apples", "categories_tags": ["en:fruits"]}, ProductFailureReason.NO_BREEDING_TYPE),
+        ({"product_name": "Eggs", "categories_tags": ["en:cage-chicken-eggs"]}, ProductFailureReason.ZERO_WEIGHT),
+    ],
+)
+async def test_get_pain_report_caches_failures(
+    mock_off_api: Callable, product: dict | None, reason: ProductFailureReason
+):
+    """Test that a failing barcode is answered from the negative cache, without calling OFF again"""
+    requests: List[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if product is None:
+            return httpx.Response(404, json={"status": "failure"})
+        if request.url.host == "search.openfoodfacts.org":
+            return httpx.Response(200, json={"hits": [product]})
+        return httpx.Response(200, json={"product": product})
+
+    mock_off_api(handler)
+
+    with pytest.raises(ProductNotFoundException) as first_error:
+        await get_pain_report("3256229237063", "en")
+    request_count = len(requests)
+
+    with pytest.raises(ProductNotFoundException) as second_error:
+        await get_pain_report("3256229237063", "en")
+
+    assert first_error.value.reason == reason
+    assert second_error.value.reason == reason
+    assert second_error.value.message == first_error.value.message
+    assert len(requests) == request_count
+
+    # A change of the product upstream removes its cached failure
+    invalidate_products(["3256229237063"])
+    assert get_negative_cache().get("3256229237063") is None
+
+
+@pytest.mark.asyncio
+async def test_get_pain_report_does_not_cache_network_errors(mock_off_api: Callable):
+    """Test that transient failures of OFF are not cached"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("Network error", request=request)
+
+    mock_off_api(handler)
+
+    with pytest.raises(ProductNotFoundException):
+        await get_pain_report("3256229237063", "en")
+
+    assert get_negative_cache().get("3256229237063") is None
+
+
+@pytest.mark.asyncio
+async def test_get_pain_reports_uses_negative_cache(mock_off_api: Callable):
+    """Test that the batch lookup skips the cached failures and caches the new ones"""
+    searched_queries: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        searched_queries.append(request.url.params.get("q", ""))
+        return httpx.Response(200, json={"hits": [{"code": "4006381333931", "product_name": "Apples"}]})
+
+    mock_off_api(handler)
+    get_negative_cache().set(
+        "3256229237063", ProductNotFoundException("Not found", ProductFailureReason.UPSTREAM_NOT_FOUND)
+    )
+
+    pain_reports = await get_pain_reports(["3256229237063", "4006381333931"], "en")
+
+    assert searched_queries == ["code:4006381333931"]
+    assert isinstance(pain_reports["3256229237063"], ProductNotFoundException)
+    assert list(pain_reports) == ["3256229237063", "4006381333931"]
+    failure = get_negative_cache().get("4006381333931")
+    assert failure is not None
+    assert failure.reason == ProductFailureReason.NO_BREEDING_TYPE
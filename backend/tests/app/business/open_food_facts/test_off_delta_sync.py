@@ -0,0 +1,182 @@
+import gzip
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import httpx
+import pytest
+
+from app.business.open_food_facts.off_delta_sync import SyncReport, apply_delta_file, sync_product_index
+from app.business.open_food_facts.product_cache import get_product_cache
+from app.business.open_food_facts.product_index import ProductIndex, get_product_index
+from app.business.open_food_facts.product_invalidation import apply_product_index_changes
+from app.business.open_food_facts.product_store import get_product_store
+from app.schemas.open_food_facts.external import ProductData
+
+EGGS = {
+    "code": "00000017",
+    "product_name": "Eggs",
+    "categories_tags": ["en:cage-chicken-eggs"],
+    "product_quantity": "300",
+    "last_modified_t": 1700000000,
+}
+FREE_RANGE_EGGS = {
+    "code": "00000024",
+    "product_name": "Free range eggs",
+    "categories_tags": ["en:free-range-chicken-eggs"],
+}
+BARN_EGGS = {"code": "00000031", "product_name": "Barn eggs", "categories_tags": ["en:barn-chicken-eggs"]}
+
+
+def write_delta_file(path: Path, products: List[Dict[str, Any]]) -> Path:
+    with gzip.open(path, "wt", encoding="utf-8") as delta_file:
+        for product in products:
+            delta_file.write(json.dumps(product) + "\n")
+    return path
+
+
+def make_index(tmp_path: Path) -> ProductIndex:
+    index = ProductIndex(tmp_path / "index.sqlite3")
+    index.write_batch([EGGS, FREE_RANGE_EGGS, BARN_EGGS])
+    return index
+
+
+def test_apply_delta_file_writes_only_changed_products(tmp_path: Path):
+    """Test that only the products whose indexed fields changed are written and logged as changed"""
+    index = make_index(tmp_path)
+    delta_products: List[Dict[str, Any]] = [
+        # Only the modification time and a field that is not indexed changed
+        {**EGGS, "last_modified_t": 1700100000, "ingredients_text": "Eggs"},
+        # The weight changed
+        {**FREE_RANGE_EGGS, "product_quantity": "600"},
+        # No longer an animal product
+        {**BARN_EGGS, "categories_tags": ["en:snacks"]},
+        # New animal product, and new product that is not an animal product
+        {"code": "00000048", "product_name": "Organic eggs", "categories_tags": ["en:organic-eggs"]},
+        {"code": "00000055", "product_name": "Apples", "categories_tags": ["en:fruits"]},
+    ]
+    path = write_delta_file(tmp_path / "delta.json.gz", delta_products)
+    report = SyncReport()
+
+    apply_delta_file(path, index, "delta.json.gz", report, batch_size=2)
+
+    assert report.scanned_products == 5
+    assert report.updated_products == 2
+    assert report.deleted_products == 1
+    assert index.get_products(["00000017", "00000024", "00000031", "00000048", "00000055"]).keys() == {
+        "00000017",
+        "00000024",
+        "00000048",
+    }
+    assert index.get_products(["00000017"])["00000017"]["last_modified_t"] == 1700000000
+    assert index.get_products(["00000024"])["00000024"]["product_quantity"] == "600"
+    assert sorted(index.get_changes_since(0)[1]) == ["00000024", "00000031", "00000048"]
+
+
+def test_apply_delta_file_invalidates_changed_products(tmp_path: Path):
+    """Test that the cached data of the changed products is removed, and only theirs"""
+    index = make_index(tmp_path)
+    for barcode in ("00000017", "00000024"):
+        product_data = ProductData(product_name=f"Product {barcode}")
+        get_product_store().set(barcode, product_data)
+        get_product_cache().set(barcode, product_data)
+    path = write_delta_file(tmp_path / "delta.json.gz", [EGGS, {**FREE_RANGE_EGGS, "product_quantity": "600"}])
+
+    apply_delta_file(path, index, "delta.json.gz", SyncReport())
+
+    assert get_product_store().get("00000017") is not None
+    assert get_product_cache().get("00000017") is not None
+    assert get_product_store().get("00000024") is None
+    assert get_product_cache().get("00000024") is None
+
+
+def test_apply_delta_file_invalidates_unindexed_products(tmp_path: Path):
+    """Test that the stored data of a product that is not indexed is removed when it is no longer an animal product"""
+    index = make_index(tmp_path)
+    get_product_store().set("00000048", ProductData(product_name="Organic eggs"))
+    path = write_delta_file(
+        tmp_path / "delta.json.gz",
+        [{"code": "00000048", "product_name": "Organic apples", "categories_tags": ["en:fruits"]}],
+    )
+    report = SyncReport()
+
+    apply_delta_file(path, index, "delta.json.gz", report)
+
+    assert get_product_store().get("00000048") is None
+    assert report.deleted_products == 0
+    assert index.get_changes_since(0)[1] == []
+
+
+def test_apply_delta_file_canonicalizes_barcodes(tmp_path: Path):
+    """Test that the products are indexed and invalidated by canonical barcode, and the invalid codes skipped"""
+    index = make_index(tmp_path)
+    get_product_store().set("0036000291452", ProductData(product_name="Eggs"))
+    delta_products: List[Dict[str, Any]] = [
+        {**EGGS, "code": "36000291452"},
+        {**FREE_RANGE_EGGS, "code": "124"},
+    ]
+    path = write_delta_file(tmp_path / "delta.json.gz", delta_products)
+
+    apply_delta_file(path, index, "delta.json.gz", SyncReport())
+
+    assert index.get_products(["0036000291452"]).keys() == {"0036000291452"}
+    assert get_product_store().get("0036000291452") is None
+    assert index.count() == 4
+
+
+def test_apply_product_index_changes_invalidates_in_memory_cache(tmp_path: Path):
+    """Test that a worker invalidates the products logged as changed after its last poll"""
+    index = make_index(tmp_path)
+    index.write_batch([{**EGGS, "product_quantity": "600"}], track_changes=True)
+    last_seq = index.get_last_change_seq()
+    index.write_batch([{**FREE_RANGE_EGGS, "product_quantity": "600"}], track_changes=True)
+    for barcode in ("00000017", "00000024"):
+        get_product_cache().set(barcode, ProductData(product_name=f"Product {barcode}"))
+
+    seq = apply_product_index_changes(index, last_seq)
+
+    assert seq == index.get_last_change_seq()
+    assert get_product_cache().get("00000017") is not None
+    assert get_product_cache().get("00000024") is None
+    assert apply_product_index_changes(index, seq) == seq
+
+
+@pytest.mark.asyncio
+async def test_sync_product_index(mock_off_api: Callable[[Callable[[httpx.Request], httpx.Response]], None]):
+    """Test that the delta files not applied yet and newer than the index are downloaded and applied once"""
+    index = get_product_index()
+    index.write_batch([EGGS])
+    delta_files = {
+        "openfoodfacts_products_1699900000_1699990000.json.gz": [
+            {**EGGS, "product_quantity": "100", "last_modified_t": 1699950000}
+        ],
+        "openfoodfacts_products_1699990000_1700200000.json.gz": [
+            {**EGGS, "product_quantity": "600", "last_modified_t": 1700100000}
+        ],
+    }
+    downloads = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        name = request.url.path.rsplit("/", 1)[-1]
+        if name == "index.txt":
+            return httpx.Response(200, text="\n".join(["README.txt", *delta_files]))
+        downloads.append(name)
+        content = gzip.compress("".join(json.dumps(product) + "\n" for product in delta_files[name]).encode())
+        return httpx.Response(200, content=content)
+
+    mock_off_api(handler)
+
+    report = await sync_product_index(index)
+
+    assert downloads == ["openfoodfacts_products_1699990000_1700200000.json.gz"]
+    assert report.delta_files == 1
+    assert report.updated_products == 1
+    assert index.get_products(["00000017"])["00000017"]["product_quantity"] == "600"
+
+    second_report = await sync_product_index(index, since=0)
+
+    # Only the older delta file is applied, and its older version of the product is ignored
+    assert downloads[1:] == ["openfoodfacts_products_1699900000_1699990000.json.gz"]
+    assert second_report.delta_files == 1
+    assert second_report.updated_products == 0
+    assert index.get_products(["00000017"])["00000017"]["product_quantity"] == "600"
@@ -0,0 +1,135 @@
+import gzip
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import httpx
+import pytest
+
+from app.business.open_food_facts.knowledge_panel import get_pain_report
+from app.business.open_food_facts.off_dump import import_dump, project_product
+from app.business.open_food_facts.product_index import ProductIndex, get_product_index
+
+
+def make_dump_products() -> List[Dict[str, Any]]:
+    """Return dump products: 2 egg products among non-animal ones"""
+    return [
+        {"code": "17", "product_name": "Apples", "categories_tags": ["en:fruits"]},
+        {
+            "code": "24",
+            "product_name": "Oeufs",
+            "product_name_en": "Eggs",
+            "categories_tags": ["en:eggs", "en:cage-chicken-eggs"],
+            "product_quantity": "300",
+            "product_quantity_unit": "g",
+            "ingredients_text": "Eggs",
+            "last_modified_t": 1700000000,
+        },
+        {
+            "code": "31",
+            "product_name": "Chips",
+            "categories_tags": ["en:snacks"],
+            "labels_tags": ["en:barn-chicken-eggs"],
+        },
+        {"code": "48", "product_name": "Free range eggs", "categories_tags": ["en:free-range-chicken-eggs"]},
+    ]
+
+
+def write_jsonl_dump(path: Path, products: List[Dict[str, Any]]) -> Path:
+    with gzip.open(path, "wt", encoding="utf-8") as dump:
+        for product in products:
+            dump.write(json.dumps(product) + "\n")
+    return path
+
+
+def test_project_product():
+    """Test that only the indexed fields and the localized names are kept"""
+    projected_product = project_product(make_dump_products()[1])
+
+    # The code is canonicalized, OFF stripping the leading zeros of some codes
+    assert projected_product["code"] == "00000024"
+    assert projected_product["product_name_en"] == "Eggs"
+    assert projected_product["categories_tags"] == ["en:eggs", "en:cage-chicken-eggs"]
+    assert "ingredients_text" not in projected_product
+    assert project_product({"code": "036000291452", "product_name": "Eggs"})["code"] == "0036000291452"
+    assert project_product({"code": "36000291452", "product_name": "Eggs"})["code"] == "0036000291452"
+    assert project_product({"code": "124", "product_name": "Eggs"}) is None
+
+
+def test_import_jsonl_dump(tmp_path: Path):
+    """Test that only the animal products of a JSONL dump are imported, with their localized names"""
+    dump_path = write_jsonl_dump(tmp_path / "products.jsonl.gz", make_dump_products())
+    index = ProductIndex(tmp_path / "index.sqlite3")
+
+    report = import_dump(dump_path, index, batch_size=1)
+
+    assert (report.scanned_products, report.imported_products) == (4, 2)
+    assert report.products_per_second > 0
+    assert index.count() == 2
+    assert index.get("00000017") is None
+    product_data = index.get("00000024")
+    assert product_data is not None
+    assert product_data.get_product_name("en") == "Eggs"
+    assert product_data.get_product_name("fr") == "Oeufs"
+    assert product_data.product_quantity == 300
+
+
+def test_import_jsonl_dump_resume(tmp_path: Path):
+    """Test that an import resumes after the last written batch, unless restarted"""
+    products = make_dump_products()
+    dump_path = tmp_path / "products.jsonl.gz"
+    index = ProductIndex(tmp_path / "index.sqlite3")
+
+    # The first import was interrupted after the first 2 lines
+    write_jsonl_dump(dump_path, products[:2])
+    import_dump(dump_path, index)
+    write_jsonl_dump(dump_path, products)
+
+    report = import_dump(dump_path, index)
+    assert report.scanned_products == 2
+    assert index.count() == 2
+
+    report = import_dump(dump_path, index, resume=False)
+    assert report.scanned_products == 4
+
+
+def test_import_parquet_dump(tmp_path: Path):
+    """Test that the Parquet dumps, with their list of localized names, are imported"""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    products = []
+    for product in make_dump_products():
+        names = [{"lang": "main", "text": product["product_name"]}]
+        if "product_name_en" in product:
+            names.append({"lang": "en", "text": product["product_name_en"]})
+        products.append({"code": product["code"], "product_name": names, "categories_tags": product["categories_tags"]})
+    dump_path = tmp_path / "products.parquet"
+    pq.write_table(pa.Table.from_pylist(products), dump_path)
+    index = ProductIndex(tmp_path / "index.sqlite3")
+
+    report = import_dump(dump_path, index)
+
+    assert (report.scanned_products, report.imported_products) == (4, 2)
+    product_data = index.get("00000024")
+    assert product_data is not None
+    assert product_data.get_product_name("en") == "Eggs"
+    assert product_data.get_product_name("fr") == "Oeufs"
+
+
+@pytest.mark.asyncio
+async def test_get_pain_report_reads_from_product_index(tmp_path: Path, mock_off_api: Callable):
+    """Test that indexed products are served without calling OFF"""
+    products = make_dump_products()
+    products[1]["code"] = "3256229237063"
+    import_dump(write_jsonl_dump(tmp_path / "products.jsonl.gz", products), get_product_index())
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise AssertionError("OFF should not be called")
+
+    mock_off_api(handler)
+
+    pain_report = await get_pain_report("3256229237063", locale="en")
+
+    assert pain_report.product_name == "Eggs"
+    assert pain_report.animals[0].breeding_type_with_weight.animal_product_weight == 300
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app.business.open_food_facts.pain_rate_table import (
+    PAIN_INTENSITIES,
+    PAIN_TYPES,
+    TIME_IN_PAIN_FOR_100G_ROWS,
+    compute_seconds_in_pain,
+    get_pain_rate_row,
+)
+from app.enums.open_food_facts.enums import (
+    TIME_IN_PAIN_FOR_100G_IN_SECONDS,
+    AnimalType,
+    BroilerChickenBreedingType,
+    LayingHenBreedingType,
+)
+
+
+def test_table_matches_time_in_pain_dictionary():
+    """Test that each cell of the table is the time in pain of the nested dictionaries, and missing ones are 0"""
+    for animal_type, time_in_pain_by_breeding_type in TIME_IN_PAIN_FOR_100G_IN_SECONDS.items():
+        for breeding_type, time_in_pain_by_pain_type in time_in_pain_by_breeding_type.items():
+            row = TIME_IN_PAIN_FOR_100G_ROWS[get_pain_rate_row(animal_type, breeding_type)]
+            for pain_type_index, pain_type in enumerate(PAIN_TYPES):
+                for intensity_index, pain_intensity in enumerate(PAIN_INTENSITIES):
+                    expected = time_in_pain_by_pain_type[pain_type][pain_intensity]
+                    assert row[pain_type_index, intensity_index] == expected
+
+    undefined_row = get_pain_rate_row(AnimalType.BROILER_CHICKEN, LayingHenBreedingType.BARN)
+    assert not TIME_IN_PAIN_FOR_100G_ROWS[undefined_row].any()
+    assert not TIME_IN_PAIN_FOR_100G_ROWS.flags.writeable
+
+
+def test_compute_seconds_in_pain_many_products():
+    """Test that the batch computation gives the truncated time in pain of each product"""
+    rows = [
+        get_pain_rate_row(AnimalType.LAYING_HEN, LayingHenBreedingType.FREE_RANGE),
+        get_pain_rate_row(AnimalType.LAYING_HEN, LayingHenBreedingType.FURNISHED_CAGE),
+        get_pain_rate_row(AnimalType.BROILER_CHICKEN, BroilerChickenBreedingType.FREE_RANGE),
+        get_pain_rate_row(AnimalType.LAYING_HEN, LayingHenBreedingType.BARN),
+    ]
+    weights = [53.5, 200, 150, -10]
+
+    seconds_in_pain = compute_seconds_in_pain(rows, weights)
+
+    assert seconds_in_pain.shape == (4, len(PAIN_TYPES), len(PAIN_INTENSITIES))
+    assert seconds_in_pain.dtype == np.int64
+    # 17333 * 53.5 / 100 = 9273.155
+    assert seconds_in_pain[0, 1, 3] == 9273
+    assert seconds_in_pain[1, 0, 1] == 2200
+    assert seconds_in_pain[2, 0, 3] == 27000
+    assert not seconds_in_pain[3].any()
+
+
+def test_get_pain_rate_row_unknown_breeding_type():
+    """Test that an unknown breeding type has no row"""
+    with pytest.raises(KeyError):
+        get_pain_rate_row(AnimalType.LAYING_HEN, "battery")
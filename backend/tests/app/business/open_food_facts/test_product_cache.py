@@ -0,0 +1,82 @@
+from typing import Callable
+
+import httpx
+import pytest
+
+from app.business.open_food_facts.knowledge_panel import get_pain_report
+from app.business.open_food_facts.product_cache import ProductCache
+from app.schemas.open_food_facts.external import ProductData
+from tests.conftest import FakeClock
+
+
+def test_product_cache_hit_and_miss(sample_product_data: ProductData):
+    """Test that a cached product is returned and counted as a hit"""
+    cache = ProductCache()
+
+    assert cache.get("123") is None
+    cache.set("123", sample_product_data)
+
+    assert cache.get("123") is sample_product_data
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+    assert stats.size_in_bytes > 0
+
+
+def test_product_cache_ttl(sample_product_data: ProductData, fake_clock: FakeClock):
+    """Test that entries expire after the TTL"""
+    cache = ProductCache(ttl=10, clock=fake_clock)
+    cache.set("123", sample_product_data)
+
+    fake_clock.now += 9
+    assert cache.get("123") is sample_product_data
+
+    fake_clock.now += 1
+    assert cache.get("123") is None
+    stats = cache.stats()
+    assert (stats.expirations, stats.entries, stats.size_in_bytes) == (1, 0, 0)
+
+
+def test_product_cache_lru_eviction_by_entries(sample_product_data: ProductData):
+    """Test that the least recently used entry is evicted when the cache is full"""
+    cache = ProductCache(max_entries=2)
+    cache.set("1", sample_product_data)
+    cache.set("2", sample_product_data)
+    cache.get("1")  # "2" is now the least recently used
+    cache.set("3", sample_product_data)
+
+    assert cache.get("2") is None
+    assert cache.get("1") is sample_product_data
+    assert cache.get("3") is sample_product_data
+    assert cache.stats().evictions == 1
+
+
+def test_product_cache_lru_eviction_by_size(sample_product_data: ProductData):
+    """Test that entries are evicted when the cache exceeds its size in bytes"""
+    entry_size = len(sample_product_data.model_dump_json())
+    cache = ProductCache(max_bytes=entry_size * 2)
+    for key in ("1", "2", "3"):
+        cache.set(key, sample_product_data)
+
+    assert cache.get("1") is None
+    stats = cache.stats()
+    assert stats.entries == 2
+    assert stats.size_in_bytes <= entry_size * 2
+    assert stats.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_get_pain_report_reads_from_cache(mock_off_api: Callable, sample_product_data: ProductData):
+    """Test that the product is only fetched once from OFF for repeated pain reports"""
+    upstream_calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        upstream_calls.append(request.url)
+        return httpx.Response(200, json={"product": sample_product_data.model_dump(mode="json")})
+
+    mock_off_api(handler)
+
+    first_report = await get_pain_report("3256229237063", locale="en")
+    second_report = await get_pain_report("3256229237063", locale="en")
+
+    assert len(upstream_calls) == 1
+    assert first_report == second_report
@@ -0,0 +1,110 @@
+import asyncio
+from pathlib import Path
+from typing import Callable
+
+import httpx
+import pytest
+
+from app.business.open_food_facts.knowledge_panel import get_pain_report
+from app.business.open_food_facts.product_cache import get_product_cache
+from app.business.open_food_facts.product_store import ProductStore, sweep_product_store_periodically
+from app.schemas.open_food_facts.external import ProductData
+from tests.conftest import FakeClock
+
+
+def test_product_store_round_trip(tmp_path: Path, sample_product_data: ProductData):
+    """Test that a stored product can be read back, also by another connection to the same file"""
+    store = ProductStore(tmp_path / "products.sqlite3")
+    store.set("123", sample_product_data)
+
+    assert store.get("123") == sample_product_data
+    assert store.get("456") is None
+
+    other_worker_store = ProductStore(tmp_path / "products.sqlite3")
+    assert other_worker_store.get("123") == sample_product_data
+
+
+def test_product_store_payload_version(tmp_path: Path, sample_product_data: ProductData):
+    """Test that the products stored with another payload version are read as misses"""
+    ProductStore(tmp_path / "products.sqlite3", payload_version="old").set("123", sample_product_data)
+
+    assert ProductStore(tmp_path / "products.sqlite3", payload_version="new").get("123") is None
+    assert ProductStore(tmp_path / "products.sqlite3", payload_version="old").get("123") == sample_product_data
+
+
+def test_product_store_errors_are_logged(tmp_path: Path, sample_product_data: ProductData):
+    """Test that a failing database is logged and handled as a miss, without raising"""
+    store = ProductStore(tmp_path / "products.sqlite3")
+    store.set("123", sample_product_data)
+    store._connect().execute("DROP TABLE products")
+
+    store.set("456", sample_product_data)
+    store.invalidate("123")
+    assert store.get("123") is None
+    assert store.sweep() == 0
+
+
+def test_product_store_ttl_and_sweep(tmp_path: Path, sample_product_data: ProductData, fake_clock: FakeClock):
+    """Test that expired products are not returned and are removed by the sweep"""
+    store = ProductStore(tmp_path / "products.sqlite3", ttl=60, clock=fake_clock)
+    store.set("old", sample_product_data)
+    fake_clock.now += 30
+    store.set("recent", sample_product_data)
+    fake_clock.now += 40
+
+    assert store.get("old") is None
+    assert store.get("recent") == sample_product_data
+    assert store.sweep() == 1
+
+
+def test_product_store_size_cap(tmp_path: Path, sample_product_data: ProductData, fake_clock: FakeClock):
+    """Test that the sweep removes the oldest products when the store exceeds its size cap"""
+    store = ProductStore(tmp_path / "products.sqlite3", clock=fake_clock)
+    for key in ("1", "2", "3"):
+        store.set(key, sample_product_data)
+        fake_clock.now += 1
+    payload_size = store._connect().execute("SELECT MAX(size) FROM products").fetchone()[0]
+
+    store.max_bytes = payload_size * 2
+    assert store.sweep() == 1
+
+    assert store.get("1") is None
+    assert store.get("2") == sample_product_data
+    assert store.get("3") == sample_product_data
+
+
+@pytest.mark.asyncio
+async def test_sweep_product_store_periodically(
+    tmp_path: Path, sample_product_data: ProductData, fake_clock: FakeClock
+):
+    """Test that the background sweep removes the expired products, without being triggered by the writes"""
+    store = ProductStore(tmp_path / "products.sqlite3", ttl=60, clock=fake_clock)
+    store.set("old", sample_product_data)
+    fake_clock.now += 120
+    store.set("recent", sample_product_data)
+    assert store._connect().execute("SELECT COUNT(*) FROM products").fetchone()[0] == 2
+
+    sweep = asyncio.create_task(sweep_product_store_periodically(store, interval=0.01))
+    await asyncio.sleep(0.05)
+    sweep.cancel()
+
+    assert store._connect().execute("SELECT COUNT(*) FROM products").fetchone()[0] == 1
+    assert store.get("recent") == sample_product_data
+
+
+@pytest.mark.asyncio
+async def test_get_pain_report_reads_from_product_store(mock_off_api: Callable, sample_product_data: ProductData):
+    """Test that a worker with an empty memory cache reads the products from the store instead of OFF"""
+    upstream_calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        upstream_calls.append(request.url)
+        return httpx.Response(200, json={"product": sample_product_data.model_dump(mode="json")})
+
+    mock_off_api(handler)
+
+    await get_pain_report("3256229237063", locale="en")
+    get_product_cache().clear()  # Simulate a fresh worker
+    await get_pain_report("3256229237063", locale="en")
+
+    assert len(upstream_calls) == 1
@@ -0,0 +1,120 @@
+import asyncio
+from typing import Callable
+
+import httpx
+import pytest
+
+from app.business.open_food_facts.knowledge_panel import get_pain_report
+from app.business.open_food_facts.single_flight import SingleFlight
+from app.schemas.open_food_facts.external import ProductData
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_result():
+    """Test that concurrent calls with the same key run the function once"""
+    single_flight: SingleFlight[str] = SingleFlight()
+    release = asyncio.Event()
+    calls = []
+
+    async def fetch() -> str:
+        calls.append(1)
+        await release.wait()
+        return "result"
+
+    waiters = [asyncio.ensure_future(single_flight.do("123", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["result"] * 5
+    assert len(calls) == 1
+    assert single_flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exception():
+    """Test that the exception of the call is raised to every caller, and the next call runs again"""
+    single_flight: SingleFlight[str] = SingleFlight()
+    calls = []
+
+    async def fetch() -> str:
+        calls.append(1)
+        await asyncio.sleep(0)
+        raise ValueError("upstream error")
+
+    results = await asyncio.gather(*(single_flight.do("123", fetch) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(calls) == 1
+
+    with pytest.raises(ValueError):
+        await single_flight.do("123", fetch)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancellation():
+    """Test that a cancelled caller doesn't cancel the call for the others, but the last one does"""
+    single_flight: SingleFlight[str] = SingleFlight()
+    release = asyncio.Event()
+    fetch_cancelled = asyncio.Event()
+
+    async def fetch() -> str:
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            fetch_cancelled.set()
+            raise
+        return "result"
+
+    first = asyncio.ensure_future(single_flight.do("123", fetch))
+    second = asyncio.ensure_future(single_flight.do("123", fetch))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0)
+    assert not fetch_cancelled.is_set()
+
+    second.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await second
+    await asyncio.wait_for(fetch_cancelled.wait(), timeout=1)
+    assert single_flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_caller_after_last_cancellation():
+    """Test that a caller arriving while the call of the cancelled callers ends starts a new call"""
+    single_flight: SingleFlight[str] = SingleFlight()
+
+    async def fetch() -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            # The cancelled call takes a while to end
+            await asyncio.sleep(0.01)
+            raise
+        return "cancelled call"
+
+    first = asyncio.ensure_future(single_flight.do("123", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+    assert await single_flight.do("123", lambda: asyncio.sleep(0, result="new call")) == "new call"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_pain_reports_are_coalesced(mock_off_api: Callable, sample_product_data: ProductData):
+    """Test that a burst of pain reports for the same barcode calls OFF only once"""
+    upstream_calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        upstream_calls.append(request.url)
+        return httpx.Response(200, json={"product": sample_product_data.model_dump(mode="json")})
+
+    mock_off_api(handler)
+
+    reports = await asyncio.gather(*(get_pain_report("3256229237063", locale="en") for _ in range(10)))
+
+    assert len(upstream_calls) == 1
+    assert all(report == reports[0] for report in reports)
@@ -0,0 +1,123 @@
+import json
+import logging
+from pathlib import Path
+
+import pytest
+
+from app.business.open_food_facts.breeding_type_index import BreedingTypeIndex, get_breeding_type_index
+from app.business.open_food_facts.pain_report_calculator import PainReportCalculator
+from app.business.open_food_facts.taxonomy import (
+    TaxonomyIndex,
+    get_taxonomy_index,
+    load_taxonomy_index,
+    read_taxonomy_json,
+)
+from app.enums.open_food_facts.enums import (
+    TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE,
+    AnimalType,
+    LayingHenBreedingType,
+)
+from app.schemas.open_food_facts.external import ProductData
+
+PARENTS_BY_TAG = {
+    "en:eggs": [],
+    "en:chicken-eggs": ["en:eggs"],
+    "en:cage-chicken-eggs": ["en:chicken-eggs"],
+    "en:free-range-chicken-eggs": ["en:chicken-eggs"],
+    "en:large-cage-chicken-eggs": ["en:cage-chicken-eggs"],
+    "en:large-cage-chicken-eggs-pack-of-12": ["en:large-cage-chicken-eggs", "en:packs-of-12"],
+    "en:packs-of-12": [],
+}
+
+
+def test_ancestors():
+    """Test that each tag has all its ancestors, through all its parents"""
+    taxonomy = TaxonomyIndex.from_parents(PARENTS_BY_TAG)
+
+    assert taxonomy.get_ancestors("en:large-cage-chicken-eggs-pack-of-12") == {
+        "en:large-cage-chicken-eggs-pack-of-12",
+        "en:large-cage-chicken-eggs",
+        "en:cage-chicken-eggs",
+        "en:chicken-eggs",
+        "en:eggs",
+        "en:packs-of-12",
+    }
+    assert taxonomy.is_descendant("en:large-cage-chicken-eggs", "en:eggs")
+    assert not taxonomy.is_descendant("en:eggs", "en:large-cage-chicken-eggs")
+    assert not taxonomy.is_descendant("en:unknown", "en:eggs")
+    assert set(taxonomy.get_descendants("en:cage-chicken-eggs")) == {
+        "en:cage-chicken-eggs",
+        "en:large-cage-chicken-eggs",
+        "en:large-cage-chicken-eggs-pack-of-12",
+    }
+
+
+def test_ancestors_bitsets():
+    """Test that only the tags descending from the given tags get a bitset, of their ancestors among them"""
+    taxonomy = TaxonomyIndex.from_parents(PARENTS_BY_TAG)
+
+    assert taxonomy.get_ancestors_bitsets(["en:cage-chicken-eggs", "en:packs-of-12", "en:unknown"]) == {
+        "en:cage-chicken-eggs": 0b01,
+        "en:large-cage-chicken-eggs": 0b01,
+        "en:large-cage-chicken-eggs-pack-of-12": 0b11,
+        "en:packs-of-12": 0b10,
+    }
+
+
+def test_cycles_are_ignored(caplog: pytest.LogCaptureFixture):
+    """Test that an edge creating a cycle is ignored instead of looping forever"""
+    with caplog.at_level(logging.WARNING, logger="app"):
+        taxonomy = TaxonomyIndex.from_parents({"en:a": ["en:b"], "en:b": ["en:a"]})
+
+    assert len(taxonomy) == 2
+    assert "Cycle in the taxonomy" in caplog.text
+
+
+def test_save_and_load(tmp_path: Path):
+    """Test that the binary file gives back the same index"""
+    taxonomy_path = tmp_path / "categories.json"
+    taxonomy_path.write_text(json.dumps({tag: {"parents": parents} for tag, parents in PARENTS_BY_TAG.items()}))
+    taxonomy = TaxonomyIndex.from_parents(read_taxonomy_json([taxonomy_path]))
+    index_path = tmp_path / "index" / "off_taxonomy_index.bin"
+
+    taxonomy.save(index_path)
+    loaded_taxonomy = load_taxonomy_index(index_path)
+
+    assert loaded_taxonomy is not None
+    assert loaded_taxonomy.tags == taxonomy.tags
+    assert loaded_taxonomy.parents == taxonomy.parents
+
+
+def test_load_invalid_file(tmp_path: Path):
+    """Test that a missing or invalid file gives no taxonomy index"""
+    index_path = tmp_path / "off_taxonomy_index.bin"
+    assert load_taxonomy_index(index_path) is None
+    index_path.write_bytes(b"invalid")
+    assert load_taxonomy_index(index_path) is None
+
+
+def test_breeding_types_from_descendant_tags(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """Test that a subcategory of a rule tag detects its breeding type, and can create a conflict"""
+    index = BreedingTypeIndex(TAGS_BY_ANIMAL_TYPE_AND_BREEDING_TYPE, TaxonomyIndex.from_parents(PARENTS_BY_TAG))
+
+    assert index.match(["en:large-cage-chicken-eggs-pack-of-12"]).breeding_types == {
+        AnimalType.LAYING_HEN: LayingHenBreedingType.CAGE
+    }
+    assert index.match(["en:large-cage-chicken-eggs", "en:free-range-chicken-eggs"]).conflicting_animal_types == {
+        AnimalType.LAYING_HEN
+    }
+    assert index.match(["en:chicken-eggs"]).breeding_types == {}
+
+    # The calculator uses the taxonomy index of OFF_TAXONOMY_INDEX_PATH
+    index_path = tmp_path / "off_taxonomy_index.bin"
+    TaxonomyIndex.from_parents(PARENTS_BY_TAG).save(index_path)
+    monkeypatch.setenv("OFF_TAXONOMY_INDEX_PATH", str(index_path))
+    get_taxonomy_index.cache_clear()
+    get_breeding_type_index.cache_clear()
+    product_data = ProductData(
+        product_name="Eggs", categories_tags=["en:large-cage-chicken-eggs"], countries_tags=["en:france"]
+    )
+
+    breeding_types = PainReportCalculator(product_data)._get_breeding_types()
+
+    assert breeding_types[AnimalType.LAYING_HEN].breeding_type == LayingHenBreedingType.FURNISHED_CAGE
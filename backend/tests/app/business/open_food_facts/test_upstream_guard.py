@@ -0,0 +1,196 @@
+import asyncio
+from typing import Callable, List
+
+import httpx
+import pytest
+
+from app.business.open_food_facts.knowledge_panel import get_product_data
+from app.business.open_food_facts.product_store import get_product_store
+from app.business.open_food_facts.upstream_guard import (
+    OFF_V3,
+    SEARCH_A_LICIOUS,
+    AdaptiveConcurrencyLimit,
+    CircuitBreaker,
+    CircuitState,
+    UpstreamGuard,
+    get_upstream_guard,
+)
+from app.config.exceptions import ResourceNotFoundException, ServiceUnavailableException
+from app.schemas.open_food_facts.external import ProductData
+from tests.conftest import FakeClock
+
+
+def make_status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://world.openfoodfacts.org")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status_code, request=request))
+
+
+def test_circuit_breaker_opens_then_probes(fake_clock: FakeClock):
+    """Test that the circuit opens after consecutive failures, then lets a single probe through"""
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=fake_clock)
+
+    for _ in range(3):
+        assert breaker.allow_call()
+        breaker.record_failure()
+
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow_call()
+
+    fake_clock.now += 30
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.allow_call()
+    assert not breaker.allow_call()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+
+    fake_clock.now += 30
+    assert breaker.allow_call()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_circuit_breaker_success_resets_failures():
+    """Test that only consecutive failures open the circuit"""
+    breaker = CircuitBreaker(failure_threshold=2)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_adaptive_concurrency_limit(fake_clock: FakeClock):
+    """Test the additive increase on fast successes and the single multiplicative decrease on a burst of failures"""
+    limit = AdaptiveConcurrencyLimit(initial_limit=4, min_limit=1, latency_threshold=2, clock=fake_clock)
+
+    assert all(limit.try_acquire() for _ in range(4))
+    assert not limit.try_acquire()
+
+    started_at = fake_clock.now
+    fake_clock.now += 0.1
+    limit.release(started_at, failed=False)
+    assert limit.limit == 4.25
+
+    # Concurrent calls failing together decrease the limit once
+    limit.release(started_at, failed=True)
+    limit.release(started_at, failed=True)
+    assert limit.limit == 2.125
+
+    # A slow call started after the decrease decreases it again
+    started_at = fake_clock.now
+    fake_clock.now += 3
+    limit.release(started_at, failed=False)
+    assert limit.limit == 1.0625
+    assert limit.in_flight == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "exception, is_failure",
+    [
+        (make_status_error(404), False),
+        (make_status_error(500), True),
+        (make_status_error(429), True),
+        (httpx.ConnectTimeout("timeout"), True),
+        (ServiceUnavailableException("Rate limited"), True),
+    ],
+)
+async def test_upstream_guard_failures(exception: Exception, is_failure: bool):
+    """Test that only network errors, 5XX and 429 responses and rate limit rejections count as failures"""
+    guard = UpstreamGuard("test", CircuitBreaker(failure_threshold=1))
+
+    with pytest.raises(type(exception)):
+        async with guard.call():
+            raise exception
+
+    assert guard.status().state == (CircuitState.OPEN if is_failure else CircuitState.CLOSED)
+    assert guard.status().in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_upstream_guard_rejects_calls_when_open():
+    """Test that the calls are rejected without being made while the circuit is open"""
+    guard = UpstreamGuard("test", CircuitBreaker(failure_threshold=1))
+    with pytest.raises(httpx.ConnectError):
+        async with guard.call():
+            raise httpx.ConnectError("down")
+
+    with pytest.raises(ServiceUnavailableException):
+        async with guard.call():
+            pytest.fail("The call must not be made")
+
+    assert guard.status().rejected_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_upstream_guard_cancelled_probe_is_released(fake_clock: FakeClock):
+    """Test that a cancelled probe call lets the next call probe the endpoint"""
+    guard = UpstreamGuard(
+        "test", CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=fake_clock), clock=fake_clock
+    )
+    with pytest.raises(httpx.ConnectError):
+        async with guard.call():
+            raise httpx.ConnectError("down")
+    fake_clock.now += 30
+
+    async def probe():
+        async with guard.call():
+            await asyncio.sleep(10)
+
+    task = asyncio.ensure_future(probe())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert guard.breaker.allow_call()
+
+
+@pytest.mark.asyncio
+async def test_get_product_data_rate_limited(mock_off_api: Callable):
+    """Test that a 429 response with a long Retry-After is an unavailable service, and a failure of the endpoint"""
+    mock_off_api(lambda request: httpx.Response(429, headers={"Retry-After": "3600"}))
+    initial_limit = get_upstream_guard(OFF_V3).status().concurrency_limit
+
+    with pytest.raises(ServiceUnavailableException) as exc_info:
+        await get_product_data("1")
+
+    assert exc_info.value.retry_after == 3600
+    status = get_upstream_guard(OFF_V3).status()
+    assert status.consecutive_failures == 1
+    assert status.concurrency_limit < initial_limit
+
+
+@pytest.mark.asyncio
+async def test_get_product_data_fails_fast_or_serves_expired_data_when_off_is_down(mock_off_api: Callable):
+    """Test that OFF is not called when both circuits are open, and that the expired copy of a product is served"""
+    requests: List[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(503)
+
+    mock_off_api(handler)
+    for name in (OFF_V3, SEARCH_A_LICIOUS):
+        get_upstream_guard(name).breaker.failure_threshold = 1
+
+    with pytest.raises(ResourceNotFoundException):
+        await get_product_data("1")
+    assert len(requests) == 2
+
+    with pytest.raises(ServiceUnavailableException):
+        await get_product_data("2")
+    assert len(requests) == 2
+
+    store = get_product_store()
+    store.set("3", ProductData(product_name="Expired eggs"))
+    store.ttl = 0
+    assert store.get("3") is None
+
+    product_data = await get_product_data("3")
+
+    assert product_data.product_name == "Expired eggs"
+    assert len(requests) == 2
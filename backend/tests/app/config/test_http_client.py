@@ -0,0 +1,37 @@
+import httpx
+import pytest
+
+from app.config.http_client import HttpClientSettings, get_http_client, http_client_lifespan
+
+
+def test_http_client_settings_from_env(monkeypatch: pytest.MonkeyPatch):
+    """Test that the settings can be overridden with environment variables"""
+    monkeypatch.setenv("OFF_HTTP_READ_TIMEOUT", "2.5")
+    monkeypatch.setenv("OFF_HTTP_HTTP2", "false")
+    monkeypatch.setenv("OFF_HTTP_WARMUP_URLS", "https://a.example,https://b.example")
+
+    settings = HttpClientSettings.from_env()
+
+    assert settings.read_timeout == 2.5
+    assert settings.http2 is False
+    assert settings.warmup_urls == ["https://a.example", "https://b.example"]
+    assert settings.max_connections == HttpClientSettings().max_connections
+
+
+@pytest.mark.asyncio
+async def test_http_client_lifespan_warms_up_and_installs_client():
+    """Test that the lifespan warms up the connections and shares a single client until shutdown"""
+    warmed_up_hosts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        warmed_up_hosts.append(request.url.host)
+        return httpx.Response(200)
+
+    settings = HttpClientSettings(warmup_urls=["https://world.openfoodfacts.org", "https://down.example"])
+    async with http_client_lifespan(settings, transport=httpx.MockTransport(handler)) as client:
+        assert get_http_client() is client
+        assert get_http_client() is client
+
+    assert sorted(warmed_up_hosts) == ["down.example", "world.openfoodfacts.org"]
+    assert client.is_closed
+    assert get_http_client() is not client
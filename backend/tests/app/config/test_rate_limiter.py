@@ -0,0 +1,140 @@
+import asyncio
+from typing import List
+
+import httpx
+import pytest
+
+from app.config.exceptions import ServiceUnavailableException
+from app.config.http_client import HttpClientSettings
+from app.config.rate_limiter import (
+    RateLimitedTransport,
+    RequestPriority,
+    TokenBucket,
+    parse_retry_after,
+    request_priority,
+)
+
+
+def test_http_client_settings_rate_limits_from_env(monkeypatch: pytest.MonkeyPatch):
+    """Test that the rate limits can be overridden with an environment variable"""
+    monkeypatch.setenv("OFF_HTTP_RATE_LIMITS", "world.openfoodfacts.org=50,search.openfoodfacts.org=300")
+
+    settings = HttpClientSettings.from_env()
+
+    assert settings.rate_limits == {"world.openfoodfacts.org": 50, "search.openfoodfacts.org": 300}
+
+
+@pytest.mark.parametrize(
+    "value, expected_delay",
+    [("12", 12), ("-1", 0), ("Wed, 21 Oct 2015 07:28:00 GMT", 0), ("soon", None), (None, None)],
+)
+def test_parse_retry_after(value: str | None, expected_delay: float | None):
+    """Test that Retry-After headers in seconds and as dates are parsed"""
+    assert parse_retry_after(value) == expected_delay
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_serves_interactive_requests_first():
+    """Test that the waiting interactive requests get the tokens before the background ones"""
+    bucket = TokenBucket(rate=100, capacity=1)
+    served: List[str] = []
+
+    async def request(name: str, priority: RequestPriority) -> None:
+        await bucket.acquire(priority)
+        served.append(name)
+
+    await bucket.acquire()
+    await asyncio.gather(
+        request("background 1", RequestPriority.BACKGROUND),
+        request("background 2", RequestPriority.BACKGROUND),
+        request("interactive", RequestPriority.INTERACTIVE),
+    )
+
+    assert served == ["interactive", "background 1", "background 2"]
+    assert bucket.waiting() == 0
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_pause():
+    """Test that no token is given during a pause"""
+    bucket = TokenBucket(rate=1000, capacity=10)
+    bucket.pause(0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(bucket.acquire(), timeout=0.02)
+    await asyncio.wait_for(bucket.acquire(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_max_wait():
+    """Test that a request fails fast when the pause is longer than its maximum wait, or when no token comes in time"""
+    bucket = TokenBucket(rate=1000, capacity=10)
+    bucket.pause(3600)
+
+    with pytest.raises(ServiceUnavailableException):
+        await asyncio.wait_for(bucket.acquire(RequestPriority.INTERACTIVE), timeout=0.05)
+
+    bucket = TokenBucket(rate=10, capacity=1)
+    await bucket.acquire()
+    with pytest.raises(ServiceUnavailableException):
+        await bucket.acquire(max_wait=0.01)
+    assert bucket.waiting() == 0
+    await asyncio.wait_for(bucket.acquire(), timeout=1)
+
+
+def make_transport(responses: List[httpx.Response], requests: List[httpx.Request]) -> RateLimitedTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return responses.pop(0)
+
+    buckets = {"world.openfoodfacts.org": TokenBucket(rate=1000, capacity=10)}
+    return RateLimitedTransport(httpx.MockTransport(handler), buckets, backoff_base=0.01)
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_transport_retries_after_429():
+    """Test that a request answered with a 429 response is retried after the Retry-After delay"""
+    requests: List[httpx.Request] = []
+    transport = make_transport(
+        [httpx.Response(429, headers={"Retry-After": "0.01"}), httpx.Response(429), httpx.Response(200)], requests
+    )
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.get("https://world.openfoodfacts.org/api/v3/product/1.json")
+
+    assert response.status_code == 200
+    assert len(requests) == 3
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_transport_interactive_requests_do_not_wait_long_pauses():
+    """Test that an interactive request fails when the pause is too long, unlike a background one"""
+    requests: List[httpx.Request] = []
+    transport = make_transport([httpx.Response(429, headers={"Retry-After": "60"})], requests)
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        with pytest.raises(ServiceUnavailableException) as exc_info:
+            await client.get("https://world.openfoodfacts.org/api/v3/product/1.json")
+        assert exc_info.value.retry_after == 60
+
+        with pytest.raises(ServiceUnavailableException):
+            await client.get("https://world.openfoodfacts.org/api/v3/product/3.json")
+
+        with request_priority(RequestPriority.BACKGROUND):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(client.get("https://world.openfoodfacts.org/api/v3/product/2.json"), 0.05)
+
+    assert len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_transport_ignores_other_hosts():
+    """Test that the requests to hosts without rate limit are not limited"""
+    requests: List[httpx.Request] = []
+    transport = make_transport([httpx.Response(429)], requests)
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.get("https://static.openfoodfacts.org/data/delta/index.txt")
+
+    assert response.status_code == 429
+    assert len(requests) == 1
@@ -1,15 +1,34 @@
-from typing import AsyncGenerator, List
+from pathlib import Path
+from typing import AsyncGenerator, Callable, Generator, List
 
+import httpx
 import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 from pydantic import HttpUrl
 from starlette.testclient import TestClient
 
+from app.business.open_food_facts.breeding_type_index import get_breeding_type_index
+from app.business.open_food_facts.egg_ingredients import get_egg_ingredient_ids
+from app.business.open_food_facts.hedging import get_product_hedged_fetcher
+from app.business.open_food_facts.knowledge_panel_cache import get_knowledge_panel_cache
+from app.business.open_food_facts.negative_cache import get_negative_cache
+from app.business.open_food_facts.product_cache import get_product_cache
+from app.business.open_food_facts.product_index import PRODUCT_INDEX_PATH_ENV, get_product_index
+from app.business.open_food_facts.product_store import PRODUCT_STORE_PATH_ENV, get_product_store
+from app.business.open_food_facts.taxonomy import TAXONOMY_INDEX_PATH_ENV, get_taxonomy_index
+from app.business.open_food_facts.upstream_guard import get_upstream_guards
+from app.config.http_client import create_http_client, set_http_client
 from app.enums.open_food_facts.enums import AnimalType, LayingHenBreedingType, PainIntensity, PainType
 from app.main import app
 from app.schemas.open_food_facts.external import ProductData
-from app.schemas.open_food_facts.internal import AnimalPainReport, BreedingTypeAndWeight, PainLevelData, PainReport
+from app.schemas.open_food_facts.internal import (
+    AnimalPainReport,
+    BreedingTypeAndWeight,
+    PainLevelData,
+    PainMatrix,
+    PainReport,
+)
 
 
 @pytest_asyncio.fixture
@@ -30,6 +49,70 @@ def client() -> TestClient:
     return TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def clear_caches(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Generator[None, None, None]:
+    """
+    Fixture that gives each test empty application caches, so tests don't depend on each other.
+    The on-disk product store and product index are created in the test temporary directory,
+    where no taxonomy index exists.
+    """
+    monkeypatch.setenv(PRODUCT_STORE_PATH_ENV, str(tmp_path / "off_products.sqlite3"))
+    monkeypatch.setenv(PRODUCT_INDEX_PATH_ENV, str(tmp_path / "off_product_index.sqlite3"))
+    monkeypatch.setenv(TAXONOMY_INDEX_PATH_ENV, str(tmp_path / "off_taxonomy_index.bin"))
+    get_breeding_type_index.cache_clear()
+    get_taxonomy_index.cache_clear()
+    get_egg_ingredient_ids.cache_clear()
+    get_knowledge_panel_cache.cache_clear()
+    get_product_store.cache_clear()
+    get_product_index.cache_clear()
+    yield
+    get_product_store().close()
+    get_product_store.cache_clear()
+    get_product_index().close()
+    get_product_index.cache_clear()
+    get_product_cache().clear()
+    get_negative_cache().clear()
+    get_product_hedged_fetcher.cache_clear()
+    get_upstream_guards.cache_clear()
+    get_breeding_type_index.cache_clear()
+    get_taxonomy_index.cache_clear()
+    get_egg_ingredient_ids.cache_clear()
+    get_knowledge_panel_cache.cache_clear()
+
+
+class FakeClock:
+    """Clock returning a time that only moves when the test sets it"""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def fake_clock() -> FakeClock:
+    """
+    Fixture that provides a fake clock, to pass as the clock of the caches and of the upstream guards.
+    Advance it by incrementing its now attribute.
+    """
+    return FakeClock()
+
+
+@pytest.fixture
+def mock_off_api() -> Generator[Callable[[Callable[[httpx.Request], httpx.Response]], None], None, None]:
+    """
+    Fixture that replaces the shared OFF HTTP client with one using a mock transport.
+    Call it with a handler receiving the httpx.Request and returning the httpx.Response to send back.
+    """
+
+    def install(handler: Callable[[httpx.Request], httpx.Response]) -> None:
+        set_http_client(create_http_client(transport=httpx.MockTransport(handler)))
+
+    yield install
+    set_http_client(None)
+
+
 @pytest.fixture
 def sample_product_data() -> ProductData:
     """
@@ -85,7 +168,9 @@ def animal_pain_report(laying_hen_breeding_type, pain_levels) -> AnimalPainRepor
     Fixture that provides a sample AnimalPainReport for a laying hen.
     """
     return AnimalPainReport(
-        animal_type=AnimalType.LAYING_HEN, pain_levels=pain_levels, breeding_type_with_weight=laying_hen_breeding_type
+        animal_type=AnimalType.LAYING_HEN,
+        pain_matrix=PainMatrix.from_pain_levels(pain_levels),
+        breeding_type_with_weight=laying_hen_breeding_type,
     )
 
 